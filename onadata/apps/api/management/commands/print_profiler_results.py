@@ -1,13 +1,18 @@
-from hotshot import stats
+import pstats
+
 from django.core.management.base import BaseCommand
 
 
 class Command(BaseCommand):
-    args = '<log_file>'
+    help = 'Show the output of a cProfile log file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('log_file')
+        parser.add_argument('--limit', type=int, default=20)
 
     def handle(self, *args, **options):
         self.stdout.write("Show profiler log file output..", ending='\n')
 
-        _stats = stats.load(args[0])
+        _stats = pstats.Stats(options['log_file'], stream=self.stdout)
         _stats.sort_stats('time', 'calls')
-        _stats.print_stats(20)
+        _stats.print_stats(options['limit'])
@@ -49,8 +49,11 @@ class TestAttachmentViewSet(TestAbstractViewSet):
             'xform': self.xform.pk,
             'instance': self.attachment.instance.pk,
             'mimetype': self.attachment.mimetype,
-            'filename': self.attachment.media_file.name
+            'filename': self.attachment.media_file.name,
+            'file_hash': self.attachment.file_hash
         }
+        # the hash of the file is stored when it is uploaded
+        self.assertEqual(len(self.attachment.file_hash), 32)
         request = self.factory.get('/', **self.extra)
         response = self.retrieve_view(request, pk=pk)
         self.assertNotEqual(response.get('Cache-Control'), None)
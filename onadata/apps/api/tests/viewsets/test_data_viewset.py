@@ -169,6 +169,42 @@ class TestDataViewSet(TestBase):
         self.assertIsInstance(response.data, dict)
         self.assertDictContainsSubset(data, response.data)
 
+    def test_data_streaming_json_passthrough(self):
+        """
+        Test submissions streamed as JSON text match the streamed decoded
+        submissions
+        """
+        self._make_submissions()
+        view = DataViewSet.as_view({'get': 'list'})
+        formid = self.xform.pk
+        queries = [
+            {},
+            {"fields": '["_id", "transport/loop_over_transport_types_frequency/ambulance/frequency_to_referral_facility"]'},  # noqa
+            {"sort": '{"transport/available_transportation_types_to_referral_facility":1}'},  # noqa
+            {"page": 1, "page_size": 2},
+        ]
+        for query in queries:
+            responses = []
+            for passthrough in [False, True]:
+                with self.settings(STREAM_DATA=True,
+                                   STREAM_DATA_JSON_PASSTHROUGH=passthrough,
+                                   STREAM_DATA_CHUNK_SIZE=1):
+                    request = self.factory.get('/', data=query, **self.extra)
+                    response = view(request, pk=formid)
+                self.assertEqual(response.status_code, 200)
+                responses.append(
+                    [c.decode('utf-8') for c in response.streaming_content])
+            self.assertEqual(json.loads(''.join(responses[0])),
+                             json.loads(''.join(responses[1])))
+
+        # the records are joined into chunks of the configured size
+        with self.settings(STREAM_DATA=True,
+                           STREAM_DATA_JSON_PASSTHROUGH=True,
+                           STREAM_DATA_CHUNK_SIZE=1024 * 1024):
+            request = self.factory.get('/', **self.extra)
+            response = view(request, pk=formid)
+            self.assertEqual(len(list(response.streaming_content)), 1)
+
     def test_catch_data_error(self):
         view = DataViewSet.as_view({'get': 'list'})
         formid = self.xform.pk
@@ -501,6 +537,52 @@ class TestDataViewSet(TestBase):
             **self.extra)
         response = view(request, pk=formid)
 
+    def test_data_keyset_pagination(self):
+        self._make_submissions()
+        view = DataViewSet.as_view({'get': 'list'})
+        formid = self.xform.pk
+        instance_ids = list(self.xform.instances.order_by('id').values_list(
+            'id', flat=True))
+
+        # an empty cursor starts from the first record
+        request = self.factory.get(
+            '/', data={"cursor": "", "page_size": 3}, **self.extra)
+        response = view(request, pk=formid)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([i['_id'] for i in response.data], instance_ids[:3])
+        self.assertTrue(response.has_header('Link'))
+        next_url = response['Link'][1:response['Link'].index('>')]
+        self.assertIn('cursor=', next_url)
+
+        token = next_url.split('cursor=')[1].split('&')[0]
+        request = self.factory.get(
+            '/', data={"cursor": token, "page_size": 3}, **self.extra)
+        response = view(request, pk=formid)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([i['_id'] for i in response.data], instance_ids[3:])
+        self.assertFalse(response.has_header('Link'))
+
+        # keyset on date_modified with fields uses the raw SQL path
+        request = self.factory.get(
+            '/', data={"cursor": "", "cursor_key": "date_modified",
+                       "page_size": 2, "fields": '["_id"]'}, **self.extra)
+        response = view(request, pk=formid)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 2)
+        self.assertTrue(response.has_header('Link'))
+
+        # invalid cursors are not found
+        request = self.factory.get(
+            '/', data={"cursor": "invalid"}, **self.extra)
+        response = view(request, pk=formid)
+        self.assertEqual(response.status_code, 404)
+
+        # sort can not be combined with a cursor
+        request = self.factory.get(
+            '/', data={"cursor": "", "sort": '{"_id": -1}'}, **self.extra)
+        response = view(request, pk=formid)
+        self.assertEqual(response.status_code, 400)
+
     def test_sort_query_param_with_invalid_values(self):
         self._make_submissions()
         view = DataViewSet.as_view({'get': 'list'})
@@ -3,7 +3,7 @@ from builtins import open
 from hashlib import md5
 
 from django.conf import settings
-from django.test import TransactionTestCase
+from django.test import TransactionTestCase, override_settings
 from django.urls import reverse
 from django_digest.test import Client as DigestClient
 from django_digest.test import DigestAuth
@@ -16,6 +16,7 @@ from onadata.apps.api.viewsets.project_viewset import ProjectViewSet
 from onadata.apps.api.viewsets.xform_list_viewset import (
     PreviewXFormListViewSet, XFormListViewSet)
 from onadata.apps.main.models import MetaData
+from onadata.apps.viewer.models.export import Export
 from onadata.libs.permissions import DataEntryRole, ReadOnlyRole, OwnerRole
 
 
@@ -860,6 +861,44 @@ class TestXFormListViewSet(TestAbstractViewSet, TransactionTestCase):
         self.assertEqual(response['Content-Disposition'],
                          'attachment; filename=transportation.csv')
 
+    @override_settings(LINKED_DATASET_BACKGROUND_EXPORTS=True)
+    def test_retrieve_xform_media_linked_xform_background_export(self):
+        data_value = 'xform {} transportation'.format(self.xform.pk)
+        self._add_form_metadata(self.xform, 'media', data_value)
+        self._make_submissions()
+        self.view = XFormListViewSet.as_view(
+            {
+                "get": "media",
+                "head": "media"
+            }
+        )
+
+        def _get_media():
+            request = self.factory.head('/')
+            response = self.view(request, pk=self.xform.pk,
+                                 metadata=self.metadata.pk, format='csv')
+            auth = DigestAuth('bob', 'bobbob')
+            request = self.factory.get('/')
+            request.META.update(auth(request.META, response))
+            return self.view(request, pk=self.xform.pk,
+                             metadata=self.metadata.pk, format='csv')
+
+        # the export is built once and served to every download
+        for _i in range(3):
+            response = _get_media()
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Disposition'],
+                             'attachment; filename=transportation.csv')
+        self.assertEqual(Export.objects.filter(xform=self.xform).count(), 1)
+
+        # the ready export is served while a newer one is built
+        self.xform.instances.first().save()
+        with patch('onadata.apps.viewer.tasks.create_async_export') as task:
+            response = _get_media()
+            self.assertEqual(response.status_code, 200)
+            response = _get_media()
+        self.assertEqual(task.call_count, 1)
+
     def test_retrieve_xform_manifest_linked_form(self):
         # for linked forms check if manifest media download url for csv
         # has a group_delimiter param
@@ -44,7 +44,8 @@ from onadata.libs.permissions import (
     ROLES, DataEntryMinorRole, DataEntryOnlyRole, DataEntryRole,
     EditorMinorRole, EditorRole, ManagerRole, OwnerRole, get_role,
     get_role_in_org, is_organization)
-from onadata.libs.utils.api_export_tools import custom_response_handler
+from onadata.libs.utils.api_export_tools import (custom_response_handler,
+                                                 linked_dataset_response)
 from onadata.libs.utils.cache_tools import (
     PROJ_BASE_FORMS_CACHE, PROJ_FORMS_CACHE, PROJ_NUM_DATASET_CACHE,
     PROJ_OWNER_CACHE, PROJ_SUB_DATE_CACHE, reset_project_cache, safe_delete)
@@ -597,6 +598,13 @@ def get_media_file_response(metadata, request=None):
             dataview = obj if isinstance(obj, DataView) else False
             xform = obj.xform if isinstance(obj, DataView) else obj
 
+            if getattr(settings, 'LINKED_DATASET_BACKGROUND_EXPORTS', False):
+                # serve the latest ready export, rebuilt in the background
+                response = linked_dataset_response(
+                    request, xform, dataview=dataview, filename=filename)
+                if response is not None:
+                    return response
+
             return custom_response_handler(
                 request,
                 xform, {},
@@ -27,8 +27,9 @@ from onadata.libs.utils.viewer_tools import get_path
 
 
 def get_attachment_data(attachment, suffix):
-    if suffix in list(settings.THUMB_CONF):
-        image_url(attachment, suffix)
+    if suffix in list(settings.THUMB_CONF) and \
+            image_url(attachment, suffix) and \
+            suffix in attachment.thumbnails:
         suffix = settings.THUMB_CONF.get(suffix).get('suffix')
         f = default_storage.open(
             get_path(attachment.media_file.name, suffix))
@@ -17,10 +17,8 @@ from rest_framework.response import Response
 
 from onadata.apps.api.tools import get_media_file_response
 from onadata.apps.api.permissions import ViewDjangoObjectPermissions
-from onadata.apps.logger.models.attachment import Attachment
 from onadata.apps.logger.models.instance import Instance
 from onadata.apps.logger.models.xform import XForm
-from onadata.apps.logger.xform_instance_parser import clean_and_parse_xml
 from onadata.apps.main.models.meta_data import MetaData
 from onadata.apps.main.models.user_profile import UserProfile
 from onadata.libs import filters
@@ -29,6 +27,8 @@ from onadata.libs.mixins.openrosa_headers_mixin import get_openrosa_headers
 from onadata.libs.renderers.renderers import TemplateXMLRenderer
 from onadata.libs.serializers.xform_serializer import XFormListSerializer
 from onadata.libs.serializers.xform_serializer import XFormManifestSerializer
+from onadata.libs.utils.logger_tools import get_submission_list_page
+from onadata.libs.utils.logger_tools import get_submission_xml
 from onadata.libs.utils.logger_tools import publish_form
 from onadata.libs.utils.logger_tools import PublishXForm
 from onadata.libs.utils.viewer_tools import get_form
@@ -86,7 +86,9 @@ class BriefcaseViewset(mixins.CreateModelMixin,
         uuid = _extract_uuid(formId)
         username = self.kwargs.get('username')
 
-        obj = get_object_or_404(Instance,
+        queryset = Instance.objects.select_related('xform').prefetch_related(
+            'attachments')
+        obj = get_object_or_404(queryset,
                                 xform__user__username__iexact=username,
                                 xform__id_string__iexact=id_string,
                                 uuid=uuid)
@@ -129,25 +131,9 @@ class BriefcaseViewset(mixins.CreateModelMixin,
                                             deleted_at__isnull=True)
         if xform.encrypted:
             instances = instances.filter(media_all_received=True)
-        instances = instances.order_by('pk')
-        num_entries = self.request.GET.get('numEntries')
-        cursor = self.request.GET.get('cursor')
-
-        cursor = _parse_int(cursor)
-        if cursor:
-            instances = instances.filter(pk__gt=cursor)
-
-        num_entries = _parse_int(num_entries)
-        if num_entries:
-            instances = instances[:num_entries]
-
-        if instances.count():
-            last_instance = instances[instances.count() - 1]
-            self.resumptionCursor = last_instance.pk
-        elif instances.count() == 0 and cursor:
-            self.resumptionCursor = cursor
-        else:
-            self.resumptionCursor = 0
+        instances, self.resumptionCursor = get_submission_list_page(
+            instances, _parse_int(self.request.GET.get('cursor')),
+            _parse_int(self.request.GET.get('numEntries')))
 
         return instances
 
@@ -204,16 +190,9 @@ class BriefcaseViewset(mixins.CreateModelMixin,
     def retrieve(self, request, *args, **kwargs):
         self.object = self.get_object()
 
-        xml_obj = clean_and_parse_xml(self.object.xml)
-        submission_xml_root_node = xml_obj.documentElement
-        submission_xml_root_node.setAttribute(
-            'instanceID', u'uuid:%s' % self.object.uuid)
-        submission_xml_root_node.setAttribute(
-            'submissionDate', self.object.date_created.isoformat()
-        )
         data = {
-            'submission_data': submission_xml_root_node.toxml(),
-            'media_files': Attachment.objects.filter(instance=self.object),
+            'submission_data': get_submission_xml(self.object),
+            'media_files': self.object.attachments.all(),
             'host': request.build_absolute_uri().replace(
                 request.get_full_path(), '')
         }
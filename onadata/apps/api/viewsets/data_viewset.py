@@ -4,7 +4,8 @@ from builtins import str as text
 
 from django.conf import settings
 from django.core.exceptions import PermissionDenied
-from django.db.models import Q
+from django.db.models import Q, TextField
+from django.db.models.functions import Cast
 from django.db.models.query import QuerySet
 from django.db.utils import DataError, OperationalError
 from django.http import Http404
@@ -31,9 +32,11 @@ from onadata.apps.logger.models.instance import Instance
 from onadata.apps.logger.models.xform import XForm
 from onadata.apps.messaging.constants import XFORM, SUBMISSION_DELETED
 from onadata.apps.messaging.serializers import send_message
+from onadata.apps.viewer.models.parsed_instance import ParsedInstance
 from onadata.apps.viewer.models.parsed_instance import get_etag_hash_from_query
 from onadata.apps.viewer.models.parsed_instance import get_sql_with_params
 from onadata.apps.viewer.models.parsed_instance import get_where_clause
+from onadata.apps.viewer.models.parsed_instance import keyset_queryset
 from onadata.apps.viewer.models.parsed_instance import query_data
 from onadata.libs import filters
 from onadata.libs.data import parse_int
@@ -45,6 +48,7 @@ from onadata.libs.mixins.authenticate_header_mixin import \
     AuthenticateHeaderMixin
 from onadata.libs.mixins.cache_control_mixin import CacheControlMixin
 from onadata.libs.mixins.etags_mixin import ETagsMixin
+from onadata.libs.mixins.profiler_mixin import ProfilerMixin
 from onadata.libs.pagination import CountOverridablePageNumberPagination
 from onadata.libs.permissions import CAN_DELETE_SUBMISSION, \
     filter_queryset_xform_meta_perms, filter_queryset_xform_meta_perms_sql
@@ -57,7 +61,7 @@ from onadata.libs.serializers.data_serializer import JsonDataSerializer
 from onadata.libs.serializers.data_serializer import OSMSerializer
 from onadata.libs.serializers.geojson_serializer import GeoJsonSerializer
 from onadata.libs.utils.api_export_tools import custom_response_handler
-from onadata.libs.utils.common_tools import json_stream
+from onadata.libs.utils.common_tools import buffered_stream, json_stream
 from onadata.libs.utils.model_tools import queryset_iterator
 from onadata.libs.utils.viewer_tools import get_form_url, get_enketo_urls
 
@@ -94,7 +98,7 @@ def delete_instance(instance, user):
 class DataViewSet(AnonymousUserPublicFormsMixin,
                   AuthenticateHeaderMixin,
                   ETagsMixin, CacheControlMixin,
-                  BaseViewset,
+                  ProfilerMixin, BaseViewset,
                   ModelViewSet):
     """
     This endpoint provides access to submitted data.
@@ -106,6 +110,7 @@ class DataViewSet(AnonymousUserPublicFormsMixin,
         renderers.CSVRenderer,
         renderers.CSVZIPRenderer,
         renderers.SAVZIPRenderer,
+        renderers.ParquetRenderer,
         renderers.SurveyRenderer,
         renderers.GeoJsonRenderer,
         renderers.KMLRenderer,
@@ -513,9 +518,10 @@ class DataViewSet(AnonymousUserPublicFormsMixin,
                         filter_queryset_xform_meta_perms_sql(self.get_object(),
                                                              self.request.user,
                                                              query)
-                    self.object_list = query_data(xform, query=query,
-                                                  sort=sort, start_index=start,
-                                                  limit=limit, fields=fields)
+                    self.object_list = query_data(
+                        xform, query=query, sort=sort, start_index=start,
+                        limit=limit, fields=fields,
+                        json_text=self._stream_json_text())
                 except NoRecordsPermission:
                     self.object_list = []
 
@@ -536,6 +542,42 @@ class DataViewSet(AnonymousUserPublicFormsMixin,
         except DataError as e:
             raise ParseError(text(e))
 
+    def set_keyset_object_list(self, query, fields, sort, start, cursor):
+        """
+        Sets object_list to the page of records following the cursor
+        position.
+        """
+        page_size = self.paginator.get_page_size(self.request)
+        xform = self.get_object()
+        try:
+            if sort or start is not None:
+                raise ValueError(_(u"sort and start are not supported with "
+                                   u"cursor pagination"))
+            if fields:
+                try:
+                    query = filter_queryset_xform_meta_perms_sql(
+                        xform, self.request.user, query)
+                    self.object_list = query_data(
+                        xform, query=query, fields=fields, limit=page_size,
+                        cursor=cursor)
+                except NoRecordsPermission:
+                    self.object_list = []
+            else:
+                where, where_params = get_where_clause(query)
+                if where:
+                    self.object_list = self.object_list.extra(
+                        where=where, params=where_params)
+                self.object_list = list(keyset_queryset(
+                    self.object_list.only('json', *cursor.fields), cursor,
+                    page_size))
+                if len(self.object_list) == page_size:
+                    last = self.object_list[-1]
+                    cursor.advance([getattr(last, f) for f in cursor.fields])
+        except ValueError as e:
+            raise ParseError(text(e))
+        except DataError as e:
+            raise ParseError(text(e))
+
     def paginate_queryset(self, queryset):
         if self.paginator is None:
             return None
@@ -545,19 +587,40 @@ class DataViewSet(AnonymousUserPublicFormsMixin,
                                                 count=self.data_count)
 
     def _get_data(self, query, fields, sort, start, limit, is_public_request):
-        self.set_object_list(
-            query, fields, sort, start, limit, is_public_request)
-
-        pagination_keys = [self.paginator.page_query_param,
-                           self.paginator.page_size_query_param]
-        query_param_keys = self.request.query_params
-        should_paginate = any([k in query_param_keys for k in pagination_keys])
-        if not isinstance(self.object_list, types.GeneratorType) and \
-                should_paginate:
-            try:
-                self.object_list = self.paginate_queryset(self.object_list)
-            except OperationalError:
-                self.object_list = self.paginate_queryset(self.object_list)
+        cursor = None
+        if not is_public_request:
+            cursor = self.paginator.get_keyset_cursor(self.request)
+
+        if cursor is not None:
+            self.set_keyset_object_list(query, fields, sort, start, cursor)
+            next_link = self.paginator.get_keyset_next_link(
+                self.request, cursor)
+            if next_link:
+                self.headers['Link'] = '<%s>; rel="next"' % next_link
+        else:
+            self.set_object_list(
+                query, fields, sort, start, limit, is_public_request)
+            if self._stream_json_text() and \
+                    isinstance(self.object_list, QuerySet) and \
+                    self.object_list.model is Instance and \
+                    not self.object_list.query.values_select:
+                self.object_list = self.object_list.annotate(
+                    json_text=Cast('json', TextField())).values_list(
+                        'json_text', flat=True)
+
+            pagination_keys = [self.paginator.page_query_param,
+                               self.paginator.page_size_query_param]
+            query_param_keys = self.request.query_params
+            should_paginate = any(
+                [k in query_param_keys for k in pagination_keys])
+            if not isinstance(self.object_list, types.GeneratorType) and \
+                    should_paginate:
+                try:
+                    self.object_list = self.paginate_queryset(
+                        self.object_list)
+                except OperationalError:
+                    self.object_list = self.paginate_queryset(
+                        self.object_list)
 
         STREAM_DATA = getattr(settings, 'STREAM_DATA', False)
         if STREAM_DATA:
@@ -568,16 +631,36 @@ class DataViewSet(AnonymousUserPublicFormsMixin,
 
         return response
 
+    def _stream_json_text(self):
+        """
+        Returns True when submissions are streamed as the JSON text read from
+        the database, without being decoded and encoded again.
+        """
+        return getattr(settings, 'STREAM_DATA', False) and \
+            getattr(settings, 'STREAM_DATA_JSON_PASSTHROUGH', False)
+
     def _get_streaming_response(self):
         """
         Get a StreamingHttpResponse response object
         """
         def get_json_string(item):
+            if isinstance(item, six.string_types):
+                # JSON text selected from the database
+                return item
             return json.dumps(
                 item.json if isinstance(item, Instance) else item)
 
+        records = self.object_list
+        if isinstance(records, QuerySet):
+            # read the records from a server-side cursor instead of
+            # loading the whole result set into the queryset cache
+            records = records.iterator(
+                chunk_size=ParsedInstance.DEFAULT_BATCHSIZE)
+
         response = StreamingHttpResponse(
-            json_stream(self.object_list, get_json_string),
+            buffered_stream(
+                json_stream(records, get_json_string),
+                getattr(settings, 'STREAM_DATA_CHUNK_SIZE', 65536)),
             content_type="application/json"
         )
 
@@ -62,6 +62,7 @@ class DataViewViewSet(AuthenticateHeaderMixin,
         renderers.CSVRenderer,
         renderers.CSVZIPRenderer,
         renderers.SAVZIPRenderer,
+        renderers.ParquetRenderer,
         renderers.ZipRenderer,
     ]
 
@@ -1,8 +1,9 @@
 from reversion.admin import VersionAdmin
 
 from django.contrib import admin
+from django.utils.translation import ugettext_lazy as _
 
-from onadata.apps.logger.models import XForm, Project
+from onadata.apps.logger.models import JSONFieldIndex, XForm, Project
 
 
 class XFormAdmin(VersionAdmin, admin.ModelAdmin):
@@ -36,3 +37,28 @@ class ProjectAdmin(VersionAdmin, admin.ModelAdmin):
 
 
 admin.site.register(Project, ProjectAdmin)
+
+
+class JSONFieldIndexAdmin(admin.ModelAdmin):
+    list_display = ('xform', 'field', 'cast_type', 'query_count',
+                    'last_queried', 'index_name')
+    list_select_related = ('xform',)
+    ordering = ['-query_count']
+    raw_id_fields = ('xform',)
+    readonly_fields = ('query_count', 'last_queried', 'index_name')
+    search_fields = ('field', 'xform__id_string')
+    actions = ['create_index', 'drop_index']
+
+    def create_index(self, request, queryset):
+        for field_index in queryset.filter(index_name__isnull=True):
+            if field_index.is_indexable:
+                field_index.create_index()
+    create_index.short_description = _("Create indexes")
+
+    def drop_index(self, request, queryset):
+        for field_index in queryset.filter(index_name__isnull=False):
+            field_index.drop_index()
+    drop_index.short_description = _("Drop indexes")
+
+
+admin.site.register(JSONFieldIndex, JSONFieldIndexAdmin)
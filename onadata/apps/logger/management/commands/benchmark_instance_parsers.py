@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# vim: ai ts=4 sts=4 et sw=4 fileencoding=utf-8
+"""
+benchmark_instance_parsers - compare the minidom and iterparse submission
+parsers on a submission with its repeats copied to make it large.
+"""
+import copy
+import timeit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.encoding import smart_bytes, smart_text
+from django.utils.translation import ugettext_lazy
+from lxml import etree
+
+from onadata.apps.logger.models import Instance
+from onadata.apps.logger.xform_instance_parser import XFORM_INSTANCE_PARSERS
+
+
+def _copy_repeats(xml, repeats, copies):
+    """
+    Returns the xml with every repeat node followed by copies of itself.
+    """
+    root = etree.fromstring(smart_bytes(xml))
+    nodes = []
+    for repeat in repeats:
+        nodes.extend(root.xpath(repeat))
+    for node in nodes:
+        for _i in range(copies):
+            node.addnext(copy.deepcopy(node))
+
+    return smart_text(etree.tostring(root, encoding='utf-8'))
+
+
+class Command(BaseCommand):
+    help = ugettext_lazy(
+        "Benchmark the submission parser engines on a submission with its "
+        "repeats copied")
+
+    def add_arguments(self, parser):
+        parser.add_argument('instance_id', type=int)
+        parser.add_argument(
+            '--copies', type=int, default=100,
+            help=ugettext_lazy("Copies of each repeat to add, default 100"))
+        parser.add_argument(
+            '--runs', type=int, default=5,
+            help=ugettext_lazy("Parses timed per engine, default 5"))
+
+    def handle(self, *args, **options):
+        try:
+            instance = Instance.objects.select_related('xform').get(
+                pk=options['instance_id'])
+        except Instance.DoesNotExist:
+            raise CommandError("Submission does not exist")
+
+        xform = instance.xform
+        repeats = [e.get_abbreviated_xpath()
+                   for e in xform.get_survey_elements_of_type(u"repeat")]
+        xml = _copy_repeats(instance.xml, repeats, options['copies'])
+        self.stdout.write('{} bytes, {} repeats'.format(
+            len(smart_bytes(xml)), len(repeats)))
+
+        results = []
+        for engine, parser_class in sorted(XFORM_INSTANCE_PARSERS.items()):
+            parser = parser_class(xml, xform)
+            results.append((parser.to_dict(), parser.to_flat_dict(),
+                            parser.get_attributes()))
+            seconds = timeit.timeit(
+                lambda: parser_class(xml, xform), number=options['runs'])
+            self.stdout.write('{}: {:.4f}s per parse'.format(
+                engine, seconds / options['runs']))
+
+        if any(result != results[0] for result in results[1:]):
+            raise CommandError("The parsers' results differ")
@@ -8,12 +8,9 @@ from django.utils.translation import ugettext_lazy
 
 from onadata.apps.logger.models.attachment import Attachment
 from onadata.apps.logger.models.xform import XForm
-from onadata.libs.utils.image_tools import resize, resize_local_env
 from onadata.libs.utils.model_tools import queryset_iterator
 from onadata.libs.utils.viewer_tools import get_path
 
-THUMB_CONF = settings.THUMB_CONF
-
 
 class Command(BaseCommand):
     help = ugettext_lazy("Creates thumbnails for "
@@ -53,26 +50,16 @@ class Command(BaseCommand):
                     "Error: Form with id_string %(id_string)s does not exist" %
                     {'id_string': id_string})
             attachments_qs = attachments_qs.filter(instance__xform=xform)
-        fs = get_storage_class('django.core.files.storage.FileSystemStorage')()
+        default_storage = get_storage_class()()
         for att in queryset_iterator(attachments_qs):
             filename = att.media_file.name
-            default_storage = get_storage_class()()
             full_path = get_path(filename,
                                  settings.THUMB_CONF['small']['suffix'])
-            if options.get('force') is not None:
-                for s in ['small', 'medium', 'large']:
-                    fp = get_path(filename, settings.THUMB_CONF[s]['suffix'])
-                    if default_storage.exists(fp):
-                        default_storage.delete(fp)
-            if not default_storage.exists(full_path):
+            if options.get('force') is not None or not att.thumbnails or \
+                    not default_storage.exists(full_path):
                 try:
-                    if default_storage.__class__ != fs.__class__:
-                        resize(filename, att.extension)
-                    else:
-                        resize_local_env(filename, att.extension)
-                    path = get_path(
-                        filename, '%s' % THUMB_CONF['small']['suffix'])
-                    if default_storage.exists(path):
+                    att.create_thumbnails()
+                    if 'small' in att.thumbnails:
                         self.stdout.write(
                             _(u'Thumbnails created for %(file)s') %
                             {'file': filename})
@@ -80,7 +67,7 @@ class Command(BaseCommand):
                         self.stdout.write(
                             _(u'Problem with the file %(file)s') %
                             {'file': filename})
-                except (IOError, OSError) as e:
+                except Exception as e:
                     self.stderr.write(_(
                         u'Error on %(filename)s: %(error)s')
                         % {'filename': filename, 'error': e})
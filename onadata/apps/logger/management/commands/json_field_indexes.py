@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# vim: ai ts=4 sts=4 et sw=4 fileencoding=utf-8
+"""
+json_field_indexes - report, create and drop the JSON expression indexes of
+frequently queried form fields.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+from django.utils.translation import ugettext_lazy
+
+from onadata.apps.logger.models import JSONFieldIndex
+from onadata.apps.logger.models.json_field_index import (
+    get_json_field_index_usage)
+
+
+class Command(BaseCommand):
+    help = ugettext_lazy(
+        "Report the form fields submission queries filter and sort on, "
+        "create expression indexes for frequently queried fields and drop "
+        "unused ones")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--xform', type=int, help=ugettext_lazy("Limit to a form id"))
+        parser.add_argument(
+            '--create', action='store_true', default=False,
+            help=ugettext_lazy("Create indexes for queried fields"))
+        parser.add_argument(
+            '--min-queries', type=int, default=100,
+            help=ugettext_lazy(
+                "Number of queries of a field to index it, default 100"))
+        parser.add_argument(
+            '--min-submissions', type=int, default=1000,
+            help=ugettext_lazy(
+                "Number of submissions of a form to index its fields, "
+                "default 1000"))
+        parser.add_argument(
+            '--drop-unused', action='store_true', default=False,
+            help=ugettext_lazy("Drop indexes that have never been scanned"))
+
+    def handle(self, *args, **options):
+        if options['create'] and options['drop_unused']:
+            raise CommandError("--create and --drop-unused are exclusive")
+
+        field_indexes = JSONFieldIndex.objects.select_related(
+            'xform').order_by('xform_id', '-query_count')
+        if options['xform']:
+            field_indexes = field_indexes.filter(xform_id=options['xform'])
+
+        if options['create']:
+            self._create_indexes(field_indexes.filter(
+                index_name__isnull=True,
+                query_count__gte=options['min_queries'],
+                xform__num_of_submissions__gte=options['min_submissions']))
+        elif options['drop_unused']:
+            self._drop_unused_indexes(
+                field_indexes.filter(index_name__isnull=False))
+        else:
+            self._report(field_indexes)
+
+    def _create_indexes(self, field_indexes):
+        for field_index in field_indexes:
+            if not field_index.is_indexable:
+                continue
+            try:
+                field_index.create_index()
+            except DatabaseError as e:
+                self.stderr.write('Failed to index {}: {}'.format(
+                    field_index, e))
+            else:
+                self.stdout.write('Created {} on {}'.format(
+                    field_index.index_name, field_index))
+
+    def _drop_unused_indexes(self, field_indexes):
+        field_indexes = list(field_indexes)
+        usage = get_json_field_index_usage(
+            [field_index.index_name for field_index in field_indexes])
+        for field_index in field_indexes:
+            scans, _size = usage.get(field_index.index_name, (0, 0))
+            if not scans:
+                index_name = field_index.index_name
+                field_index.drop_index()
+                self.stdout.write('Dropped {} on {}'.format(
+                    index_name, field_index))
+
+    def _report(self, field_indexes):
+        field_indexes = list(field_indexes)
+        usage = get_json_field_index_usage(
+            [field_index.index_name for field_index in field_indexes
+             if field_index.index_name])
+        for field_index in field_indexes:
+            line = '{} ({} submissions): {} queries'.format(
+                field_index, field_index.xform.num_of_submissions,
+                field_index.query_count)
+            if field_index.index_name:
+                scans, size = usage.get(field_index.index_name, (0, 0))
+                line += ', index {} {} scans {} bytes'.format(
+                    field_index.index_name, scans, size)
+            self.stdout.write(line)
@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+# vim: ai ts=4 sts=4 et sw=4 fileencoding=utf-8
+"""
+set_instance_search_text - sets the search_text of the submissions that
+were created before it was added, in batches.
+"""
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils.translation import ugettext_lazy
+
+
+class Command(BaseCommand):
+    help = ugettext_lazy("Set the search text of existing submissions")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-b', '--batch-size', type=int, default=1000,
+            help=ugettext_lazy("Number of submissions updated at a time"))
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = 0
+        updated = 0
+        while True:
+            # each batch is its own short transaction; the values of the
+            # json, as onadata.apps.logger.models.instance.get_search_text
+            # joins them
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "UPDATE logger_instance SET search_text = ("
+                    "SELECT string_agg(value, E'\\n') "
+                    "FROM jsonb_each_text(json)) "
+                    "WHERE id IN (SELECT id FROM logger_instance "
+                    "WHERE id > %s AND search_text IS NULL "
+                    "ORDER BY id LIMIT %s) RETURNING id",
+                    [last_id, batch_size])
+                ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                break
+
+            last_id = max(ids)
+            updated += len(ids)
+            self.stdout.write('Updated {} submissions'.format(updated))
@@ -8,7 +8,7 @@ from django.utils import timezone
 from django.utils.dateparse import parse_datetime
 from django.utils.translation import ugettext_lazy
 
-from onadata.apps.logger.models import Instance
+from onadata.apps.logger.models import FormAggregate, Instance
 
 
 class Command(BaseCommand):
@@ -19,6 +19,8 @@ class Command(BaseCommand):
         # Reset all sql deletes to None
         Instance.objects.exclude(
             deleted_at=None, xform__downloadable=True).update(deleted_at=None)
+        # the form aggregates are rebuilt when next read
+        FormAggregate.objects.all().delete()
 
         # Get all mongo deletes
         query = '{"$and": [{"_deleted_at": {"$exists": true}}, ' \
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.16 on 2026-10-17 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logger', '0061_auto_20200713_0814'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='instance',
+            index=models.Index(fields=['xform', 'id'],
+                               name='logger_inst_xform_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='instance',
+            index=models.Index(fields=['xform', 'date_modified', 'id'],
+                               name='logger_inst_xform_modified_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 2.2.16 on 2026-10-17 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logger', '0062_auto_20261017_0900'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmissionCountDelta',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True,
+                                        serialize=False, verbose_name='ID')),
+                ('xform_id', models.IntegerField()),
+                ('user_id', models.IntegerField(null=True)),
+                ('delta', models.IntegerField()),
+                ('last_submission_time', models.DateTimeField(null=True)),
+                ('date_created', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 2.2.16 on 2026-10-17 13:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logger', '0063_submissioncountdelta'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FormAggregate',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True,
+                                        serialize=False, verbose_name='ID')),
+                ('field', models.TextField()),
+                ('value', models.TextField()),
+                ('count', models.IntegerField(default=0)),
+                ('xform', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE,
+                    to='logger.XForm')),
+            ],
+            options={
+                'unique_together': {('xform', 'field', 'value')},
+            },
+        ),
+    ]
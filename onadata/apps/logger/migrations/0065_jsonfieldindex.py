@@ -0,0 +1,36 @@
+# Generated by Django 2.2.16 on 2026-10-17 14:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logger', '0064_formaggregate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JSONFieldIndex',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True,
+                                        serialize=False, verbose_name='ID')),
+                ('field', models.TextField()),
+                ('cast_type', models.CharField(blank=True, default='',
+                                               max_length=10)),
+                ('query_count', models.BigIntegerField(default=0)),
+                ('last_queried', models.DateTimeField(blank=True,
+                                                      null=True)),
+                ('index_name', models.CharField(blank=True, max_length=63,
+                                                null=True)),
+                ('date_created', models.DateTimeField(auto_now_add=True)),
+                ('xform', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE,
+                    to='logger.XForm')),
+            ],
+            options={
+                'unique_together': {('xform', 'field', 'cast_type')},
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 2.2.16 on 2026-10-17 16:00
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # the index is built CONCURRENTLY, outside a transaction, so that
+    # submissions are not blocked while it is built. The search_text of the
+    # existing submissions is set by the set_instance_search_text command.
+    atomic = False
+
+    dependencies = [
+        ('logger', '0065_jsonfieldindex'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='instance',
+            name='search_text',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    "CREATE INDEX CONCURRENTLY IF NOT EXISTS "
+                    "logger_inst_search_text_idx ON logger_instance "
+                    "USING gin (search_text gin_trgm_ops)",
+                    "DROP INDEX CONCURRENTLY IF EXISTS "
+                    "logger_inst_search_text_idx"),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='instance',
+                    index=django.contrib.postgres.indexes.GinIndex(
+                        fields=['search_text'],
+                        name='logger_inst_search_text_idx',
+                        opclasses=['gin_trgm_ops']),
+                ),
+            ]),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-17 18:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logger', '0066_instance_search_text'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attachment',
+            name='file_hash',
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 2.2.16 on 2026-10-17 19:00
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logger', '0067_attachment_file_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attachment',
+            name='thumbnails',
+            field=django.contrib.postgres.fields.jsonb.JSONField(
+                blank=True, default=list),
+        ),
+    ]
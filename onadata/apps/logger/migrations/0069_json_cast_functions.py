@@ -0,0 +1,44 @@
+# Generated by Django 2.2.16 on 2026-10-17 20:00
+
+from django.db import migrations
+
+# casts of submission json values that return NULL for values that are not
+# numbers, IMMUTABLE so that the JSON field indexes can be built on them.
+# Plain SQL functions, without an exception handler, are inlined by the
+# planner and can run in parallel scans.
+INT_CAST_FUNCTION_SQL = r"""
+CREATE OR REPLACE FUNCTION onadata_cast_int(value text)
+RETURNS INT AS $$
+    SELECT CASE
+        WHEN value !~ '^\s*[-+]?[0-9]{1,18}\s*$' THEN NULL
+        WHEN CAST(value AS BIGINT) BETWEEN -2147483648 AND 2147483647
+            THEN CAST(value AS INT)
+    END
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+"""
+DECIMAL_CAST_FUNCTION_SQL = r"""
+CREATE OR REPLACE FUNCTION onadata_cast_decimal(value text)
+RETURNS DECIMAL AS $$
+    SELECT CASE
+        WHEN value ~ ('^\s*[-+]?([0-9]+\.?[0-9]*|\.[0-9]+)'
+                      '([eE][-+]?[0-9]{1,3})?\s*$')
+            THEN CAST(value AS DECIMAL)
+    END
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logger', '0068_attachment_thumbnails'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            INT_CAST_FUNCTION_SQL,
+            "DROP FUNCTION IF EXISTS onadata_cast_int(text)"),
+        migrations.RunSQL(
+            DECIMAL_CAST_FUNCTION_SQL,
+            "DROP FUNCTION IF EXISTS onadata_cast_decimal(text)"),
+    ]
@@ -10,4 +10,7 @@ from onadata.apps.logger.models.survey_type import SurveyType # noqa
 from onadata.apps.logger.models.widget import Widget # noqa
 from onadata.apps.logger.models.xform import XForm # noqa
 from onadata.apps.logger.models.submission_review import SubmissionReview # noqa
+from onadata.apps.logger.models.submission_count_delta import SubmissionCountDelta # noqa
+from onadata.apps.logger.models.form_aggregate import FormAggregate # noqa
+from onadata.apps.logger.models.json_field_index import JSONFieldIndex # noqa
 from onadata.apps.logger.xform_instance_parser import InstanceParseError # noqa
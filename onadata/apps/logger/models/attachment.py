@@ -1,9 +1,16 @@
+import logging
 import mimetypes
 import os
-from hashlib import md5
 
-from django.db import models
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.contrib.postgres.fields import JSONField
+from django.db import models, transaction
+from django.db.models.signals import post_save
+
+from onadata.celery import app
+from onadata.libs.utils.common_tools import get_file_hash
+from onadata.libs.utils.image_tools import resize
 
 
 def get_original_filename(filename):
@@ -52,7 +59,11 @@ class Attachment(models.Model):
     date_modified = models.DateTimeField(null=True, auto_now=True)
     deleted_at = models.DateTimeField(null=True, default=None)
     file_size = models.PositiveIntegerField(default=0)
+    # md5 of the file, computed when it is uploaded
+    file_hash = models.CharField(max_length=50, null=True, blank=True)
     name = models.CharField(max_length=100, null=True, blank=True)
+    # THUMB_CONF sizes whose thumbnails have been created
+    thumbnails = JSONField(default=list, blank=True)
     deleted_by = models.ForeignKey(User, related_name='deleted_attachments',
                                    null=True, on_delete=models.SET_NULL)
 
@@ -77,15 +88,61 @@ class Attachment(models.Model):
         except (OSError, AttributeError):
             pass
 
+        update_fields = kwargs.get('update_fields')
+        if self.media_file and not self.file_hash and (
+                update_fields is None or 'file_hash' in update_fields):
+            self.file_hash = self._get_hash()
+
         super(Attachment, self).save(*args, **kwargs)
 
-    @property
-    def file_hash(self):
-        if self.media_file.storage.exists(self.media_file.name):
-            return u'%s' % md5(self.media_file.read()).hexdigest()
-        return u''
+    def _get_hash(self):
+        # pylint: disable=protected-access
+        if self.media_file._committed and \
+                not self.media_file.storage.exists(self.media_file.name):
+            return None
+
+        return get_file_hash(self.media_file)
 
     @property
     def filename(self):
         if self.media_file:
             return os.path.basename(self.media_file.name)
+
+    def create_thumbnails(self):
+        """
+        Create the image thumbnails and record the sizes created.
+        """
+        self.thumbnails = resize(self.media_file.name, self.extension)
+        Attachment.objects.filter(pk=self.pk).update(
+            thumbnails=self.thumbnails)
+
+
+@app.task
+def create_attachment_thumbnails(attachment_id):
+    try:
+        attachment = Attachment.objects.get(pk=attachment_id)
+    except Attachment.DoesNotExist:
+        pass
+    else:
+        try:
+            attachment.create_thumbnails()
+        except Exception:  # pylint: disable=broad-except
+            # the thumbnails will be created when they are requested
+            logging.exception(
+                'Creating the thumbnails of attachment %s failed',
+                attachment_id)
+
+
+def post_save_attachment(sender, instance=None, created=False, **kwargs):
+    """
+    Queue the creation of the thumbnails of new image attachments.
+    """
+    if created and instance.mimetype.startswith('image') and \
+            getattr(settings, 'THUMBNAILS_ASYNC_ENABLED', False):
+        transaction.on_commit(
+            lambda: create_attachment_thumbnails.apply_async(
+                args=[instance.pk]))
+
+
+post_save.connect(post_save_attachment, sender=Attachment,
+                  dispatch_uid='post_save_attachment')
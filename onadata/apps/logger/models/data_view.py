@@ -14,7 +14,10 @@ from django.utils import timezone
 from django.utils.encoding import python_2_unicode_compatible
 from django.utils.translation import ugettext as _
 
-from onadata.apps.viewer.parsed_instance_tools import get_where_clause
+from onadata.apps.logger.models.json_field_index import (
+    record_json_field_queries)
+from onadata.apps.viewer.parsed_instance_tools import (
+    _json_cast_type, _json_sql_str, get_json_query_fields, get_where_clause)
 from onadata.libs.models.sorting import (json_order_by, json_order_by_params,
                                          sort_from_mongo_sort_str)
 from onadata.libs.utils.cache_tools import (DATAVIEW_COUNT,
@@ -25,6 +28,7 @@ from onadata.libs.utils.cache_tools import (DATAVIEW_COUNT,
 from onadata.libs.utils.common_tags import (ATTACHMENTS, EDITED, GEOLOCATION,
                                             ID, LAST_EDITED, MONGO_STRFTIME,
                                             NOTES, SUBMISSION_TIME)
+from onadata.libs.utils.model_tools import chunked_query_iterator
 
 SUPPORTED_FILTERS = ['=', '>', '<', '>=', '<=', '<>', '!=']
 ATTACHMENT_TYPES = ['photo', 'audio', 'video']
@@ -32,20 +36,6 @@ DEFAULT_COLUMNS = [
     ID, SUBMISSION_TIME, EDITED, LAST_EDITED, NOTES]
 
 
-def _json_sql_str(key, known_integers=None, known_dates=None,
-                  known_decimals=None):
-    _json_str = u"json->>%s"
-
-    if known_integers is not None and key in known_integers:
-        _json_str = u"CAST(json->>%s AS INT)"
-    elif known_dates is not None and key in known_dates:
-        _json_str = u"CAST(json->>%s AS TIMESTAMP)"
-    elif known_decimals is not None and key in known_decimals:
-        _json_str = u"CAST(JSON->>%s AS DECIMAL)"
-
-    return _json_str
-
-
 def get_name_from_survey_element(element):
     return element.get_abbreviated_xpath()
 
@@ -244,8 +234,29 @@ class DataView(models.Model):
         return where, where_params
 
     @classmethod
-    def query_iterator(cls, sql, fields=None, params=[], count=False):
-        cursor = connection.cursor()
+    def _record_json_field_queries(cls, data_view, filter_query, sort):
+        if not getattr(settings, 'JSON_FIELD_QUERY_TRACKING_ENABLED', False):
+            return
+
+        known_integers = ['_id'] + data_view.get_known_integers()
+        known_dates = ['_submission_time'] + data_view.get_known_dates()
+        known_decimals = data_view.get_known_decimals()
+        fields = [
+            (qu.get('column'), _json_cast_type(
+                qu.get('column'), known_integers, known_dates,
+                known_decimals))
+            for qu in data_view.query]
+        if filter_query:
+            fields += get_json_query_fields(
+                filter_query, data_view.get_known_integers(), known_decimals)
+        if sort:
+            fields += [(field.lstrip('-'), '') for field in sort]
+
+        record_json_field_queries(data_view.xform.pk, fields)
+
+    @classmethod
+    def query_iterator(cls, sql, fields=None, params=[], count=False,
+                       itersize=None):
         sql_params = tuple(
             i if isinstance(i, tuple) else text(i) for i in params)
 
@@ -259,18 +270,21 @@ class DataView(models.Model):
                 sql = sql[:order_pos]
 
             fields = [u'count']
-
-        cursor.execute(sql, sql_params)
+            cursor = connection.cursor()
+            cursor.execute(sql, sql_params)
+            rows = cursor.fetchall()
+        else:
+            rows = chunked_query_iterator(sql, sql_params, itersize)
 
         if fields is None:
-            for row in cursor.fetchall():
+            for row in rows:
                 yield row[0]
         else:
             if count:
-                for row in cursor.fetchall():
+                for row in rows:
                     yield dict(zip(fields, row))
             else:
-                for row in cursor.fetchall():
+                for row in rows:
                     yield dict(zip(fields, [row[0].get(f) for f in fields]))
 
     @classmethod
@@ -325,6 +339,9 @@ class DataView(models.Model):
             sql += u" WHERE xform_id = %s " + sql_where \
                     + u" AND deleted_at IS NULL"
             params = [data_view.xform.pk] + where_params
+            cls._record_json_field_queries(
+                data_view, filter_query,
+                sort_from_mongo_sort_str(sort) if sort is not None else None)
 
         if sort is not None:
             sort = ['id'] if sort is None\
@@ -351,12 +368,22 @@ class DataView(models.Model):
     @classmethod
     def query_data(cls, data_view, start_index=None, limit=None, count=None,
                    last_submission_time=False, all_data=False, sort=None,
-                   filter_query=None):
+                   filter_query=None, streaming=False, itersize=None):
+        """
+        Returns a list of the dataview records, or an error dict if the
+        query fails. When streaming is True a generator reading the records
+        from a server-side cursor is returned instead and query errors are
+        raised while iterating.
+        """
 
         (sql, columns, params) = cls.generate_query_string(
             data_view, start_index, limit, last_submission_time,
             all_data, sort, filter_query)
 
+        if streaming and not count:
+            return DataView.query_iterator(sql, columns, params,
+                                           itersize=itersize)
+
         try:
             records = [record for record in DataView.query_iterator(sql,
                                                                     columns,
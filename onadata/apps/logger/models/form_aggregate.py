@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+"""
+Form aggregate model class and helpers.
+
+Charts and stats group the submissions of a form by the value of a field
+with a GROUP BY over every submission of the form. When
+FORM_AGGREGATES_ENABLED is set the number of submissions with each value of
+a form's date, numeric and select one fields is kept in the form aggregate
+table instead. It is built in the background from one scan of the form's
+submissions the first time it is read and then updated as submissions are
+saved and deleted, so grouping a field reads one row per distinct value.
+Reads fall back to the GROUP BY query until the aggregates are built.
+
+A rebuild holds an exclusive advisory lock of the form and submissions
+updating the aggregates a shared one, so that the updates of submissions
+saved during the scan are neither lost nor counted twice.
+"""
+import re
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, models, transaction
+from kombu.exceptions import OperationalError
+
+from onadata.apps.logger.models.xform import XForm
+from onadata.celery import app
+from onadata.libs.data.query import (get_date_fields, get_numeric_fields,
+                                     get_select_one_fields)
+from onadata.libs.utils.cache_tools import FORM_AGGREGATE_REBUILD_LOCK
+from onadata.libs.utils.common_tags import SUBMISSION_TIME
+from onadata.libs.utils.model_tools import chunked_query_iterator
+
+# dates are grouped by day, as to_char(to_date(value, 'YYYY-MM-DD'))
+DATE_REGEX = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+# the field of the row that records the form version the aggregates of a
+# form were built for
+VERSION_FIELD = ''
+
+# the first key of the advisory locks of form aggregates, the second is the
+# form id
+FORM_AGGREGATE_LOCK_ID = 7265
+
+
+class FormAggregate(models.Model):
+    """
+    The number of non deleted submissions of a form with a value of a field.
+    Null values are not stored, their count is the number of submissions
+    less the counts of the field's values.
+    """
+    xform = models.ForeignKey(XForm, on_delete=models.CASCADE)
+    field = models.TextField()
+    value = models.TextField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        app_label = 'logger'
+        unique_together = ('xform', 'field', 'value')
+
+
+def get_form_aggregate_fields(xform):
+    """
+    Returns the (field, is_date) pairs of the fields aggregated for a form,
+    an empty list when form aggregates are disabled.
+    """
+    if not getattr(settings, 'FORM_AGGREGATES_ENABLED', False) or \
+            xform.is_merged_dataset:
+        return []
+
+    if not hasattr(xform, '_form_aggregate_fields'):
+        date_fields = get_date_fields(xform)
+        fields = [(field, True) for field in date_fields]
+        for field in get_numeric_fields(xform) + \
+                get_select_one_fields(xform):
+            if field not in date_fields:
+                fields.append((field, False))
+        # pylint: disable=protected-access
+        xform._form_aggregate_fields = fields
+
+    return xform._form_aggregate_fields
+
+
+def _lock_form_aggregates(cursor, xform_id, shared=False):
+    cursor.execute(
+        "SELECT pg_advisory_xact_lock{}(%s, %s)".format(
+            '_shared' if shared else ''),
+        [FORM_AGGREGATE_LOCK_ID, xform_id])
+
+
+def _get_aggregate_values(fields, row):
+    values = Counter()
+    for ((field, is_date), value) in zip(fields, row):
+        if value is not None:
+            if is_date:
+                match = DATE_REGEX.match(value)
+                value = match.group(0) if match else value
+            values[(field, value)] += 1
+
+    return values
+
+
+def _get_aggregate_values_sql(fields):
+    return "SELECT " + ", ".join(["json->>%s"] * len(fields)) + \
+        " FROM logger_instance"
+
+
+def get_submission_aggregate_values(instance):
+    """
+    Returns a Counter of the (field, value) pairs a submission adds to the
+    aggregates of its form as currently saved, None when form aggregates
+    are disabled.
+    """
+    fields = get_form_aggregate_fields(instance.xform)
+    if not fields:
+        return None
+
+    if instance.pk is None:
+        return Counter()
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            _get_aggregate_values_sql(fields) +
+            " WHERE id = %s AND deleted_at IS NULL",
+            [field for (field, is_date) in fields] + [instance.pk])
+        row = cursor.fetchone()
+
+    return Counter() if row is None else _get_aggregate_values(fields, row)
+
+
+def apply_form_aggregate_deltas(xform, deltas):
+    """
+    Adds a Counter of (field, value) deltas to the aggregates of a form with
+    a single INSERT ... ON CONFLICT statement. Nothing is added unless the
+    aggregates have been built for the current version of the form. Call
+    this in the transaction that saved the changes of the deltas.
+    """
+    deltas = sorted(
+        (field, value, delta)
+        for ((field, value), delta) in deltas.items() if delta)
+    if not deltas:
+        return
+
+    table = FormAggregate._meta.db_table
+    with connection.cursor() as cursor:
+        # waits for a rebuild of the aggregates to finish
+        _lock_form_aggregates(cursor, xform.pk, shared=True)
+        cursor.execute(
+            "INSERT INTO {table} AS a (xform_id, field, value, count) "
+            "SELECT %s, d.field, d.value, d.delta "
+            "FROM (VALUES {values}) AS d(field, value, delta) "
+            "WHERE EXISTS (SELECT 1 FROM {table} "
+            "WHERE xform_id = %s AND field = %s AND value = %s) "
+            "ON CONFLICT (xform_id, field, value) "
+            "DO UPDATE SET count = a.count + EXCLUDED.count".format(
+                table=table,
+                values=", ".join(["(%s, %s, %s::integer)"] * len(deltas))),
+            [xform.pk] + [value for row in deltas for value in row] +
+            [xform.pk, VERSION_FIELD, xform.version or ''])
+
+
+@contextmanager
+def updating_form_aggregates(instance):
+    """
+    Updates the aggregates of a submission's form with the changes of the
+    submission saved in the block. The block runs in a transaction holding
+    the shared lock of the aggregates, a rebuild either scans the submission
+    as saved or waits for the block to finish.
+    """
+    if not get_form_aggregate_fields(instance.xform):
+        yield
+        return
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            _lock_form_aggregates(cursor, instance.xform_id, shared=True)
+        previous_values = get_submission_aggregate_values(instance)
+        yield
+        deltas = get_submission_aggregate_values(instance)
+        deltas.subtract(previous_values)
+        apply_form_aggregate_deltas(instance.xform, deltas)
+
+
+def remove_submission_from_form_aggregates(sender, instance, **kwargs):
+    """
+    pre_delete handler, removes a submission from the aggregates of its
+    form before the submission is deleted, in the transaction of the
+    delete.
+    """
+    values = get_submission_aggregate_values(instance)
+    if values:
+        apply_form_aggregate_deltas(
+            instance.xform,
+            Counter(dict((k, -v) for (k, v) in values.items())))
+
+
+def clear_form_aggregates(xform_id):
+    """
+    Deletes the aggregates of a form so that they are rebuilt the next time
+    they are read. Call this after updating submissions in bulk.
+    """
+    FormAggregate.objects.filter(xform_id=xform_id).delete()
+
+
+def _has_form_aggregates(xform):
+    return FormAggregate.objects.filter(
+        xform=xform, field=VERSION_FIELD, value=xform.version or '').exists()
+
+
+def _get_rebuild_lock_key(xform):
+    return u'{}{}-{}'.format(
+        FORM_AGGREGATE_REBUILD_LOCK, xform.pk, xform.version or '')
+
+
+@app.task
+def rebuild_form_aggregates(xform_id):
+    """
+    Builds the aggregates of a form from one scan of its submissions.
+    """
+    xform = XForm.objects.get(pk=xform_id)
+    fields = get_form_aggregate_fields(xform)
+    if not fields:
+        return
+
+    try:
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                _lock_form_aggregates(cursor, xform_id)
+            if _has_form_aggregates(xform):
+                # built by another rebuild while waiting for the lock
+                return
+
+            values = Counter()
+            for row in chunked_query_iterator(
+                    _get_aggregate_values_sql(fields) +
+                    " WHERE xform_id = %s AND deleted_at IS NULL",
+                    [field for (field, is_date) in fields] + [xform_id]):
+                values.update(_get_aggregate_values(fields, row))
+
+            aggregates = [
+                FormAggregate(xform_id=xform_id, field=field, value=value,
+                              count=count)
+                for ((field, value), count) in values.items()]
+            aggregates.append(FormAggregate(
+                xform_id=xform_id, field=VERSION_FIELD,
+                value=xform.version or ''))
+            clear_form_aggregates(xform_id)
+            FormAggregate.objects.bulk_create(aggregates, batch_size=1000)
+    finally:
+        cache.delete(_get_rebuild_lock_key(xform))
+
+
+def get_form_aggregate(xform, field):
+    """
+    Returns the (value, count) pairs of the submissions of a form grouped by
+    a field, ordered by value with the null values last like
+    ``GROUP BY json->>field ORDER BY json->>field``. Returns None when the
+    field is not aggregated or the aggregates of the form are not built yet,
+    the rebuild is then queued.
+    """
+    fields = dict(get_form_aggregate_fields(xform))
+    if field not in fields:
+        return None
+
+    if not _has_form_aggregates(xform):
+        lock_key = _get_rebuild_lock_key(xform)
+        lock_timeout = getattr(settings, 'PENDING_EXPORT_TIME', 5) * 60
+        if cache.add(lock_key, True, lock_timeout):
+            try:
+                rebuild_form_aggregates.apply_async(args=[xform.pk])
+            except OperationalError:
+                cache.delete(lock_key)
+        return None
+
+    result = []
+    total = 0
+    for (aggregate_field, value, count) in FormAggregate.objects.filter(
+            xform=xform, field__in=[field, SUBMISSION_TIME],
+            count__gt=0).order_by('value').values_list(
+                'field', 'value', 'count'):
+        # every submission has a _submission_time
+        if aggregate_field == SUBMISSION_TIME:
+            total += count
+        if aggregate_field == field:
+            result.append((value, count))
+
+    null_count = total - sum(count for (value, count) in result)
+    if null_count > 0:
+        result.append((None, null_count))
+
+    return result
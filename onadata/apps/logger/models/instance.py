@@ -2,6 +2,7 @@
 """
 Instance model class
 """
+import json
 import math
 import pytz
 from datetime import datetime
@@ -11,10 +12,11 @@ from django.contrib.auth.models import User
 from django.contrib.gis.db import models
 from django.contrib.gis.geos import GeometryCollection, Point
 from django.contrib.postgres.fields import JSONField
+from django.contrib.postgres.indexes import GinIndex
 from django.core.cache import cache
-from django.db import connection, transaction
+from django.db import transaction
 from django.db.models import Q
-from django.db.models.signals import post_delete, post_save
+from django.db.models.signals import post_delete, post_save, pre_delete
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.translation import ugettext as _
@@ -22,12 +24,16 @@ from future.utils import python_2_unicode_compatible
 from past.builtins import basestring  # pylint: disable=W0622
 from taggit.managers import TaggableManager
 
+from onadata.apps.logger.models.form_aggregate import (
+    remove_submission_from_form_aggregates, updating_form_aggregates)
+from onadata.apps.logger.models.submission_count_delta import \
+    record_submission_count_delta
 from onadata.apps.logger.models.submission_review import SubmissionReview
 from onadata.apps.logger.models.survey_type import SurveyType
 from onadata.apps.logger.models.xform import XFORM_TITLE_LENGTH, XForm
-from onadata.apps.logger.xform_instance_parser import (XFormInstanceParser,
-                                                       clean_and_parse_xml,
-                                                       get_uuid_from_xml)
+from onadata.apps.logger.xform_instance_parser import (
+    _get_id_string_from_document, clean_and_parse_xml,
+    get_uuid_from_xml, get_xform_instance_parser)
 from onadata.celery import app
 from onadata.libs.data.query import get_numeric_fields
 from onadata.libs.utils.cache_tools import (
@@ -120,25 +126,18 @@ def numeric_checker(string_value):
 
 
 def get_id_string_from_xml_str(xml_str):
-    xml_obj = clean_and_parse_xml(xml_str)
-    root_node = xml_obj.documentElement
-    id_string = root_node.getAttribute(u"id")
+    return _get_id_string_from_document(clean_and_parse_xml(xml_str))
 
-    if len(id_string) == 0:
-        # may be hidden in submission/data/id_string
-        elems = root_node.getElementsByTagName('data')
 
-        for data in elems:
-            for child in data.childNodes:
-                id_string = data.childNodes[0].getAttribute('id')
-
-                if len(id_string) > 0:
-                    break
-
-            if len(id_string) > 0:
-                break
-
-    return id_string
+def get_search_text(data):
+    """
+    Returns the text free-text queries search a submission in, the values of
+    its json, one per line.
+    """
+    return u'\n'.join(
+        value if isinstance(value, basestring)
+        else json.dumps(value, ensure_ascii=False)
+        for value in data.values() if value is not None)
 
 
 def submission_time():
@@ -146,7 +145,7 @@ def submission_time():
 
 
 def _update_submission_count_for_today(
-        form_id: int, incr: bool = True, date_created=None):
+        form_id: int, incr: bool = True, date_created=None, count: int = 1):
     # Track submissions made today
     current_timzone_name = timezone.get_current_timezone_name()
     current_timezone = pytz.timezone(current_timzone_name)
@@ -166,9 +165,9 @@ def _update_submission_count_for_today(
 
     current_count = cache.get(count_cache_key)
     if not current_count and incr:
-        cache.set(count_cache_key, 1, 86400)
+        cache.set(count_cache_key, count, 86400)
     elif incr:
-        cache.incr(count_cache_key)
+        cache.incr(count_cache_key, count)
     elif current_count > 0 and date_created == current_date:
         cache.decr(count_cache_key)
 
@@ -183,64 +182,34 @@ def update_xform_submission_count(instance_id, created):
         except Instance.DoesNotExist:
             pass
         else:
-            # update xform.num_of_submissions
-            cursor = connection.cursor()
-            sql = (
-                'UPDATE logger_xform SET '
-                'num_of_submissions = num_of_submissions + 1, '
-                'last_submission_time = %s '
-                'WHERE id = %s'
-            )
-            params = [instance.date_created, instance.xform_id]
-
-            # update user profile.num_of_submissions
-            cursor.execute(sql, params)
-            sql = (
-                'UPDATE main_userprofile SET '
-                'num_of_submissions = num_of_submissions + 1 '
-                'WHERE user_id = %s'
-            )
-            cursor.execute(sql, [instance.xform.user_id])
+            # update xform and user profile num_of_submissions
+            record_submission_count_delta(
+                instance.xform_id, instance.xform.user_id, 1,
+                instance.date_created)
 
             # Track submissions made today
             _update_submission_count_for_today(instance.xform_id)
 
             safe_delete('{}{}'.format(XFORM_DATA_VERSIONS, instance.xform_id))
-            safe_delete('{}{}'.format(DATAVIEW_COUNT, instance.xform_id))
-            safe_delete('{}{}'.format(XFORM_COUNT, instance.xform_id))
-            # Clear project cache
-            from onadata.apps.logger.models.xform import clear_project_cache
-            clear_project_cache(instance.xform.project_id)
 
 
 def update_xform_submission_count_delete(sender, instance, **kwargs):
     try:
-        xform = XForm.objects.select_for_update().get(pk=instance.xform.pk)
+        xform = XForm.objects.only(
+            'user_id', 'project_id', 'instances_with_geopoints').get(
+                pk=instance.xform_id)
     except XForm.DoesNotExist:
         pass
     else:
-        xform.num_of_submissions -= 1
-        if xform.num_of_submissions < 0:
-            xform.num_of_submissions = 0
-        xform.save(update_fields=['num_of_submissions'])
-        profile_qs = User.profile.get_queryset()
-        try:
-            profile = profile_qs.select_for_update()\
-                .get(pk=xform.user.profile.pk)
-        except profile_qs.model.DoesNotExist:
-            pass
-        else:
-            profile.num_of_submissions -= 1
-            if profile.num_of_submissions < 0:
-                profile.num_of_submissions = 0
-            profile.save()
+        # update xform and user profile num_of_submissions
+        record_submission_count_delta(xform.pk, xform.user_id, -1)
 
         # Track submissions made today
         _update_submission_count_for_today(
             xform.id, incr=False, date_created=instance.date_created)
 
         for a in [PROJ_NUM_DATASET_CACHE, PROJ_SUB_DATE_CACHE]:
-            safe_delete('{}{}'.format(a, xform.project.pk))
+            safe_delete('{}{}'.format(a, xform.project_id))
 
         safe_delete('{}{}'.format(IS_ORG, xform.pk))
         safe_delete('{}{}'.format(XFORM_DATA_VERSIONS, xform.pk))
@@ -249,7 +218,7 @@ def update_xform_submission_count_delete(sender, instance, **kwargs):
 
         if xform.instances.exclude(geom=None).count() < 1:
             xform.instances_with_geopoints = False
-            xform.save()
+            xform.save(update_fields=['instances_with_geopoints'])
 
 
 @app.task
@@ -344,7 +313,12 @@ class InstanceBaseClass(object):
     def _set_json(self):
         self.json = self.get_full_dict()
 
-    def get_full_dict(self, load_existing=True):
+    def get_full_dict(self, load_existing=True, load_related=True):
+        """
+        Returns the data of the submission with its metadata, load_related
+        is False for new submissions, that have no attachments, tags, notes
+        or OSM data to query.
+        """
         doc = self.json or {} if load_existing else {}
         # Get latest dict
         doc = self.get_dict()
@@ -354,10 +328,11 @@ class InstanceBaseClass(object):
                 UUID: self.uuid,
                 ID: self.id,
                 BAMBOO_DATASET_ID: self.xform.bamboo_dataset,
-                ATTACHMENTS: _get_attachments_from_instance(self),
+                ATTACHMENTS: _get_attachments_from_instance(self)
+                if load_related else [],
                 STATUS: self.status,
-                TAGS: list(self.tags.names()),
-                NOTES: self.get_notes(),
+                TAGS: list(self.tags.names()) if load_related else [],
+                NOTES: self.get_notes() if load_related else [],
                 VERSION: self.version,
                 DURATION: self.get_duration(),
                 XFORM_ID_STRING: self._parser.get_xform_id_string(),
@@ -367,8 +342,9 @@ class InstanceBaseClass(object):
                 SUBMITTED_BY: self.user.username if self.user else None
             })
 
-            for osm in self.osm_data.all():
-                doc.update(osm.get_tags_with_prefix())
+            if load_related:
+                for osm in self.osm_data.all():
+                    doc.update(osm.get_tags_with_prefix())
 
             if isinstance(self.deleted_at, datetime):
                 doc[DELETEDAT] = self.deleted_at.strftime(MONGO_STRFTIME)
@@ -400,20 +376,50 @@ class InstanceBaseClass(object):
             })
         return doc
 
+    def set_submission_context(self, submission_context):
+        """
+        Reuses the parsed XML of a SubmissionContext for this instance's XML.
+        """
+        # pylint: disable=attribute-defined-outside-init
+        self._submission_context = submission_context
+
+    def _get_submission_context(self):
+        context = getattr(self, '_submission_context', None)
+        # pylint: disable=no-member
+        if context is not None and context.xml == self.xml:
+            return context
+
+        return None
+
     def _set_parser(self):
-        if not hasattr(self, "_parser"):
-            # pylint: disable=no-member
-            self._parser = XFormInstanceParser(self.xml, self.xform)
+        # the parser, and the dict converted from it, are kept until the
+        # xml changes
+        # pylint: disable=no-member, attribute-defined-outside-init
+        if getattr(self, '_parser_xml', None) is not self.xml or \
+                not hasattr(self, '_parser'):
+            context = self._get_submission_context()
+            self._parser = context.get_parser(self.xform) \
+                if context is not None \
+                else get_xform_instance_parser(self.xml, self.xform)
+            self._parser_xml = self.xml
+            self._flat_dict = None
 
     def _set_survey_type(self):
-        self.survey_type, created = \
-            SurveyType.objects.get_or_create(slug=self.get_root_node_name())
+        # pylint: disable=attribute-defined-outside-init
+        root_node_name = self.get_root_node_name()
+        if self.survey_type_id is None or \
+                getattr(self, '_survey_type_slug', None) != root_node_name:
+            self.survey_type, created = \
+                SurveyType.objects.get_or_create(slug=root_node_name)
+            self._survey_type_slug = root_node_name
 
     def _set_uuid(self):
         # pylint: disable=no-member, attribute-defined-outside-init
         if self.xml and not self.uuid:
+            context = self._get_submission_context()
             # pylint: disable=no-member
-            uuid = get_uuid_from_xml(self.xml)
+            uuid = context.uuid if context is not None \
+                else get_uuid_from_xml(self.xml)
             if uuid is not None:
                 self.uuid = uuid
         set_uuid(self)
@@ -426,9 +432,15 @@ class InstanceBaseClass(object):
         """Return a python object representation of this instance's XML."""
         self._set_parser()
 
-        instance_dict = self._parser.get_flat_dict_with_attributes() if flat \
-            else self._parser.to_dict()
-        return self.numeric_converter(instance_dict)
+        if not flat:
+            return self.numeric_converter(self._parser.to_dict())
+
+        # pylint: disable=attribute-defined-outside-init
+        if force_new or getattr(self, '_flat_dict', None) is None:
+            self._flat_dict = self.numeric_converter(
+                self._parser.get_flat_dict_with_attributes())
+
+        return self._flat_dict.copy()
 
     def get_notes(self):
         # pylint: disable=no-member
@@ -519,12 +531,24 @@ class Instance(models.Model, InstanceBaseClass):
                                 db_index=True)
     # Keep track of submission reviews, only query reviews if true
     has_a_review = models.BooleanField(_("has_a_review"), default=False)
+    # the json values free-text queries search in, trigram indexed
+    search_text = models.TextField(null=True, blank=True)
 
     tags = TaggableManager()
 
     class Meta:
         app_label = 'logger'
         unique_together = ('xform', 'uuid')
+        indexes = [
+            # keyset (cursor) pagination of a form's submissions
+            models.Index(fields=['xform', 'id'],
+                         name='logger_inst_xform_id_idx'),
+            models.Index(fields=['xform', 'date_modified', 'id'],
+                         name='logger_inst_xform_modified_idx'),
+            GinIndex(fields=['search_text'],
+                     name='logger_inst_search_text_idx',
+                     opclasses=['gin_trgm_ops']),
+        ]
 
     @classmethod
     def set_deleted_at(cls, instance_id, deleted_at=timezone.now(), user=None):
@@ -602,14 +626,25 @@ class Instance(models.Model, InstanceBaseClass):
 
         self._check_is_merged_dataset()
         self._check_active(force)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'json' not in update_fields:
+            # none of the values derived from the xml are saved
+            super(Instance, self).save(*args, **kwargs)
+            return
+
+        if update_fields is not None and 'search_text' not in update_fields:
+            kwargs['update_fields'] = list(update_fields) + ['search_text']
+
         self._set_geom()
         self._set_json()
+        self.search_text = get_search_text(self.json)
         self._set_survey_type()
         self._set_uuid()
         # pylint: disable=no-member
         self.version = self.json.get(VERSION, self.xform.version)
 
-        super(Instance, self).save(*args, **kwargs)
+        with updating_form_aggregates(self):
+            super(Instance, self).save(*args, **kwargs)
 
     # pylint: disable=no-member
     def set_deleted(self, deleted_at=timezone.now(), user=None):
@@ -639,14 +674,21 @@ def post_save_submission(sender, instance=None, created=False, **kwargs):
                                            incr=False,
                                            date_created=instance.date_created)
 
+    # submissions created from a SubmissionContext are saved again, with
+    # their full json, once their attachments are saved
+    # pylint: disable=protected-access
+    full_json = created and instance._get_submission_context() is None
+
     if ASYNC_POST_SUBMISSION_PROCESSING_ENABLED:
         update_xform_submission_count.apply_async(args=[instance.pk, created])
-        save_full_json.apply_async(args=[instance.pk, created])
+        if full_json:
+            save_full_json.apply_async(args=[instance.pk, created])
         update_project_date_modified.apply_async(args=[instance.pk, created])
 
     else:
         update_xform_submission_count(instance.pk, created)
-        save_full_json(instance.pk, created)
+        if full_json:
+            save_full_json(instance.pk, created)
         update_project_date_modified(instance.pk, created)
 
 
@@ -656,6 +698,9 @@ post_save.connect(post_save_submission, sender=Instance,
 post_delete.connect(update_xform_submission_count_delete, sender=Instance,
                     dispatch_uid='update_xform_submission_count_delete')
 
+pre_delete.connect(remove_submission_from_form_aggregates, sender=Instance,
+                   dispatch_uid='remove_submission_from_form_aggregates')
+
 
 class InstanceHistory(models.Model, InstanceBaseClass):
 
@@ -734,7 +779,7 @@ class InstanceHistory(models.Model, InstanceBaseClass):
 
     def _set_parser(self):
         if not hasattr(self, "_parser"):
-            self._parser = XFormInstanceParser(
+            self._parser = get_xform_instance_parser(
                 self.xml, self.xform_instance.xform
             )
 
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+JSON field index model class and helpers.
+
+Submission filters and sorts on form fields compare ``json->>'field'``
+expressions of logger_instance.json, which no index covers, so a filtered
+data API or DataView query scans every submission of the form. When
+JSON_FIELD_QUERY_TRACKING_ENABLED is set the fields each form is queried on
+are counted, and partial expression indexes (``WHERE xform_id = X``) are
+built for frequently queried fields with the json_field_indexes command or
+from the admin.
+"""
+import hashlib
+
+from django.conf import settings
+from django.db import connection, models
+from django.utils import timezone
+from django.utils.encoding import python_2_unicode_compatible
+
+from onadata.apps.logger.models.xform import XForm
+
+# the indexed expression of each cast type, matching the expressions built
+# by onadata.apps.viewer.parsed_instance_tools.JSON_SQL_CASTS. The numeric
+# casts return NULL for other values, an index expression that raises would
+# reject those submissions. Casting text to a timestamp is not immutable so
+# those comparisons can not be indexed.
+JSON_INDEX_EXPRESSIONS = {
+    '': u"(json->>%s)",
+    'int': u"(onadata_cast_int(json->>%s))",
+    'decimal': u"(onadata_cast_decimal(json->>%s))",
+}
+
+
+@python_2_unicode_compatible
+class JSONFieldIndex(models.Model):
+    """
+    A form field that submission queries filter or sort on, and the partial
+    expression index built for it.
+    """
+    xform = models.ForeignKey(XForm, on_delete=models.CASCADE)
+    field = models.TextField()
+    cast_type = models.CharField(max_length=10, blank=True, default='')
+    query_count = models.BigIntegerField(default=0)
+    last_queried = models.DateTimeField(null=True, blank=True)
+    index_name = models.CharField(max_length=63, null=True, blank=True)
+    date_created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        app_label = 'logger'
+        unique_together = ('xform', 'field', 'cast_type')
+
+    def __str__(self):
+        return u'{}: {} {}'.format(self.xform_id, self.field, self.cast_type)
+
+    @property
+    def is_indexable(self):
+        return self.cast_type in JSON_INDEX_EXPRESSIONS
+
+    def get_index_name(self):
+        digest = hashlib.md5(u'{}:{}'.format(
+            self.field, self.cast_type).encode('utf-8')).hexdigest()
+
+        return 'logger_inst_json_{}_{}'.format(self.xform_id, digest[:10])
+
+    def create_index(self):
+        """
+        Builds the partial expression index of the field. The index is built
+        CONCURRENTLY, without blocking submissions, outside transactions.
+        """
+        if not self.is_indexable:
+            raise ValueError(
+                u"%s comparisons can not be indexed" % self.cast_type)
+
+        index_name = self.get_index_name()
+        concurrently = not connection.in_atomic_block
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    u"CREATE INDEX {concurrently} IF NOT EXISTS {name} "
+                    u"ON logger_instance {expression} "
+                    u"WHERE xform_id = %s".format(
+                        concurrently='CONCURRENTLY' if concurrently else '',
+                        name=index_name,
+                        expression=JSON_INDEX_EXPRESSIONS[self.cast_type]),
+                    [self.field, self.xform_id])
+        except Exception:
+            # a failed concurrent build leaves an invalid index behind
+            if concurrently:
+                _drop_index(index_name, concurrently)
+            raise
+
+        self.index_name = index_name
+        self.save(update_fields=['index_name'])
+
+    def drop_index(self):
+        """
+        Drops the index of the field.
+        """
+        if self.index_name:
+            _drop_index(self.index_name, not connection.in_atomic_block)
+            self.index_name = None
+            self.save(update_fields=['index_name'])
+
+
+def _drop_index(index_name, concurrently=True):
+    with connection.cursor() as cursor:
+        cursor.execute(u"DROP INDEX {} IF EXISTS {}".format(
+            'CONCURRENTLY' if concurrently else '', index_name))
+
+
+def get_json_field_index_usage(index_names):
+    """
+    Returns {index_name: (number of index scans, index size in bytes)} of
+    the indexes from pg_stat_user_indexes.
+    """
+    if not index_names:
+        return {}
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexrelname, idx_scan, pg_relation_size(indexrelid) "
+            "FROM pg_stat_user_indexes WHERE indexrelname IN %s",
+            [tuple(index_names)])
+
+        return dict((name, (scans, size))
+                    for (name, scans, size) in cursor.fetchall())
+
+
+def record_json_field_queries(xform_id, fields):
+    """
+    Counts a query of a form on (field, cast_type) pairs when
+    JSON_FIELD_QUERY_TRACKING_ENABLED is set.
+    """
+    if not getattr(settings, 'JSON_FIELD_QUERY_TRACKING_ENABLED', False):
+        return
+
+    fields = sorted(set(fields))
+    if not fields:
+        return
+
+    now = timezone.now()
+    table = JSONFieldIndex._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO {table} AS t (xform_id, field, cast_type, "
+            "query_count, last_queried, date_created) VALUES {values} "
+            "ON CONFLICT (xform_id, field, cast_type) DO UPDATE SET "
+            "query_count = t.query_count + 1, "
+            "last_queried = EXCLUDED.last_queried".format(
+                table=table,
+                values=", ".join(["(%s, %s, %s, 1, %s, %s)"] * len(fields))),
+            [value for (field, cast_type) in fields
+             for value in (xform_id, field, cast_type, now, now)])
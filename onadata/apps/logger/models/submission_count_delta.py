@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+Submission count delta model class and helpers.
+
+Every submission created or deleted changes ``XForm.num_of_submissions``
+and ``UserProfile.num_of_submissions``. Updating those rows once per
+submission makes every submission to a form contend for the same row, so
+when SUBMISSION_COUNT_BUFFERING_ENABLED is set the changes are appended to
+the submission count delta table instead and periodically coalesced into
+one bulk UPDATE per table by ``flush_submission_count_deltas``.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, models, transaction
+
+from onadata.celery import app
+from onadata.libs.utils.cache_tools import (
+    DATAVIEW_COUNT, XFORM_COUNT, safe_delete)
+
+SUBMISSION_COUNT_FLUSH_BATCH_SIZE = getattr(
+    settings, 'SUBMISSION_COUNT_FLUSH_BATCH_SIZE', 10000)
+
+
+class SubmissionCountDelta(models.Model):
+    """
+    A pending change to the submission count of a form and its owner.
+
+    The form and user are plain integer columns, not foreign keys, so that
+    buffering a delta never locks or depends on the form being deleted.
+    """
+    xform_id = models.IntegerField()
+    user_id = models.IntegerField(null=True)
+    delta = models.IntegerField()
+    last_submission_time = models.DateTimeField(null=True)
+    date_created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        app_label = 'logger'
+
+
+def coalesce_submission_count_deltas(deltas):
+    """
+    Returns the per xform and per user totals of an iterable of
+    (xform_id, user_id, delta, last_submission_time) tuples.
+    """
+    xform_deltas = {}
+    user_deltas = defaultdict(int)
+    for xform_id, user_id, delta, last_submission_time in deltas:
+        total, latest = xform_deltas.get(xform_id, (0, None))
+        if latest is None or (last_submission_time is not None and
+                              last_submission_time > latest):
+            latest = last_submission_time
+        xform_deltas[xform_id] = (total + delta, latest)
+        if user_id is not None:
+            user_deltas[user_id] += delta
+
+    return xform_deltas, dict(user_deltas)
+
+
+def apply_submission_count_deltas(deltas, xform_counts=True):
+    """
+    Applies (xform_id, user_id, delta, last_submission_time) tuples to
+    the xform and user profile submission counts with one UPDATE ... FROM
+    (VALUES ...) statement per table.
+
+    When ``xform_counts`` is False only the last submission time of the
+    forms is updated, for forms whose submissions have been recounted.
+    """
+    xform_deltas, user_deltas = coalesce_submission_count_deltas(deltas)
+    if not xform_counts:
+        xform_deltas = {k: (0, v[1]) for k, v in xform_deltas.items()}
+    xform_deltas = sorted(
+        (k, v[0], v[1]) for k, v in xform_deltas.items() if v[0] or v[1])
+    user_deltas = sorted((k, v) for k, v in user_deltas.items() if v)
+    project_ids = []
+
+    with connection.cursor() as cursor:
+        if xform_deltas:
+            cursor.execute(
+                "UPDATE logger_xform SET "
+                "num_of_submissions = GREATEST("
+                "logger_xform.num_of_submissions + d.delta, 0), "
+                "last_submission_time = GREATEST("
+                "logger_xform.last_submission_time, d.last_submission_time) "
+                "FROM (VALUES %s) AS d(xform_id, delta, last_submission_time) "
+                "WHERE logger_xform.id = d.xform_id "
+                "RETURNING logger_xform.id, logger_xform.project_id" %
+                ", ".join(["(%s, %s, %s::timestamptz)"] * len(xform_deltas)),
+                [value for row in xform_deltas for value in row])
+            project_ids = cursor.fetchall()
+        if user_deltas:
+            cursor.execute(
+                "UPDATE main_userprofile SET "
+                "num_of_submissions = GREATEST("
+                "main_userprofile.num_of_submissions + d.delta, 0) "
+                "FROM (VALUES %s) AS d(user_id, delta) "
+                "WHERE main_userprofile.user_id = d.user_id" %
+                ", ".join(["(%s, %s)"] * len(user_deltas)),
+                [value for row in user_deltas for value in row])
+
+    from onadata.apps.logger.models.xform import clear_project_cache
+    for xform_id, project_id in project_ids:
+        safe_delete('{}{}'.format(DATAVIEW_COUNT, xform_id))
+        safe_delete('{}{}'.format(XFORM_COUNT, xform_id))
+        clear_project_cache(project_id)
+
+
+def record_submission_count_delta(xform_id, user_id, delta,
+                                  last_submission_time=None):
+    """
+    Buffers a submission count change when
+    SUBMISSION_COUNT_BUFFERING_ENABLED is set, applies it immediately
+    otherwise.
+    """
+    if getattr(settings, 'SUBMISSION_COUNT_BUFFERING_ENABLED', False):
+        SubmissionCountDelta.objects.create(
+            xform_id=xform_id, user_id=user_id, delta=delta,
+            last_submission_time=last_submission_time)
+    else:
+        apply_submission_count_deltas(
+            [(xform_id, user_id, delta, last_submission_time)])
+
+
+def consume_submission_count_deltas(xform_id):
+    """
+    Deletes the pending deltas of a form whose submissions are being
+    recounted, the recount already includes them. Their user profile and
+    last submission time changes are still applied.
+    """
+    with connection.cursor() as cursor:
+        # waits for a flush holding any of the rows, like the flush, before
+        # the form row is locked
+        cursor.execute(
+            "DELETE FROM {table} WHERE xform_id = %s "
+            "RETURNING xform_id, user_id, delta, last_submission_time"
+            .format(table=SubmissionCountDelta._meta.db_table), [xform_id])
+        deltas = cursor.fetchall()
+
+    if deltas:
+        apply_submission_count_deltas(deltas, xform_counts=False)
+
+
+@app.task
+def flush_submission_count_deltas(batch_size=None):
+    """
+    Applies buffered submission count deltas in batches, returns the number
+    of deltas flushed.
+    """
+    batch_size = batch_size or SUBMISSION_COUNT_FLUSH_BATCH_SIZE
+    table = SubmissionCountDelta._meta.db_table
+    flushed = 0
+
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            # SKIP LOCKED lets concurrent flushes take disjoint batches
+            cursor.execute(
+                "DELETE FROM {table} WHERE id IN ("
+                "SELECT id FROM {table} ORDER BY id LIMIT %s "
+                "FOR UPDATE SKIP LOCKED) "
+                "RETURNING xform_id, user_id, delta, last_submission_time"
+                .format(table=table), [batch_size])
+            deltas = cursor.fetchall()
+            apply_submission_count_deltas(deltas)
+
+        flushed += len(deltas)
+        if len(deltas) < batch_size:
+            break
+
+    return flushed
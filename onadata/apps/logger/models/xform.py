@@ -31,6 +31,8 @@ from pyxform.section import RepeatingSection
 from pyxform.xform2json import create_survey_element_from_xml
 from taggit.managers import TaggableManager
 
+from onadata.apps.logger.models.submission_count_delta import \
+    consume_submission_count_deltas
 from onadata.apps.logger.xform_instance_parser import (XLSFormError,
                                                        clean_and_parse_xml)
 from onadata.libs.models.base_model import BaseModel
@@ -48,6 +50,9 @@ from onadata.libs.utils.common_tags import (DURATION, ID, KNOWN_MEDIA_TYPES,
                                             MULTIPLE_SELECT_TYPE)
 from onadata.libs.utils.model_tools import queryset_iterator
 from onadata.libs.utils.mongo import _encode_for_mongo
+from onadata.libs.utils.survey_cache import (SurveyIndex,
+                                             get_survey_cache_key,
+                                             survey_cache)
 
 QUESTION_TYPES_TO_EXCLUDE = [
     u'note',
@@ -301,21 +306,39 @@ class XFormMixin(object):
 
         return id_string
 
+    def _build_survey(self):
+        try:
+            builder = SurveyElementBuilder()
+            return builder.create_survey_element_from_json(self.json)
+        except ValueError:
+            xml = b(bytearray(self.xml, encoding='utf-8'))
+            return create_survey_element_from_xml(xml)
+
+    def _get_survey_index(self):
+        """
+        Returns the SurveyIndex of the form's survey, shared through the
+        process wide survey cache by saved forms.
+        """
+        if not hasattr(self, "_survey_index"):
+            if hasattr(self, "_survey") or self.pk is None:
+                self._survey_index = SurveyIndex(self.get_survey())
+            else:
+                self._survey_index = survey_cache.get(
+                    get_survey_cache_key(self), self._build_survey)
+        return self._survey_index
+
     def get_survey(self):
         if not hasattr(self, "_survey"):
-            try:
-                builder = SurveyElementBuilder()
-                self._survey = \
-                    builder.create_survey_element_from_json(self.json)
-            except ValueError:
-                xml = b(bytearray(self.xml, encoding='utf-8'))
-                self._survey = create_survey_element_from_xml(xml)
+            if self.pk is None:
+                self._survey = self._build_survey()
+            else:
+                self._survey = self._get_survey_index().survey
         return self._survey
 
     survey = property(get_survey)
 
     def get_survey_elements(self):
-        return self.survey.iter_descendants()
+        return iter(self._get_survey_index().elements)
 
     def get_survey_element(self, name_or_xpath):
         """Searches survey element by xpath first,
@@ -397,12 +420,7 @@ class XFormMixin(object):
         ]
 
     def geopoint_xpaths(self):
-        survey_elements = self.get_survey_elements()
-
-        return [
-            e.get_abbreviated_xpath() for e in survey_elements
-            if e.bind.get(u'type') == u'geopoint'
-        ]
+        return list(self._get_survey_index().geopoint_xpaths)
 
     def xpath_of_first_geopoint(self):
         geo_xpaths = self.geopoint_xpaths()
@@ -500,16 +518,11 @@ class XFormMixin(object):
         return [remove_first_index(header) for header in self.get_headers()]
 
     def get_element(self, abbreviated_xpath):
-        if not hasattr(self, "_survey_elements"):
-            self._survey_elements = {}
-            for e in self.get_survey_elements():
-                self._survey_elements[e.get_abbreviated_xpath()] = e
-
         def remove_all_indices(xpath):
             return re.sub(r"\[\d+\]", u"", xpath)
 
         clean_xpath = remove_all_indices(abbreviated_xpath)
-        return self._survey_elements.get(clean_xpath)
+        return self._get_survey_index().elements_by_xpath.get(clean_xpath)
 
     def get_default_language(self):
         if not hasattr(self, '_default_language'):
@@ -544,9 +557,7 @@ class XFormMixin(object):
 
     def get_xpath_cmp(self):
         if not hasattr(self, "_xpaths"):
-            self._xpaths = [
-                e.get_abbreviated_xpath() for e in self.survey_elements
-            ]
+            self._xpaths = self._get_survey_index().xpaths
 
         def xpath_cmp(x, y):
             # For the moment, we aren't going to worry about repeating
@@ -625,9 +636,15 @@ class XFormMixin(object):
             self.has_start_time = False
 
     def get_survey_elements_of_type(self, element_type):
-        return [
-            e for e in self.get_survey_elements() if e.type == element_type
-        ]
+        return list(
+            self._get_survey_index().elements_by_type.get(element_type, []))
+
+    def get_xpaths_of_type(self, element_type):
+        """
+        Returns the abbreviated xpaths of the survey elements of a type.
+        """
+        return list(
+            self._get_survey_index().xpaths_by_type.get(element_type, []))
 
     def get_survey_elements_with_choices(self):
         if not hasattr(self, '_survey_elements_with_choices'):
@@ -646,10 +663,8 @@ class XFormMixin(object):
         Returns abbreviated_xpath for SELECT_ONE questions in the survey.
         """
         if not hasattr(self, '_select_one_xpaths'):
-            self._select_one_xpaths = [
-                e.get_abbreviated_xpath() for e in sum([
-                    self.get_survey_elements_of_type(select)
-                    for select in [constants.SELECT_ONE]], [])]
+            self._select_one_xpaths = self.get_xpaths_of_type(
+                constants.SELECT_ONE)
 
         return self._select_one_xpaths
 
@@ -659,28 +674,21 @@ class XFormMixin(object):
         survey.
         """
         if not hasattr(self, '_select_multiple_xpaths'):
-            self._select_multiple_xpaths = [
-                e.get_abbreviated_xpath() for e in sum([
-                    self.get_survey_elements_of_type(select)
-                    for select in [constants.SELECT_ALL_THAT_APPLY]], [])]
+            self._select_multiple_xpaths = self.get_xpaths_of_type(
+                constants.SELECT_ALL_THAT_APPLY)
 
         return self._select_multiple_xpaths
 
     def get_media_survey_xpaths(self):
-        return [
-            e.get_abbreviated_xpath()
-            for e in sum([
-                self.get_survey_elements_of_type(m) for m in KNOWN_MEDIA_TYPES
-            ], [])
-        ]
+        return sum([
+            self.get_xpaths_of_type(m) for m in KNOWN_MEDIA_TYPES
+        ], [])
 
     def get_osm_survey_xpaths(self):
         """
         Returns abbreviated_xpath for OSM question types in the survey.
         """
-        return [
-            elem.get_abbreviated_xpath()
-            for elem in self.get_survey_elements_of_type('osm')]
+        return self.get_xpaths_of_type('osm')
 
 
 @python_2_unicode_compatible
@@ -936,19 +944,27 @@ class XForm(XFormMixin, BaseModel):
 
     def submission_count(self, force_update=False):
         if self.num_of_submissions == 0 or force_update:
-            if self.is_merged_dataset:
-                count = self.mergedxform.xforms.aggregate(
-                    num=Sum('num_of_submissions')).get('num') or 0
-            else:
-                count = self.instances.filter(deleted_at__isnull=True).count()
-
-            if count != self.num_of_submissions:
-                self.num_of_submissions = count
-                self.save(update_fields=['num_of_submissions'])
-
-                # clear cache
-                key = '{}{}'.format(XFORM_COUNT, self.pk)
-                safe_delete(key)
+            with transaction.atomic():
+                if self.is_merged_dataset:
+                    count = self.mergedxform.xforms.aggregate(
+                        num=Sum('num_of_submissions')).get('num') or 0
+                else:
+                    # the count includes the submissions whose buffered
+                    # deltas have not been flushed yet
+                    consume_submission_count_deltas(self.pk)
+                    self.num_of_submissions = XForm.objects.filter(
+                        pk=self.pk).select_for_update().values_list(
+                            'num_of_submissions', flat=True).get()
+                    count = self.instances.filter(
+                        deleted_at__isnull=True).count()
+
+                if count != self.num_of_submissions:
+                    self.num_of_submissions = count
+                    self.save(update_fields=['num_of_submissions'])
+
+                    # clear cache
+                    key = '{}{}'.format(XFORM_COUNT, self.pk)
+                    safe_delete(key)
 
         return self.num_of_submissions
 
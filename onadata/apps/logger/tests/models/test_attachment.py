@@ -1,11 +1,14 @@
 import os
 from builtins import open
+from hashlib import md5
 
 from django.core.files.base import File
 from django.core.files.storage import default_storage
 from django.core.management import call_command
 from django.db.utils import DataError
+from django.test.utils import override_settings
 from django.utils import timezone
+from mock import patch
 
 from onadata.apps.main.tests.test_base import TestBase
 from onadata.apps.logger.models import Attachment, Instance
@@ -78,6 +81,28 @@ class TestAttachment(TestBase):
                     default_storage.exists(thumbnail))
                 default_storage.delete(thumbnail)
 
+    @override_settings(THUMBNAILS_ASYNC_ENABLED=True)
+    def test_thumbnails_created_on_save(self):
+        media_file = os.path.join(
+            self.this_directory, 'fixtures',
+            'transportation', 'instances', self.surveys[0], self.media_file)
+        attachment = Attachment.objects.create(
+            instance=self.instance,
+            media_file=File(open(media_file, 'rb'), media_file))
+        attachment.refresh_from_db()
+        self.assertEqual(attachment.thumbnails, ['large', 'medium', 'small'])
+
+        filename = attachment.media_file.name.replace('.jpg', '')
+        with patch('django.core.files.storage.FileSystemStorage.exists') \
+                as mock_exists:
+            url = image_url(attachment, 'medium')
+            mock_exists.assert_not_called()
+        self.assertNotEqual(url.find('%s-medium.jpg' % filename), -1)
+        for size in ['small', 'medium', 'large']:
+            thumbnail = '%s-%s.jpg' % (filename, size)
+            self.assertTrue(default_storage.exists(thumbnail))
+            default_storage.delete(thumbnail)
+
     def test_create_thumbnails_command(self):
         call_command("create_image_thumbnails")
         for attachment in Attachment.objects.filter(instance=self.instance):
@@ -128,3 +153,21 @@ class TestAttachment(TestBase):
         self.assertEqual(path,
                          'bob/attachments/{}_{}/1335783522563.jpg'.format(
                              self.xform.id, self.xform.id_string))
+
+    def test_file_hash(self):
+        """
+        Test the file hash is stored when the file is uploaded and set by
+        the set_media_file_hash command for existing attachments.
+        """
+        media_file = os.path.join(
+            self.this_directory, 'fixtures',
+            'transportation', 'instances', self.surveys[0], self.media_file)
+        with open(media_file, 'rb') as f:
+            file_hash = md5(f.read()).hexdigest()
+        self.assertEqual(self.attachment.file_hash, file_hash)
+
+        Attachment.objects.filter(pk=self.attachment.pk).update(
+            file_hash=None)
+        call_command('set_media_file_hash')
+        self.attachment.refresh_from_db()
+        self.assertEqual(self.attachment.file_hash, file_hash)
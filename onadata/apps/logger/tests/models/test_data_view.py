@@ -1,4 +1,5 @@
 import os
+import types
 from builtins import str
 from django.conf import settings
 from django.db import connection
@@ -79,9 +80,9 @@ class TestIntegratedDataView(TestAbstractViewSet):
     def test_generate_query_string_for_data_without_filter(self):
         expected_sql = "SELECT json FROM "\
                        "logger_instance WHERE xform_id = %s  AND "\
-                       "CAST(json->>%s AS INT) > %s AND "\
-                       "CAST(json->>%s AS INT) < %s AND deleted_at IS NULL"\
-                       " ORDER BY id"
+                       "onadata_cast_int(json->>%s) > %s AND "\
+                       "onadata_cast_int(json->>%s) < %s AND "\
+                       "deleted_at IS NULL ORDER BY id"
 
         (sql, columns, params) = DataView.generate_query_string(
             self.data_view,
@@ -102,8 +103,9 @@ class TestIntegratedDataView(TestAbstractViewSet):
     def test_generate_query_string_for_data_with_limit_filter(self):
         limit_filter = 1
         expected_sql = "SELECT json FROM logger_instance"\
-                       " WHERE xform_id = %s  AND CAST(json->>%s AS INT) > %s"\
-                       " AND CAST(json->>%s AS INT) < %s AND deleted_at "\
+                       " WHERE xform_id = %s  AND "\
+                       "onadata_cast_int(json->>%s) > %s"\
+                       " AND onadata_cast_int(json->>%s) < %s AND deleted_at "\
                        "IS NULL ORDER BY id LIMIT %s"
 
         (sql, columns, params) = DataView.generate_query_string(
@@ -126,9 +128,10 @@ class TestIntegratedDataView(TestAbstractViewSet):
     def test_generate_query_string_for_data_with_start_index_filter(self):
         start_index = 2
         expected_sql = "SELECT json FROM logger_instance WHERE"\
-                       " xform_id = %s  AND CAST(json->>%s AS INT) > %s AND"\
-                       " CAST(json->>%s AS INT) < %s AND deleted_at IS NULL "\
-                       "ORDER BY id OFFSET %s"
+                       " xform_id = %s  AND "\
+                       "onadata_cast_int(json->>%s) > %s AND"\
+                       " onadata_cast_int(json->>%s) < %s AND "\
+                       "deleted_at IS NULL ORDER BY id OFFSET %s"
 
         (sql, columns, params) = DataView.generate_query_string(
             self.data_view,
@@ -153,9 +156,10 @@ class TestIntegratedDataView(TestAbstractViewSet):
     def test_generate_query_string_for_data_with_sort_column_asc(self):
         sort = '{"age":1}'
         expected_sql = "SELECT json FROM logger_instance WHERE"\
-                       " xform_id = %s  AND CAST(json->>%s AS INT) > %s AND"\
-                       " CAST(json->>%s AS INT) < %s AND deleted_at IS NULL"\
-                       " ORDER BY  json->>%s ASC"
+                       " xform_id = %s  AND "\
+                       "onadata_cast_int(json->>%s) > %s AND"\
+                       " onadata_cast_int(json->>%s) < %s AND "\
+                       "deleted_at IS NULL ORDER BY  json->>%s ASC"
 
         (sql, columns, params) = DataView.generate_query_string(
             self.data_view,
@@ -177,9 +181,10 @@ class TestIntegratedDataView(TestAbstractViewSet):
     def test_generate_query_string_for_data_with_sort_column_desc(self):
         sort = '{"age": -1}'
         expected_sql = "SELECT json FROM logger_instance WHERE"\
-                       " xform_id = %s  AND CAST(json->>%s AS INT) > %s AND"\
-                       " CAST(json->>%s AS INT) < %s AND deleted_at IS NULL"\
-                       " ORDER BY  json->>%s DESC"
+                       " xform_id = %s  AND "\
+                       "onadata_cast_int(json->>%s) > %s AND"\
+                       " onadata_cast_int(json->>%s) < %s AND "\
+                       "deleted_at IS NULL ORDER BY  json->>%s DESC"
 
         (sql, columns, params) = DataView.generate_query_string(
             self.data_view,
@@ -197,3 +202,12 @@ class TestIntegratedDataView(TestAbstractViewSet):
                                                                 self.count)]
 
         self.assertTrue(self.is_sorted_desc([r.get("age") for r in records]))
+
+    def test_query_data_streaming(self):
+        records = DataView.query_data(self.data_view)
+        streamed = DataView.query_data(self.data_view, streaming=True,
+                                       itersize=1)
+
+        self.assertIsInstance(streamed, types.GeneratorType)
+        self.assertEqual(list(streamed), records)
+        self.assertEqual(len(records), 3)
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+test_form_aggregate module
+"""
+from django.test.utils import override_settings
+from mock import patch
+
+from onadata.apps.logger.models import FormAggregate, Instance
+from onadata.apps.logger.models.form_aggregate import (
+    get_form_aggregate, get_form_aggregate_fields, rebuild_form_aggregates)
+from onadata.apps.main.tests.test_base import TestBase
+from onadata.libs.data.query import _execute_query, _postgres_count_group
+
+
+@override_settings(FORM_AGGREGATES_ENABLED=True)
+class TestFormAggregate(TestBase):
+    """
+    Test per form aggregates of field values.
+    """
+    def _assert_aggregates_match_query(self):
+        fields = get_form_aggregate_fields(self.xform)
+        self.assertTrue(fields)
+        for (field, is_date) in fields:
+            expected = [
+                (row[0], row[1]) for row in _execute_query(
+                    _postgres_count_group(field, field, self.xform),
+                    to_dict=False)]
+            self.assertEqual(
+                get_form_aggregate(self.xform, field), expected, field)
+
+    def test_aggregates_are_disabled_by_default(self):
+        self._publish_transportation_form_and_submit_instance()
+        with override_settings(FORM_AGGREGATES_ENABLED=False):
+            self.assertIsNone(
+                get_form_aggregate(self.xform, '_submission_time'))
+        self.assertEqual(FormAggregate.objects.count(), 0)
+
+    def test_aggregates_are_updated_with_submissions(self):
+        self._publish_transportation_form()
+        self._submit_transport_instance(survey_at=0)
+        # the first read queues the build and falls back to the query
+        with patch('onadata.apps.logger.models.form_aggregate.'
+                   'rebuild_form_aggregates.apply_async') as apply_async:
+            self.assertIsNone(
+                get_form_aggregate(self.xform, '_submission_time'))
+            self.assertIsNone(
+                get_form_aggregate(self.xform, '_submission_time'))
+        apply_async.assert_called_once_with(args=[self.xform.pk])
+        self.assertFalse(FormAggregate.objects.filter(
+            xform=self.xform).exists())
+
+        rebuild_form_aggregates(self.xform.pk)
+        self._assert_aggregates_match_query()
+        # a second rebuild of the same version does nothing
+        rebuild_form_aggregates(self.xform.pk)
+        self._assert_aggregates_match_query()
+
+        # updated as submissions are added, edited and deleted
+        for survey_at in range(1, 4):
+            self._submit_transport_instance(survey_at=survey_at)
+        self._assert_aggregates_match_query()
+
+        instance = Instance.objects.filter(xform=self.xform).first()
+        instance.save()
+        self._assert_aggregates_match_query()
+
+        instance.set_deleted()
+        self._assert_aggregates_match_query()
+
+        Instance.objects.filter(
+            xform=self.xform, deleted_at__isnull=True).first().delete()
+        self._assert_aggregates_match_query()
@@ -1,7 +1,9 @@
 import os
 from datetime import datetime
 from datetime import timedelta
+from io import StringIO
 
+from django.core.management import call_command
 from django.http.request import HttpRequest
 from django.utils.timezone import utc
 from django_digest.test import DigestAuth
@@ -189,6 +191,40 @@ class TestInstance(TestBase):
         self.assertEqual(self.xform.instances.count(), 4)
         self.assertEqual(len(data), 3)
 
+    def test_query_free_text(self):
+        self._publish_transportation_form()
+        self._make_submissions()
+        instance = Instance.objects.get(
+            uuid='5b2cc313-fc09-437e-8149-fcd32f695d41')
+        self.assertIn(instance.uuid, instance.search_text.split('\n'))
+
+        # free-text queries search the values of the submissions
+        data = [i.get('_id') for i in query_data(
+            self.xform, query='5B2CC313', fields='["_id"]')]
+        self.assertEqual(data, [instance.pk])
+        data = [i.get('_id') for i in query_data(self.xform, query='5b2cc313')]
+        self.assertEqual(data, [instance.pk])
+        self.assertEqual(
+            list(query_data(self.xform, query='_bamboo_dataset_id')), [])
+
+    def test_set_instance_search_text_command(self):
+        self._publish_transportation_form()
+        self._make_submissions()
+        Instance.objects.update(search_text=None)
+        instance = Instance.objects.get(
+            uuid='5b2cc313-fc09-437e-8149-fcd32f695d41')
+        # submissions without a search text are searched in their json
+        data = [i.get('_id') for i in query_data(self.xform, query='5b2cc313')]
+        self.assertEqual(data, [instance.pk])
+
+        call_command('set_instance_search_text', batch_size=1,
+                     stdout=StringIO())
+        instance = Instance.objects.get(
+            uuid='5b2cc313-fc09-437e-8149-fcd32f695d41')
+        self.assertIn(instance.uuid, instance.search_text.split('\n'))
+        self.assertFalse(
+            Instance.objects.filter(search_text__isnull=True).exists())
+
     @patch('onadata.apps.logger.models.instance.submission_time')
     def test_query_filter_by_datetime_field(self, mock_time):
         self._publish_transportation_form()
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+test_json_field_index module
+"""
+import json
+from decimal import Decimal
+
+from django.db import connection
+from django.test.utils import override_settings
+
+from onadata.apps.logger.models import JSONFieldIndex
+from onadata.apps.main.tests.test_base import TestBase
+from onadata.apps.viewer.models.parsed_instance import query_data
+from onadata.apps.viewer.parsed_instance_tools import get_json_query_fields
+
+
+class TestJSONFieldIndex(TestBase):
+    """
+    Test tracking queried JSON fields and their expression indexes.
+    """
+    def test_get_json_query_fields(self):
+        self.assertEqual(
+            get_json_query_fields(
+                {'age': {'$gt': 5}, 'height': {'$lt': 2.5}, 'name': 'x',
+                 '_submission_time': {'$gte': '2020-01-01'}},
+                ['age'], ['height']),
+            [('age', 'int'), ('height', 'decimal'), ('name', '')])
+        self.assertEqual(
+            get_json_query_fields(json.dumps({'$or': [{'a': 1}, {'b': 2}]})),
+            [('a', ''), ('b', '')])
+        self.assertEqual(get_json_query_fields('some text'), [])
+
+    def test_queries_are_not_tracked_by_default(self):
+        self._publish_transportation_form_and_submit_instance()
+        list(query_data(self.xform, query={'transport/available_transportation'
+                                           '_types_to_referral_facility':
+                                           'none'}))
+        self.assertEqual(JSONFieldIndex.objects.count(), 0)
+
+    @override_settings(JSON_FIELD_QUERY_TRACKING_ENABLED=True)
+    def test_queried_fields_are_indexed(self):
+        self._publish_transportation_form_and_submit_instance()
+        field = 'transport/available_transportation_types_to_referral_facility'
+        for _i in range(2):
+            list(query_data(self.xform, query={field: 'none'},
+                            sort='{"_submission_time": -1}'))
+
+        field_index = JSONFieldIndex.objects.get(xform=self.xform, field=field)
+        self.assertEqual(field_index.cast_type, '')
+        self.assertEqual(field_index.query_count, 2)
+        self.assertIsNotNone(field_index.last_queried)
+        self.assertTrue(JSONFieldIndex.objects.filter(
+            xform=self.xform, field='_submission_time').exists())
+
+        field_index.create_index()
+        self.assertEqual(field_index.index_name,
+                         field_index.get_index_name())
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT indexdef FROM pg_indexes WHERE indexname = %s",
+                [field_index.index_name])
+            (indexdef,) = cursor.fetchone()
+        self.assertIn(field, indexdef)
+        self.assertIn('xform_id = {}'.format(self.xform.pk), indexdef)
+
+        field_index.drop_index()
+        self.assertIsNone(field_index.index_name)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM pg_indexes WHERE indexname = %s",
+                [field_index.get_index_name()])
+            self.assertIsNone(cursor.fetchone())
+
+    def test_numeric_index_accepts_non_numeric_values(self):
+        self._publish_transportation_form()
+        field = 'transport/available_transportation_types_to_referral_facility'
+        field_index = JSONFieldIndex.objects.create(
+            xform=self.xform, field=field, cast_type='int')
+        field_index.create_index()
+
+        # the submitted values, e.g. 'none', are not integers
+        self._make_submissions()
+        self.assertEqual(self.xform.instances.count(), len(self.surveys))
+
+        field_index.drop_index()
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT onadata_cast_int(' -12 '), onadata_cast_int('none'), "
+                "onadata_cast_int('99999999999'), onadata_cast_int('1.5'), "
+                "onadata_cast_decimal('1.5e3'), onadata_cast_decimal('.5'), "
+                "onadata_cast_decimal('none')")
+            self.assertEqual(cursor.fetchone(),
+                             (-12, None, None, None, 1500, Decimal('0.5'),
+                              None))
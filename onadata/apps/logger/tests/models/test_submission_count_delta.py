@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+test_submission_count_delta module
+"""
+from datetime import datetime
+
+from django.test.utils import override_settings
+from django.utils.timezone import utc
+
+from onadata.apps.logger.models import Instance, SubmissionCountDelta, XForm
+from onadata.apps.logger.models.submission_count_delta import (
+    coalesce_submission_count_deltas, flush_submission_count_deltas)
+from onadata.apps.main.models import UserProfile
+from onadata.apps.main.tests.test_base import TestBase
+
+
+class TestSubmissionCountDelta(TestBase):
+    """
+    Test buffered submission count updates.
+    """
+    def test_coalesce_submission_count_deltas(self):
+        earlier = datetime(2020, 1, 1, tzinfo=utc)
+        later = datetime(2020, 1, 2, tzinfo=utc)
+        xform_deltas, user_deltas = coalesce_submission_count_deltas([
+            (1, 10, 1, earlier),
+            (1, 10, 1, later),
+            (1, 10, -1, None),
+            (2, 10, 1, earlier),
+        ])
+        self.assertEqual(xform_deltas, {1: (1, later), 2: (1, earlier)})
+        self.assertEqual(user_deltas, {10: 2})
+
+    def test_unbuffered_counts_are_updated_immediately(self):
+        self._publish_transportation_form_and_submit_instance()
+        self.assertEqual(SubmissionCountDelta.objects.count(), 0)
+        self.assertEqual(
+            XForm.objects.get(pk=self.xform.pk).num_of_submissions, 1)
+        self.assertEqual(
+            UserProfile.objects.get(user=self.user).num_of_submissions, 1)
+
+    @override_settings(SUBMISSION_COUNT_BUFFERING_ENABLED=True)
+    def test_buffered_counts_are_applied_on_flush(self):
+        self._publish_transportation_form()
+        for survey_at in range(2):
+            self._submit_transport_instance(survey_at=survey_at)
+
+        self.assertEqual(SubmissionCountDelta.objects.count(), 2)
+        xform = XForm.objects.get(pk=self.xform.pk)
+        self.assertEqual(xform.num_of_submissions, 0)
+
+        self.assertEqual(flush_submission_count_deltas(batch_size=1), 2)
+        self.assertEqual(SubmissionCountDelta.objects.count(), 0)
+        xform = XForm.objects.get(pk=self.xform.pk)
+        self.assertEqual(xform.num_of_submissions, 2)
+        self.assertEqual(
+            xform.last_submission_time,
+            Instance.objects.filter(xform=xform).latest(
+                'date_created').date_created)
+        self.assertEqual(
+            UserProfile.objects.get(user=self.user).num_of_submissions, 2)
+
+        # deletes use the same buffer
+        Instance.objects.filter(xform=xform).first().delete()
+        self.assertEqual(
+            XForm.objects.get(pk=self.xform.pk).num_of_submissions, 2)
+        self.assertEqual(flush_submission_count_deltas(), 1)
+        self.assertEqual(
+            XForm.objects.get(pk=self.xform.pk).num_of_submissions, 1)
+        self.assertEqual(
+            UserProfile.objects.get(user=self.user).num_of_submissions, 1)
+
+    @override_settings(SUBMISSION_COUNT_BUFFERING_ENABLED=True)
+    def test_recount_consumes_pending_deltas(self):
+        self._publish_transportation_form()
+        for survey_at in range(2):
+            self._submit_transport_instance(survey_at=survey_at)
+        self.assertEqual(SubmissionCountDelta.objects.count(), 2)
+
+        xform = XForm.objects.get(pk=self.xform.pk)
+        self.assertEqual(xform.submission_count(force_update=True), 2)
+        self.assertEqual(SubmissionCountDelta.objects.count(), 0)
+        # the user profile changes of the consumed deltas are applied
+        self.assertEqual(
+            UserProfile.objects.get(user=self.user).num_of_submissions, 2)
+
+        self.assertEqual(flush_submission_count_deltas(), 0)
+        self.assertEqual(
+            XForm.objects.get(pk=self.xform.pk).num_of_submissions, 2)
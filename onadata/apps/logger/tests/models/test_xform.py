@@ -2,16 +2,20 @@
 """
 test_xform module
 """
+import json
 import os
 
 from builtins import str as text
+from django.test import TestCase
 from past.builtins import basestring  # pylint: disable=redefined-builtin
+from pyxform.survey import Survey
 
 from onadata.apps.logger.models import Instance, XForm
 from onadata.apps.logger.models.xform import (DuplicateUUIDError,
                                               check_xform_uuid)
 from onadata.apps.main.tests.test_base import TestBase
 from onadata.apps.logger.xform_instance_parser import XLSFormError
+from onadata.libs.utils.survey_cache import SurveyCache, survey_cache
 
 
 class TestXForm(TestBase):
@@ -223,3 +227,54 @@ class TestXForm(TestBase):
 
         with self.assertRaises(XLSFormError):
             xform.save()
+
+    def test_survey_is_shared_between_form_loads(self):
+        """Test the survey of a form is built once per form version"""
+        self._publish_transportation_form()
+        survey_cache.clear()
+        xform = XForm.objects.get(pk=self.xform.id)
+        survey = xform.survey
+        self.assertIs(XForm.objects.get(pk=self.xform.id).survey, survey)
+        self.assertEqual(len(survey_cache), 1)
+        self.assertEqual(
+            [e.get_abbreviated_xpath()
+             for e in xform.get_survey_elements_of_type('integer')],
+            xform.get_xpaths_of_type('integer'))
+        self.assertEqual(
+            xform.get_element('transport/loop_over_transport_types_frequency'
+                              '/ambulance/frequency_to_referral_facility')
+            .name, 'frequency_to_referral_facility')
+
+        # a changed form does not get the survey of its previous version
+        changed_xform = XForm.objects.get(pk=self.xform.id)
+        changed_xform.json = json.dumps(
+            dict(json.loads(changed_xform.json), title='changed'))
+        self.assertIsNot(changed_xform.survey, survey)
+        self.assertEqual(len(survey_cache), 2)
+
+
+class TestSurveyCache(TestCase):
+    """
+    Test the survey cache is a bounded LRU cache.
+    """
+    def test_least_recently_used_survey_is_evicted(self):
+        cache = SurveyCache(2)
+        built = []
+
+        def get(name):
+            def build():
+                built.append(name)
+                return Survey(name=name)
+            return cache.get(name, build).survey
+
+        get('a')
+        get('b')
+        # a is used last so b is evicted
+        self.assertEqual(get('a').name, 'a')
+        get('c')
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(built, ['a', 'b', 'c'])
+        get('a')
+        self.assertEqual(built, ['a', 'b', 'c'])
+        get('b')
+        self.assertEqual(built, ['a', 'b', 'c', 'b'])
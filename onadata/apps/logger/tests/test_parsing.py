@@ -6,9 +6,9 @@ from xml.dom import minidom
 
 from onadata.apps.main.tests.test_base import TestBase
 from onadata.apps.logger.xform_instance_parser import XFormInstanceParser,\
-    xpath_from_xml_node
+    xpath_from_xml_node, IterparseXFormInstanceParser
 from onadata.apps.logger.xform_instance_parser import get_uuid_from_xml,\
-    get_meta_from_xml, get_deprecated_uuid_from_xml
+    get_meta_from_xml, get_deprecated_uuid_from_xml, SubmissionContext
 from onadata.libs.utils.common_tags import XFORM_ID_STRING
 from onadata.apps.logger.models.xform import XForm
 from onadata.apps.logger.xform_instance_parser import _xml_node_to_dict,\
@@ -155,6 +155,50 @@ class TestXFormInstanceParser(TestBase):
         deprecatedID = get_deprecated_uuid_from_xml(xml_str)
         self.assertEqual(deprecatedID, "729f173c688e482486a48661700455ff")
 
+    def test_submission_context(self):
+        self._publish_and_submit_new_repeats()
+        with open(
+            os.path.join(
+                os.path.dirname(__file__), "..", "fixtures", "tutorial",
+                "instances", "tutorial_2012-06-27_11-27-53_w_uuid_edited.xml"),
+                "r") as xml_file:
+            xml_str = xml_file.read()
+        context = SubmissionContext(xml_str)
+        self.assertEqual(context.uuid, get_uuid_from_xml(xml_str))
+        self.assertEqual(context.deprecated_uuid,
+                         get_deprecated_uuid_from_xml(xml_str))
+        self.assertEqual(context.id_string, 'tutorial')
+        self.assertEqual(context.get_root_node_name(), 'tutorial')
+        self.assertIsNone(context.submission_date)
+
+        # the parser of a form reuses the parsed document
+        context = SubmissionContext(self.xml)
+        parser = context.get_parser(self.xform)
+        self.assertIs(parser, context.get_parser(self.xform))
+        self.assertEqual(parser.to_dict(),
+                         XFormInstanceParser(self.xml, self.xform).to_dict())
+
+        instance = self.xform.instances.first()
+        self.assertEqual(instance.get_dict(), instance.get_dict())
+        self.assertIsNot(instance.get_dict(), instance.get_dict())
+
+    def test_iterparse_parser_matches_minidom_parser(self):
+        self._publish_and_submit_new_repeats()
+        # indented, with repeated nodes, comments and namespaces
+        xml = self.xml.replace(
+            u'<info>', u'<!-- comment --><info xmlns:orx="http://o">', 1)
+        for xml_str in [self.xml, xml]:
+            parser = XFormInstanceParser(xml_str, self.xform)
+            iterparser = IterparseXFormInstanceParser(xml_str, self.xform)
+            self.assertEqual(parser.to_dict(), iterparser.to_dict())
+            self.assertEqual(parser.to_flat_dict(), iterparser.to_flat_dict())
+            self.assertEqual(parser.get_attributes(),
+                             iterparser.get_attributes())
+            self.assertEqual(parser.get_root_node_name(),
+                             iterparser.get_root_node_name())
+            self.assertEqual(parser.get_root_node().toxml(),
+                             iterparser.get_root_node().toxml())
+
     def test_parse_xform_nested_repeats_multiple_nodes(self):
         self._create_user_and_login()
         # publish our form which contains some some repeats
@@ -29,7 +29,6 @@ from django.views.decorators.http import (require_GET, require_http_methods,
 from django_digest import HttpDigestAuthenticator
 
 from onadata.apps.logger.import_tools import import_instances_from_zip
-from onadata.apps.logger.models.attachment import Attachment
 from onadata.apps.logger.models.instance import Instance
 from onadata.apps.logger.models.xform import XForm
 from onadata.apps.main.models import MetaData, UserProfile
@@ -40,7 +39,8 @@ from onadata.libs.utils.cache_tools import (cache,
                                             USER_PROFILE_PREFIX)
 from onadata.libs.utils.logger_tools import (
     BaseOpenRosaResponse, OpenRosaResponse, OpenRosaResponseBadRequest,
-    PublishXForm, inject_instanceid, publish_form, remove_xform,
+    PublishXForm, get_submission_list_page, get_submission_xml,
+    inject_instanceid, publish_form, remove_xform,
     response_with_mimetype_and_name, safe_create_instance)
 from onadata.libs.utils.user_auth import (
     HttpResponseNotAuthorized, add_cors_headers, has_edit_permission,
@@ -620,26 +620,10 @@ def view_submission_list(request, username):
         return HttpResponseForbidden('Not shared.')
     num_entries = request.GET.get('numEntries', None)
     cursor = request.GET.get('cursor', None)
-    instances = xform.instances.filter(deleted_at=None).order_by('pk')
-
-    cursor = _parse_int(cursor)
-    if cursor:
-        instances = instances.filter(pk__gt=cursor)
-
-    num_entries = _parse_int(num_entries)
-    if num_entries:
-        instances = instances[:num_entries]
-
-    data = {'instances': instances}
-
-    resumption_cursor = 0
-    if instances.count():
-        last_instance = instances[instances.count() - 1]
-        resumption_cursor = last_instance.pk
-    elif instances.count() == 0 and cursor:
-        resumption_cursor = cursor
-
-    data['resumptionCursor'] = resumption_cursor
+    instances, resumption_cursor = get_submission_list_page(
+        xform.instances.filter(deleted_at=None), _parse_int(cursor),
+        _parse_int(num_entries))
+    data = {'instances': instances, 'resumptionCursor': resumption_cursor}
 
     return render(
         request,
@@ -671,7 +655,8 @@ def view_download_submission(request, username):
 
     uuid = _extract_uuid(form_id_parts[1])
     instance = get_object_or_404(
-        Instance,
+        Instance.objects.select_related('xform').prefetch_related(
+            'attachments'),
         xform__id_string__iexact=id_string,
         uuid=uuid,
         xform__user__username=username,
@@ -679,13 +664,8 @@ def view_download_submission(request, username):
     xform = instance.xform
     if not has_permission(xform, form_user, request, xform.shared_data):
         return HttpResponseForbidden('Not shared.')
-    submission_xml_root_node = instance.get_root_node()
-    submission_xml_root_node.setAttribute('instanceID',
-                                          u'uuid:%s' % instance.uuid)
-    submission_xml_root_node.setAttribute('submissionDate',
-                                          instance.date_created.isoformat())
-    data['submission_data'] = submission_xml_root_node.toxml()
-    data['media_files'] = Attachment.objects.filter(instance=instance)
+    data['submission_data'] = get_submission_xml(instance)
+    data['media_files'] = instance.attachments.all()
     data['host'] = request.build_absolute_uri().replace(
         request.get_full_path(), '')
 
@@ -1,11 +1,16 @@
 import logging
 import re
+from io import BytesIO
+from xml.dom import minidom, Node
+from xml.parsers.expat import ExpatError
+
 import dateutil.parser
 from builtins import str as text
 from future.utils import python_2_unicode_compatible
-from xml.dom import minidom, Node
+from lxml import etree
 
-from django.utils.encoding import smart_text, smart_str
+from django.conf import settings
+from django.utils.encoding import smart_bytes, smart_text, smart_str
 from django.utils.translation import ugettext as _
 
 from onadata.libs.utils.common_tags import XFORM_ID_STRING, VERSION
@@ -61,14 +66,20 @@ class NonUniqueFormIdError(Exception):
     pass
 
 
-def get_meta_from_xml(xml_str, meta_name):
-    xml = clean_and_parse_xml(xml_str)
-    children = xml.childNodes
+UUID_REGEX = re.compile(r"uuid:(.*)")
+
+
+def _get_survey_node(xml_obj):
+    children = xml_obj.childNodes
     # children ideally contains a single element
     # that is the parent of all survey elements
     if children.length == 0:
         raise ValueError(_("XML string must have a survey element."))
-    survey_node = children[0]
+    return children[0]
+
+
+def _get_meta_from_document(xml_obj, meta_name):
+    survey_node = _get_survey_node(xml_obj)
     meta_tags = [n for n in survey_node.childNodes if
                  n.nodeType == Node.ELEMENT_NODE and
                  (n.tagName.lower() == "meta" or
@@ -90,55 +101,76 @@ def get_meta_from_xml(xml_str, meta_name):
         else None
 
 
-def get_uuid_from_xml(xml):
-    def _uuid_only(uuid, regex):
-        matches = regex.match(uuid)
-        if matches and len(matches.groups()) > 0:
-            return matches.groups()[0]
-        return None
-    uuid = get_meta_from_xml(xml, "instanceID")
-    regex = re.compile(r"uuid:(.*)")
+def get_meta_from_xml(xml_str, meta_name):
+    return _get_meta_from_document(clean_and_parse_xml(xml_str), meta_name)
+
+
+def _uuid_only(uuid):
+    matches = UUID_REGEX.match(uuid)
+    if matches and len(matches.groups()) > 0:
+        return matches.groups()[0]
+    return None
+
+
+def _get_uuid_from_document(xml_obj):
+    uuid = _get_meta_from_document(xml_obj, "instanceID")
     if uuid:
-        return _uuid_only(uuid, regex)
+        return _uuid_only(uuid)
     # check in survey_node attributes
-    xml = clean_and_parse_xml(xml)
-    children = xml.childNodes
-    # children ideally contains a single element
-    # that is the parent of all survey elements
-    if children.length == 0:
-        raise ValueError(_("XML string must have a survey element."))
-    survey_node = children[0]
-    uuid = survey_node.getAttribute('instanceID')
+    uuid = _get_survey_node(xml_obj).getAttribute('instanceID')
     if uuid != '':
-        return _uuid_only(uuid, regex)
+        return _uuid_only(uuid)
     return None
 
 
-def get_submission_date_from_xml(xml):
+def get_uuid_from_xml(xml):
+    return _get_uuid_from_document(clean_and_parse_xml(xml))
+
+
+def _get_submission_date_from_document(xml_obj):
     # check in survey_node attributes
-    xml = clean_and_parse_xml(xml)
-    children = xml.childNodes
-    # children ideally contains a single element
-    # that is the parent of all survey elements
-    if children.length == 0:
-        raise ValueError(_("XML string must have a survey element."))
-    survey_node = children[0]
-    submissionDate = survey_node.getAttribute('submissionDate')
+    submissionDate = _get_survey_node(xml_obj).getAttribute('submissionDate')
     if submissionDate != '':
         return dateutil.parser.parse(submissionDate)
     return None
 
 
-def get_deprecated_uuid_from_xml(xml):
-    uuid = get_meta_from_xml(xml, "deprecatedID")
-    regex = re.compile(r"uuid:(.*)")
+def get_submission_date_from_xml(xml):
+    return _get_submission_date_from_document(clean_and_parse_xml(xml))
+
+
+def _get_deprecated_uuid_from_document(xml_obj):
+    uuid = _get_meta_from_document(xml_obj, "deprecatedID")
     if uuid:
-        matches = regex.match(uuid)
-        if matches and len(matches.groups()) > 0:
-            return matches.groups()[0]
+        return _uuid_only(uuid)
     return None
 
 
+def get_deprecated_uuid_from_xml(xml):
+    return _get_deprecated_uuid_from_document(clean_and_parse_xml(xml))
+
+
+def _get_id_string_from_document(xml_obj):
+    root_node = xml_obj.documentElement
+    id_string = root_node.getAttribute(u"id")
+
+    if len(id_string) == 0:
+        # may be hidden in submission/data/id_string
+        elems = root_node.getElementsByTagName('data')
+
+        for data in elems:
+            for child in data.childNodes:
+                id_string = data.childNodes[0].getAttribute('id')
+
+                if len(id_string) > 0:
+                    break
+
+            if len(id_string) > 0:
+                break
+
+    return id_string
+
+
 def clean_and_parse_xml(xml_string):
     clean_xml_str = xml_string.strip()
     clean_xml_str = re.sub(r">\s+<", u"><", smart_text(clean_xml_str))
@@ -188,9 +220,7 @@ def _xml_node_to_dict(node, repeats=[], encrypted=False):
                     if not isinstance(node_value, list):
                         # if not a list create
                         value[child_name] = [node_value]
-                    # 2. parse the node
-                    d = _xml_node_to_dict(child, repeats)
-                    # 3. aggregate
+                    # 2. aggregate
                     value[child_name].append(d[child_name])
             else:
                 if child_name not in value:
@@ -303,18 +333,23 @@ def _get_all_attributes(node):
 
 class XFormInstanceParser(object):
 
-    def __init__(self, xml_str, data_dictionary):
+    def __init__(self, xml_str, data_dictionary, xml_obj=None):
         self.dd = data_dictionary
-        self.parse(xml_str)
+        self.parse(xml_str, xml_obj)
 
-    def parse(self, xml_str):
-        self._xml_obj = clean_and_parse_xml(xml_str)
+    def parse(self, xml_str, xml_obj=None):
+        self._xml_obj = clean_and_parse_xml(xml_str) if xml_obj is None \
+            else xml_obj
         self._root_node = self._xml_obj.documentElement
         repeats = [e.get_abbreviated_xpath()
                    for e in self.dd.get_survey_elements_of_type(u"repeat")]
 
         self._dict = _xml_node_to_dict(self._root_node, repeats,
                                        self.dd.encrypted)
+        self._set_flat_dict()
+        self._set_attributes()
+
+    def _set_flat_dict(self):
         self._flat_dict = {}
 
         if self._dict is None:
@@ -322,7 +357,6 @@ class XFormInstanceParser(object):
 
         for path, value in _flatten_dict_nest_repeats(self._dict, []):
             self._flat_dict[u"/".join(path[1:])] = value
-        self._set_attributes()
 
     def get_root_node(self):
         return self._root_node
@@ -373,16 +407,210 @@ class XFormInstanceParser(object):
         return result
 
 
+def _get_qualified_name(name, element):
+    """
+    Returns the prefix:localname of an lxml {namespace}localname name.
+    """
+    if name[0] != '{':
+        return name
+
+    namespace, localname = name[1:].split('}', 1)
+    for prefix, uri in element.nsmap.items():
+        if uri == namespace:
+            return u'%s:%s' % (prefix, localname) if prefix else localname
+
+    return localname
+
+
+def _iterparse_xml(xml_str, repeats, encrypted=False):
+    """
+    Returns the root node name, the dict and the attributes of an XML
+    submission read with one pass of lxml's iterparse. The result is the
+    same as _xml_node_to_dict and _get_all_attributes of its minidom tree.
+    """
+    repeats = frozenset(repeats)
+    # (node name, xpath, value) of the nodes from the root to the current
+    path = []
+    attributes = []
+    namespaces = []
+    root_name = result = None
+
+    try:
+        for event, item in etree.iterparse(
+                BytesIO(smart_bytes(xml_str)),
+                events=('start-ns', 'start', 'end'),
+                resolve_entities=False):
+            if event == 'start-ns':
+                prefix, uri = item
+                namespaces.append(
+                    (u'xmlns:%s' % prefix if prefix else u'xmlns', uri))
+            elif event == 'start':
+                name = _get_qualified_name(item.tag, item)
+                xpath = u'%s/%s' % (path[-1][1], name) \
+                    if len(path) > 1 else (name if path else u'')
+                path.append((name, xpath, {}))
+                if namespaces:
+                    attributes.extend(namespaces)
+                    namespaces = []
+                if item.attrib:
+                    attributes.extend(
+                        (_get_qualified_name(key, item), value)
+                        for key, value in item.attrib.items())
+            else:
+                name, xpath, value = path.pop()
+                if len(item) == 0:
+                    # a leaf node, whitespace only text is not data
+                    node_text = item.text
+                    value = node_text \
+                        if node_text is not None and node_text.strip() \
+                        else None
+                elif not value:
+                    value = None
+
+                if not path:
+                    root_name = name
+                    result = None if value is None else {name: value}
+                elif value is not None:
+                    parent = path[-1][2]
+                    if xpath in repeats or \
+                            (encrypted and len(path) == 1 and
+                             name == 'media'):
+                        parent.setdefault(name, []).append(value)
+                    elif name not in parent:
+                        parent[name] = value
+                    else:
+                        # node is repeated, aggregate node values
+                        if not isinstance(parent[name], list):
+                            parent[name] = [parent[name]]
+                        parent[name].append(value)
+
+                # the values of the node are read, free its subtree
+                item.clear()
+                if path:
+                    while item.getprevious() is not None:
+                        del item.getparent()[0]
+    except etree.XMLSyntaxError as e:
+        raise ExpatError(text(e))
+
+    return root_name, result, attributes
+
+
+class IterparseXFormInstanceParser(XFormInstanceParser):
+    """
+    XFormInstanceParser reading the submission in one pass of lxml's C
+    iterparse instead of building a minidom tree. Repeats are looked up by
+    their xpath, kept on a stack, in a set of the form's repeats.
+    """
+
+    def parse(self, xml_str, xml_obj=None):
+        self._xml_str = xml_str
+        self._xml_obj = xml_obj
+        self._root_node = None
+        repeats = [e.get_abbreviated_xpath()
+                   for e in self.dd.get_survey_elements_of_type(u"repeat")]
+
+        self._root_node_name, self._dict, attributes = _iterparse_xml(
+            xml_str, repeats, self.dd.encrypted)
+        self._set_flat_dict()
+        self._set_attributes(attributes)
+
+    def get_root_node(self):
+        # the minidom node is only built for callers that need it
+        if self._root_node is None:
+            if self._xml_obj is None:
+                self._xml_obj = clean_and_parse_xml(self._xml_str)
+            self._root_node = self._xml_obj.documentElement
+        return self._root_node
+
+    def get_root_node_name(self):
+        return self._root_node_name
+
+    def _set_attributes(self, all_attributes=None):
+        if all_attributes is None:
+            all_attributes = list(_get_all_attributes(self.get_root_node()))
+        self._attributes = {}
+        for key, value in all_attributes:
+            if key not in self._attributes:
+                self._attributes[key] = value
+
+
+XFORM_INSTANCE_PARSERS = {
+    'minidom': XFormInstanceParser,
+    'iterparse': IterparseXFormInstanceParser,
+}
+
+
+def get_xform_instance_parser(xml_str, data_dictionary, xml_obj=None):
+    """
+    Returns the parser of a submission, with the engine set in
+    XFORM_INSTANCE_PARSER_ENGINE.
+    """
+    engine = getattr(settings, 'XFORM_INSTANCE_PARSER_ENGINE', 'minidom')
+    return XFORM_INSTANCE_PARSERS[engine](xml_str, data_dictionary, xml_obj)
+
+
 def xform_instance_to_dict(xml_str, data_dictionary):
-    parser = XFormInstanceParser(xml_str, data_dictionary)
+    parser = get_xform_instance_parser(xml_str, data_dictionary)
     return parser.to_dict()
 
 
 def xform_instance_to_flat_dict(xml_str, data_dictionary):
-    parser = XFormInstanceParser(xml_str, data_dictionary)
+    parser = get_xform_instance_parser(xml_str, data_dictionary)
     return parser.to_flat_dict()
 
 
 def parse_xform_instance(xml_str, data_dictionary):
-    parser = XFormInstanceParser(xml_str, data_dictionary)
+    parser = get_xform_instance_parser(xml_str, data_dictionary)
     return parser.get_flat_dict_with_attributes()
+
+
+class SubmissionContext(object):
+    """
+    A submission's XML parsed once, for the values ingesting the submission
+    needs: its uuids, submission date, form id_string and the parser of its
+    data. Pass it to ``Instance.set_submission_context`` to have the instance
+    reuse the parsed document instead of parsing its XML again.
+    """
+
+    def __init__(self, xml):
+        self.xml = smart_text(xml)
+        self._xml_obj = clean_and_parse_xml(self.xml)
+        self._parser = None
+
+    def get_root_node_name(self):
+        return self._xml_obj.documentElement.nodeName
+
+    @property
+    def uuid(self):
+        if not hasattr(self, '_uuid'):
+            self._uuid = _get_uuid_from_document(self._xml_obj)
+        return self._uuid
+
+    @property
+    def deprecated_uuid(self):
+        return _get_deprecated_uuid_from_document(self._xml_obj)
+
+    @property
+    def submission_date(self):
+        return _get_submission_date_from_document(self._xml_obj)
+
+    @property
+    def id_string(self):
+        return _get_id_string_from_document(self._xml_obj)
+
+    def to_dict(self):
+        """
+        Returns the submission's data as a nested dict, without the form's
+        repeats.
+        """
+        root_node = self._xml_obj.documentElement
+        return _xml_node_to_dict(root_node) or {root_node.nodeName: None}
+
+    def get_parser(self, data_dictionary):
+        """
+        Returns the XFormInstanceParser of the submission for a form.
+        """
+        if self._parser is None or self._parser.dd != data_dictionary:
+            self._parser = get_xform_instance_parser(
+                self.xml, data_dictionary, self._xml_obj)
+        return self._parser
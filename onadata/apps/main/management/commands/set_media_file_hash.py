@@ -1,17 +1,25 @@
 from django.core.management.base import BaseCommand
+from django.db.models import Q
 from django.utils.translation import ugettext_lazy
 
+from onadata.apps.logger.models import Attachment
 from onadata.apps.main.models import MetaData
 from onadata.libs.utils.model_tools import queryset_iterator
 
 
 class Command(BaseCommand):
-    help = ugettext_lazy("Set media file_hash for all existing media files")
-
-    option_list = BaseCommand.option_list
+    help = ugettext_lazy(
+        "Set the file_hash of existing media files and attachments that do "
+        "not have one")
 
     def handle(self, *args, **kwargs):
-        for media in queryset_iterator(MetaData.objects.exclude(data_file='')):
+        media_files = MetaData.objects.exclude(data_file='').filter(
+            Q(file_hash__isnull=True) | Q(file_hash=''))
+        for media in queryset_iterator(media_files):
             if media.data_file:
-                media.file_hash = media._set_hash()
-                media.save()
+                media.save(update_fields=['file_hash'])
+
+        attachments = Attachment.objects.exclude(media_file='').filter(
+            file_hash__isnull=True)
+        for attachment in queryset_iterator(attachments):
+            attachment.save(update_fields=['file_hash'])
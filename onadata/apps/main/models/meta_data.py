@@ -4,7 +4,6 @@ import logging
 import mimetypes
 import os
 from contextlib import closing
-from hashlib import md5
 
 import requests
 from django.conf import settings
@@ -21,6 +20,7 @@ from past.builtins import basestring
 from onadata.libs.utils.cache_tools import XFORM_METADATA_CACHE, safe_delete
 from onadata.libs.utils.common_tags import (GOOGLE_SHEET_DATA_TYPE, TEXTIT,
                                             XFORM_META_PERMS)
+from onadata.libs.utils.common_tools import get_file_hash
 
 CHUNK_SIZE = 1024
 INSTANCE_MODEL_NAME = "instance"
@@ -179,7 +179,11 @@ class MetaData(models.Model):
                            'content_type')
 
     def save(self, *args, **kwargs):
-        self._set_hash()
+        # the hash is computed once, when the file is uploaded
+        # pylint: disable=protected-access
+        if not self.file_hash or \
+                (self.data_file and not self.data_file._committed):
+            self._set_hash()
         super(MetaData, self).save(*args, **kwargs)
 
     @property
@@ -202,8 +206,7 @@ class MetaData(models.Model):
             except IOError:
                 return ''
             else:
-                self.file_hash = 'md5:%s' % md5(
-                    self.data_file.read()).hexdigest()
+                self.file_hash = 'md5:%s' % get_file_hash(self.data_file)
 
                 return self.file_hash
 
@@ -28,6 +28,7 @@ from onadata.apps.api.viewsets.openid_connect_viewset import (
     OpenIDConnectViewSet
 )
 
+from onadata.libs.profiling import views as profiling_views
 from onadata.libs.utils.analytics import init_analytics
 # enable the admin:
 from django.contrib import admin
@@ -76,6 +77,7 @@ urlpatterns = [
     re_path(r'^(?P<username>[^/]+)/forms/(?P<id_string>[^/]+)/stats$',
             viewer_views.charts, name='form-stats'),
     re_path(r'^login_redirect/$', main_views.login_redirect),
+    re_path(r'^_metrics$', profiling_views.metrics, name='metrics'),
     re_path(r'^attachment/$', viewer_views.attachment_url,
             name='attachment_url'),
     re_path(r'^attachment/(?P<size>[^/]+)$', viewer_views.attachment_url,
@@ -5,10 +5,15 @@ Messaging notification backend for MQTT
 from __future__ import unicode_literals
 
 import json
+import os
 import ssl
+import threading
 
+import paho.mqtt.client as mqtt
 import paho.mqtt.publish as publish
 from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
 
 from onadata.apps.logger.models import XForm
 from onadata.apps.messaging.backends.base import BaseBackend
@@ -16,6 +21,60 @@ from onadata.apps.messaging.constants import MESSAGE
 from onadata.apps.messaging.constants import PROJECT, USER, XFORM, \
     VERB_TOPIC_DICT
 
+XFORM_TOPIC_CACHE = 'mqtt-xform-topic-'
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(host, port, cert_info=None):
+    """
+    Returns this process's long-lived MQTT client of a broker, connecting it
+    on first use.
+
+    The client reconnects on its own, from its network thread, and keeps a
+    bounded queue of the messages published while it is disconnected;
+    queued messages are written out together by the network thread.
+    """
+    # clients are not shared with forked worker processes
+    key = (os.getpid(), host, port,
+           tuple(sorted(cert_info.items())) if cert_info else None)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = mqtt.Client()
+            if cert_info:
+                client.tls_set(**cert_info)
+            client.max_queued_messages_set(
+                getattr(settings, 'MQTT_MAX_QUEUED_MESSAGES', 1000))
+            client.reconnect_delay_set(min_delay=1, max_delay=60)
+            client.connect_async(host, port)
+            client.loop_start()
+            _clients[key] = client
+
+    return client
+
+
+def get_xform_topic_kwargs(xform_id):
+    """
+    Returns the organization username and project id in the topic of a
+    form's messages, cached for MQTT_TOPIC_CACHE_TTL seconds.
+    """
+    cache_key = XFORM_TOPIC_CACHE + str(xform_id)
+    topic_kwargs = cache.get(cache_key)
+    if topic_kwargs is None:
+        organization_username, project_id = XForm.objects.values_list(
+            'project__organization__username', 'project_id').get(
+                id=xform_id)
+        topic_kwargs = {
+            'organization_username': organization_username,
+            'project_id': project_id,
+        }
+        cache.set(cache_key, topic_kwargs,
+                  getattr(settings, 'MQTT_TOPIC_CACHE_TTL', 300))
+
+    return topic_kwargs
+
 
 def get_target_metadata(target_obj):
     """
@@ -113,15 +172,13 @@ class MQTTBackend(BaseBackend):
         """
         kwargs = {
             'target_id': instance.target_object_id,
-            'target_name': instance.target._meta.model_name,
+            'target_name': ContentType.objects.get_for_id(
+                instance.target_content_type_id).model,
             'topic_base': self.topic_base,
         }
         if kwargs['target_name'] == XFORM:
-            xform = XForm.objects.get(id=instance.target_object_id)
-            kwargs[
-                'organization_username'] = xform.project.organization.username
+            kwargs.update(get_xform_topic_kwargs(instance.target_object_id))
             kwargs['verb'] = VERB_TOPIC_DICT[instance.verb]
-            kwargs['project_id'] = xform.project.id
             return ('/{topic_base}/organization/{organization_username}/'
                     'project/{project_id}/{target_name}/{target_id}/{verb}/'
                     'messages/publish').format(**kwargs)
@@ -139,7 +196,16 @@ class MQTTBackend(BaseBackend):
         topic = self.get_topic(instance)
         payload = get_payload(instance)
         # send it
-
+        client = get_client(self.host, self.port or 1883, self.cert_info)
+        result = client.publish(topic, payload=payload, qos=self.qos,
+                                retain=self.retain)
+        # messages with a qos above 0 are queued while disconnected
+        if result.rc == mqtt.MQTT_ERR_SUCCESS or \
+                (result.rc == mqtt.MQTT_ERR_NO_CONN and self.qos > 0):
+            return result
+
+        # the queue is full or the client is disconnected, send the message
+        # on a connection of its own
         return publish.single(topic, payload=payload, hostname=self.host,
                               port=self.port, tls=self.cert_info, qos=self.qos,
                               retain=self.retain)
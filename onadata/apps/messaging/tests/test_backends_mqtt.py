@@ -7,13 +7,20 @@ from __future__ import unicode_literals
 import json
 import ssl
 
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
 from django.test import TestCase
 
 from mock import MagicMock, patch
 
-from onadata.apps.messaging.backends.mqtt import (MQTTBackend, get_payload,
+from paho.mqtt.client import MQTT_ERR_QUEUE_SIZE, MQTT_ERR_SUCCESS
+
+from onadata.apps.logger.models import XForm
+from onadata.apps.messaging.backends.mqtt import (MQTTBackend, get_client,
+                                                  get_payload,
                                                   get_target_metadata)
-from onadata.apps.messaging.constants import PROJECT, XFORM
+from onadata.apps.messaging.constants import (PROJECT, SUBMISSION_CREATED,
+                                              XFORM)
 from onadata.apps.messaging.tests.test_base import (_create_message,
                                                     _create_user)
 
@@ -100,14 +107,27 @@ class TestMQTTBackend(TestCase):
         }
         self.assertEqual(json.dumps(payload), get_payload(instance))
 
+    @patch('onadata.apps.messaging.backends.mqtt.get_client')
     @patch('onadata.apps.messaging.backends.mqtt.publish.single')
-    def test_mqtt_send(self, mocked):
+    def test_mqtt_send(self, mocked, mocked_client):
         """
         Test MQTT Backend send method
         """
         from_user = _create_user('Bob')
         to_user = _create_user('Alice')
         instance = _create_message(from_user, to_user, 'I love oov')
+        mqtt = MQTTBackend(options={'HOST': 'localhost'})
+        publish = mocked_client.return_value.publish
+        publish.return_value.rc = MQTT_ERR_SUCCESS
+        mqtt.send(instance=instance)
+        publish.assert_called_once_with(
+            mqtt.get_topic(instance), payload=get_payload(instance), qos=0,
+            retain=False)
+        self.assertEqual(mocked_client.call_args[0], ('localhost', 1883, None))
+        self.assertFalse(mocked.called)
+
+        # a message the client can not queue is sent on its own connection
+        publish.return_value.rc = MQTT_ERR_QUEUE_SIZE
         mqtt = MQTTBackend(options={
             'HOST': 'localhost',
             'PORT': 8883,
@@ -132,3 +152,40 @@ class TestMQTTBackend(TestCase):
                  tls_version=ssl.PROTOCOL_TLSv1_2,
                  cert_reqs=ssl.CERT_NONE),
             kwargs['tls'])
+
+    @patch('onadata.apps.messaging.backends.mqtt.mqtt.Client')
+    def test_get_client(self, mocked):
+        """
+        Test a broker's MQTT client is connected once and reused
+        """
+        client = get_client('broker.test', 1883)
+        self.assertEqual(client, get_client('broker.test', 1883))
+        self.assertEqual(mocked.call_count, 1)
+        client.connect_async.assert_called_once_with('broker.test', 1883)
+        client.loop_start.assert_called_once_with()
+
+        get_client('broker.test', 8883, {'ca_certs': 'cacert.pem'})
+        self.assertEqual(mocked.call_count, 2)
+
+    def test_mqtt_get_xform_topic_is_cached(self):
+        """
+        Test the topic of a form's messages is looked up once
+        """
+        cache.clear()
+        user = _create_user('Bob')
+        instance = _create_message(user, user, 'I love oov')
+        instance.target_object_id = 1337
+        instance.target_content_type = ContentType.objects.get_for_model(
+            XForm)
+        instance.verb = SUBMISSION_CREATED
+        mqtt = MQTTBackend(options={'HOST': 'localhost'})
+
+        with patch('onadata.apps.messaging.backends.mqtt.XForm') as mocked:
+            mocked.objects.values_list.return_value.get.return_value = (
+                'bob', 7)
+            topic = mqtt.get_topic(instance)
+            self.assertEqual(topic, mqtt.get_topic(instance))
+            self.assertEqual(mocked.objects.values_list.call_count, 1)
+        self.assertEqual(
+            topic, '/onadata/organization/bob/project/7/xform/1337/'
+            'submission/created/messages/publish')
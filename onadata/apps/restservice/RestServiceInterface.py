@@ -1,3 +1,10 @@
 class RestServiceInterface(object):
+    # the most submissions send_batch is called with, services that accept
+    # several submissions in one request set it above 1
+    batch_size = 1
+
     def send(self, url, data=None):
         raise NotImplementedError
+
+    def send_batch(self, url, submission_instances):
+        raise NotImplementedError
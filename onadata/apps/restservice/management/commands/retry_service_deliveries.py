@@ -0,0 +1,20 @@
+#!/usr/bin/env python
+
+from django.core.management.base import BaseCommand
+from django.utils.translation import ugettext as _
+
+from onadata.apps.restservice.utils import retry_failed_deliveries
+
+
+class Command(BaseCommand):
+    help = _("Queue the submissions rest services failed to receive to be "
+             "sent again.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--service', type=int, action='append', dest='services',
+            help=_("Id of a rest service to retry, retries all by default."))
+
+    def handle(self, *args, **options):
+        count = retry_failed_deliveries(options.get('services'))
+        self.stdout.write(_("Queued %(count)d deliveries.") % {'count': count})
@@ -0,0 +1,34 @@
+# Generated by Django 2.2.16 on 2026-10-17 18:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logger', '0066_instance_search_text'),
+        ('restservice', '0005_auto_20190125_0517'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ServiceDelivery',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.SmallIntegerField(default=0)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('next_attempt', models.DateTimeField(default=django.utils.timezone.now)),
+                ('date_created', models.DateTimeField(auto_now_add=True)),
+                ('date_modified', models.DateTimeField(auto_now=True)),
+                ('instance', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='service_deliveries', to='logger.Instance')),
+                ('rest_service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='restservice.RestService')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='servicedelivery',
+            index=models.Index(fields=['rest_service', 'status', 'next_attempt'], name='restservice_delivery_due_idx'),
+        ),
+    ]
@@ -8,11 +8,13 @@ from future.utils import python_2_unicode_compatible
 from django.conf import settings
 from django.db import models
 from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
 from django.utils.translation import ugettext_lazy
 
 from onadata.apps.logger.models.xform import XForm
 from onadata.apps.main.models import MetaData
 from onadata.apps.restservice import SERVICE_CHOICES
+from onadata.libs.utils import async_status
 from onadata.libs.utils.common_tags import GOOGLE_SHEET, TEXTIT
 
 
@@ -61,6 +63,38 @@ class RestService(models.Model):
         return service_definition.verbose_name
 
 
+@python_2_unicode_compatible
+class ServiceDelivery(models.Model):
+    """
+    A submission waiting to be sent to a rest service, or, once its retries
+    are used up, a failed delivery kept to be retried later.
+    """
+    PENDING = async_status.PENDING
+    FAILED = async_status.FAILED
+
+    rest_service = models.ForeignKey(
+        RestService, related_name='deliveries', on_delete=models.CASCADE)
+    instance = models.ForeignKey(
+        'logger.Instance', related_name='service_deliveries',
+        on_delete=models.CASCADE)
+    status = models.SmallIntegerField(default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    next_attempt = models.DateTimeField(default=timezone.now)
+    date_created = models.DateTimeField(auto_now_add=True)
+    date_modified = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        app_label = 'restservice'
+        indexes = [
+            models.Index(fields=['rest_service', 'status', 'next_attempt'],
+                         name='restservice_delivery_due_idx'),
+        ]
+
+    def __str__(self):
+        return u"%s - %s" % (self.rest_service, self.instance_id)
+
+
 def delete_metadata(sender, instance, **kwargs):  # pylint: disable=W0613
     """
     Delete related metadata on deletion of the RestService.
@@ -1,8 +1,7 @@
 import json
 
-import requests
-
 from onadata.apps.restservice.RestServiceInterface import RestServiceInterface
+from onadata.apps.restservice.utils import get_session, get_timeout
 
 
 class ServiceDefinition(RestServiceInterface):
@@ -12,4 +11,6 @@ class ServiceDefinition(RestServiceInterface):
     def send(self, url, submission_instance):
         post_data = json.dumps(submission_instance.json)
         headers = {"Content-Type": "application/json"}
-        requests.post(url, headers=headers, data=post_data)
+        response = get_session(url).post(
+            url, headers=headers, data=post_data, timeout=get_timeout())
+        response.raise_for_status()
@@ -1,6 +1,5 @@
-import requests
-
 from onadata.apps.restservice.RestServiceInterface import RestServiceInterface
+from onadata.apps.restservice.utils import get_session, get_timeout
 
 
 class ServiceDefinition(RestServiceInterface):
@@ -9,4 +8,7 @@ class ServiceDefinition(RestServiceInterface):
 
     def send(self, url, submission_instance):
         headers = {"Content-Type": "application/xml"}
-        requests.post(url, data=submission_instance.xml, headers=headers)
+        response = get_session(url).post(
+            url, data=submission_instance.xml, headers=headers,
+            timeout=get_timeout())
+        response.raise_for_status()
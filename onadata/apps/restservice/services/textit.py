@@ -1,10 +1,10 @@
 import json
-import requests
 from future.utils import iteritems
 from six import string_types
 
 from onadata.apps.main.models import MetaData
 from onadata.apps.restservice.RestServiceInterface import RestServiceInterface
+from onadata.apps.restservice.utils import get_session, get_timeout
 from onadata.libs.utils.common_tags import TEXTIT
 from onadata.settings.common import METADATA_SEPARATOR
 
@@ -34,7 +34,10 @@ class ServiceDefinition(RestServiceInterface):
             headers = {"Content-Type": "application/json",
                        "Authorization": "Token {}".format(token)}
 
-            requests.post(url, headers=headers, data=json.dumps(post_data))
+            response = get_session(url).post(
+                url, headers=headers, data=json.dumps(post_data),
+                timeout=get_timeout())
+            response.raise_for_status()
 
     def clean_keys_of_slashes(self, record):
         """
@@ -1,4 +1,5 @@
-from onadata.apps.restservice.utils import call_service
+from onadata.apps.restservice.utils import (call_service,
+                                            deliver_service_submissions)
 from onadata.celery import app
 
 
@@ -15,3 +16,17 @@ def call_service_async(instance_pk):
         pass
     else:
         call_service(instance)
+
+
+@app.task(ignore_result=True)
+def deliver_to_service(rest_service_id):
+    """
+    Sends the pending submissions of a rest service, scheduling itself again
+    for more due submissions and for retries of failed ones.
+    """
+    more, retry_delay = deliver_service_submissions(rest_service_id)
+    if more:
+        deliver_to_service.apply_async(args=[rest_service_id])
+    if retry_delay is not None:
+        deliver_to_service.apply_async(
+            args=[rest_service_id], countdown=retry_delay)
@@ -1,17 +1,22 @@
 import os
 import time
 
+import requests
+from django.db import connection
 from django.test.utils import override_settings
 from django.urls import reverse
-from mock import patch
+from django.utils import timezone
+from mock import MagicMock, patch
 
 from onadata.apps.logger.models.xform import XForm
 from onadata.apps.main.models import MetaData
 from onadata.apps.main.tests.test_base import TestBase
 from onadata.apps.main.views import show
 from onadata.apps.restservice.RestServiceInterface import RestServiceInterface
-from onadata.apps.restservice.models import RestService
+from onadata.apps.restservice.models import RestService, ServiceDelivery
 from onadata.apps.restservice.services.textit import ServiceDefinition
+from onadata.apps.restservice.tasks import deliver_to_service
+from onadata.apps.restservice.utils import retry_failed_deliveries
 from onadata.apps.restservice.views import add_service, delete_service
 
 
@@ -110,7 +115,7 @@ class RestServiceTest(TestBase):
         self.assertEqual(response.status_code, 404)
 
     @override_settings(CELERY_TASK_ALWAYS_EAGER=True)
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_textit_service(self, mock_http):
         service_url = "https://textit.io/api/v1/runs.json"
         service_name = "textit"
@@ -137,7 +142,7 @@ class RestServiceTest(TestBase):
         self.assertEquals(mock_http.call_count, 1)
 
     @override_settings(CELERY_TASK_ALWAYS_EAGER=True)
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_rest_service_not_set(self, mock_http):
         xml_submission = os.path.join(self.this_directory,
                                       u'fixtures',
@@ -148,6 +153,59 @@ class RestServiceTest(TestBase):
         self.assertFalse(mock_http.called)
         self.assertEquals(mock_http.call_count, 0)
 
+    @override_settings(CELERY_TASK_ALWAYS_EAGER=True,
+                       REST_SERVICE_MAX_ATTEMPTS=2)
+    @patch('requests.Session.post')
+    def test_failed_delivery_is_retried(self, mock_http):
+        mock_http.side_effect = requests.ConnectionError()
+        rest_service = RestService.objects.create(
+            service_url='https://example.com/submissions',
+            xform=self.xform, name='generic_json')
+        xml_submission = os.path.join(self.this_directory,
+                                      u'fixtures',
+                                      u'dhisform_submission1.xml')
+
+        self._make_submission(xml_submission)
+        delivery = ServiceDelivery.objects.get(rest_service=rest_service)
+        self.assertEqual(delivery.attempts, 1)
+        self.assertEqual(delivery.status, ServiceDelivery.PENDING)
+        self.assertTrue(delivery.next_attempt > timezone.now())
+
+        # the last attempt fails, the delivery is kept as failed
+        ServiceDelivery.objects.update(next_attempt=timezone.now())
+        deliver_to_service(rest_service.pk)
+        delivery.refresh_from_db()
+        self.assertEqual(delivery.attempts, 2)
+        self.assertEqual(delivery.status, ServiceDelivery.FAILED)
+        self.assertEqual(mock_http.call_count, 2)
+
+        mock_http.side_effect = None
+        self.assertEqual(retry_failed_deliveries(), 1)
+        self.assertEqual(mock_http.call_count, 3)
+        self.assertFalse(ServiceDelivery.objects.exists())
+
+    @override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+    @patch('requests.Session.post')
+    def test_deliveries_are_sent_outside_transactions(self, mock_http):
+        def post(*args, **kwargs):
+            # the delivery is claimed, not locked, while it is sent
+            self.assertFalse(connection.in_atomic_block)
+            self.assertTrue(
+                ServiceDelivery.objects.get().next_attempt > timezone.now())
+            return MagicMock()
+
+        mock_http.side_effect = post
+        RestService.objects.create(
+            service_url='https://example.com/submissions',
+            xform=self.xform, name='generic_json')
+        xml_submission = os.path.join(self.this_directory,
+                                      u'fixtures',
+                                      u'dhisform_submission1.xml')
+
+        self._make_submission(xml_submission)
+        self.assertEqual(mock_http.call_count, 1)
+        self.assertFalse(ServiceDelivery.objects.exists())
+
     def test_clean_keys_of_slashes(self):
         service = ServiceDefinition()
 
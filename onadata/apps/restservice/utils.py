@@ -1,21 +1,182 @@
 import logging
+import threading
+from datetime import timedelta
 
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.six.moves.urllib.parse import urlparse
 from django.utils.translation import ugettext as _
 
-from onadata.apps.restservice.models import RestService
+from onadata.apps.restservice.models import RestService, ServiceDelivery
 from onadata.libs.utils.common_tags import GOOGLE_SHEET
 
+_sessions = threading.local()
+
+
+def get_session(url):
+    """
+    Returns the HTTP session of the host of a url, sessions are kept per
+    thread so that connections to a service are reused.
+    """
+    if not hasattr(_sessions, 'hosts'):
+        _sessions.hosts = {}
+    parsed_url = urlparse(url)
+    host = (parsed_url.scheme, parsed_url.netloc)
+    if host not in _sessions.hosts:
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_maxsize=getattr(settings, 'REST_SERVICE_POOL_SIZE', 10))
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        _sessions.hosts[host] = session
+
+    return _sessions.hosts[host]
+
+
+def get_timeout():
+    """
+    Returns the timeout of requests to rest services.
+    """
+    return getattr(settings, 'REST_SERVICE_TIMEOUT', 30)
+
 
 def call_service(submission_instance):
+    """
+    Queues a submission for delivery to the rest services of its form, each
+    service is delivered to by its own task.
+    """
+    from onadata.apps.restservice.tasks import deliver_to_service
+
     # lookup service which is not google sheet service
     services = RestService.objects.filter(
         xform_id=submission_instance.xform_id).exclude(name=GOOGLE_SHEET)
-    # call service send with url and data parameters
-    for sv in services:
-        # TODO: Queue service
+    deliveries = ServiceDelivery.objects.bulk_create([
+        ServiceDelivery(rest_service=sv, instance=submission_instance)
+        for sv in services])
+    for delivery in deliveries:
+        transaction.on_commit(
+            lambda service_id=delivery.rest_service_id:
+            deliver_to_service.apply_async(args=[service_id]))
+
+
+def _get_retry_delay(attempts):
+    """
+    Returns the seconds to wait before the next attempt of a delivery that
+    failed attempts times, doubling on every failure.
+    """
+    backoff = getattr(settings, 'REST_SERVICE_RETRY_BACKOFF', 60)
+
+    return backoff * 2 ** (attempts - 1)
+
+
+def _delivery_failed(deliveries, error):
+    """
+    Records a failed attempt of deliveries, the ones without retries left
+    are marked failed. Returns the seconds to the next retry, None when no
+    delivery is to be retried.
+    """
+    logging.exception(_(u'Service threw exception: %s' % str(error)))
+    max_attempts = getattr(settings, 'REST_SERVICE_MAX_ATTEMPTS', 5)
+    retry_delay = None
+    for delivery in deliveries:
+        delivery.attempts += 1
+        delivery.last_error = str(error)
+        if delivery.attempts >= max_attempts:
+            delivery.status = ServiceDelivery.FAILED
+        else:
+            delay = _get_retry_delay(delivery.attempts)
+            delivery.next_attempt = timezone.now() + timedelta(seconds=delay)
+            retry_delay = min(retry_delay or delay, delay)
+        delivery.save(update_fields=['attempts', 'last_error', 'status',
+                                     'next_attempt', 'date_modified'])
+
+    return retry_delay
+
+
+def _claim_deliveries(rest_service_id, limit):
+    """
+    Returns the due pending deliveries of a rest service, claimed by
+    moving their next attempt past the time it may take to send them, so
+    that concurrent tasks skip them without holding row locks while they
+    are sent. Deliveries of a task that dies are due again once the claim
+    expires.
+    """
+    with transaction.atomic():
+        deliveries = list(ServiceDelivery.objects.select_for_update(
+            skip_locked=True).filter(
+                rest_service_id=rest_service_id,
+                status=ServiceDelivery.PENDING,
+                next_attempt__lte=timezone.now()).select_related(
+                    'rest_service', 'instance', 'instance__xform').order_by(
+                        'pk')[:limit])
+        if deliveries:
+            claim_timeout = getattr(
+                settings, 'REST_SERVICE_CLAIM_TIMEOUT',
+                len(deliveries) * get_timeout())
+            ServiceDelivery.objects.filter(
+                pk__in=[d.pk for d in deliveries]).update(
+                    next_attempt=timezone.now() + timedelta(
+                        seconds=claim_timeout))
+
+    return deliveries
+
+
+def deliver_service_submissions(rest_service_id):
+    """
+    Sends the due pending submissions of a rest service, in batches for
+    services that accept several submissions at once.
+
+    The deliveries are claimed in a short transaction and sent outside of
+    it, the result of each batch is recorded in its own transaction.
+
+    Returns a tuple of whether due submissions are left and the seconds to
+    the next retry of failed ones, None when none are to be retried.
+    """
+    limit = getattr(settings, 'REST_SERVICE_DELIVERY_LIMIT', 100)
+    retry_delay = None
+    deliveries = _claim_deliveries(rest_service_id, limit)
+    if not deliveries:
+        return False, None
+
+    rest_service = deliveries[0].rest_service
+    service = rest_service.get_service_definition()()
+    batch_size = getattr(service, 'batch_size', 1)
+    for i in range(0, len(deliveries), batch_size):
+        batch = deliveries[i:i + batch_size]
         try:
-            service = sv.get_service_definition()()
-            service.send(sv.service_url, submission_instance)
-        except Exception as e:
-            # TODO: Handle gracefully | requeue/resend
-            logging.exception(_(u'Service threw exception: %s' % str(e)))
+            if batch_size > 1:
+                service.send_batch(rest_service.service_url,
+                                   [d.instance for d in batch])
+            else:
+                service.send(rest_service.service_url, batch[0].instance)
+        except Exception as e:  # pylint: disable=broad-except
+            with transaction.atomic():
+                delay = _delivery_failed(batch, e)
+            if delay is not None:
+                retry_delay = min(retry_delay or delay, delay)
+        else:
+            ServiceDelivery.objects.filter(
+                pk__in=[d.pk for d in batch]).delete()
+
+    return len(deliveries) == limit, retry_delay
+
+
+def retry_failed_deliveries(rest_service_ids=None):
+    """
+    Queues the failed deliveries, of some rest services or of all, to be sent
+    again. Returns the number of deliveries queued.
+    """
+    from onadata.apps.restservice.tasks import deliver_to_service
+
+    deliveries = ServiceDelivery.objects.filter(status=ServiceDelivery.FAILED)
+    if rest_service_ids is not None:
+        deliveries = deliveries.filter(rest_service_id__in=rest_service_ids)
+    service_ids = set(deliveries.values_list('rest_service_id', flat=True))
+    count = deliveries.update(status=ServiceDelivery.PENDING, attempts=0,
+                              next_attempt=timezone.now())
+    for service_id in service_ids:
+        deliver_to_service.apply_async(args=[service_id])
+
+    return count
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.16 on 2026-10-17 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viewer', '0008_auto_20190125_0517'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='export',
+            name='max_date_modified',
+            field=models.DateTimeField(default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name='export',
+            name='max_instance_id',
+            field=models.IntegerField(default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name='export',
+            name='xform_version',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+    ]
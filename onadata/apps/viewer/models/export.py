@@ -74,6 +74,7 @@ class Export(models.Model):
     CSV_ZIP_EXPORT = 'csv_zip'
     SAV_ZIP_EXPORT = 'sav_zip'
     SAV_EXPORT = 'sav'
+    PARQUET_EXPORT = 'parquet'
     EXTERNAL_EXPORT = 'external'
     OSM_EXPORT = OSM
     GOOGLE_SHEETS_EXPORT = 'gsheets'
@@ -86,6 +87,7 @@ class Export(models.Model):
         'csv_zip': 'zip',
         'sav_zip': 'zip',
         'sav': 'sav',
+        'parquet': 'zip',
         'kml': 'vnd.google-earth.kml+xml',
         OSM: OSM
     }
@@ -98,6 +100,7 @@ class Export(models.Model):
         (CSV_ZIP_EXPORT, 'CSV ZIP'),
         (SAV_ZIP_EXPORT, 'SAV ZIP'),
         (SAV_EXPORT, 'SAV'),
+        (PARQUET_EXPORT, 'Parquet'),
         (EXTERNAL_EXPORT, 'Excel'),
         (OSM, OSM),
         (GOOGLE_SHEETS_EXPORT, 'Google Sheets'),
@@ -154,6 +157,12 @@ class Export(models.Model):
     options = JSONField(default=dict, null=False)
     error_message = models.CharField(max_length=255, null=True, blank=True)
 
+    # watermark of the submissions in the export, submissions after it can
+    # be appended to a copy of the export file
+    max_instance_id = models.IntegerField(null=True, default=None)
+    max_date_modified = models.DateTimeField(null=True, default=None)
+    xform_version = models.CharField(max_length=255, null=True, blank=True)
+
     class Meta:
         app_label = "viewer"
         unique_together = (("xform", "filename"),)
@@ -8,15 +8,19 @@ from dateutil import parser
 from django.conf import settings
 from django.db import connection
 from django.db import models
+from django.db.models import TextField
+from django.db.models.functions import Cast
 from django.db.models.query import EmptyQuerySet
 from django.utils.translation import ugettext as _
 
 from onadata.apps.logger.models.instance import Instance
 from onadata.apps.logger.models.instance import _get_attachments_from_instance
+from onadata.apps.logger.models.json_field_index import (
+    record_json_field_queries)
 from onadata.apps.logger.models.note import Note
 from onadata.apps.logger.models.xform import _encode_for_mongo
-from onadata.apps.viewer.parsed_instance_tools import (get_where_clause,
-                                                       NONE_JSON_FIELDS)
+from onadata.apps.viewer.parsed_instance_tools import (
+    get_json_query_fields, get_where_clause, NONE_JSON_FIELDS)
 from onadata.libs.models.sorting import (
     json_order_by, json_order_by_params, sort_from_mongo_sort_str)
 from onadata.libs.utils.common_tags import ID, UUID, ATTACHMENTS, \
@@ -24,10 +28,13 @@ from onadata.libs.utils.common_tags import ID, UUID, ATTACHMENTS, \
     DELETEDAT, TAGS, NOTES, SUBMITTED_BY, VERSION, DURATION, EDITED, \
     MEDIA_COUNT, TOTAL_MEDIA, MEDIA_ALL_RECEIVED, XFORM_ID, REVIEW_STATUS, \
     REVIEW_COMMENT
-from onadata.libs.utils.model_tools import queryset_iterator
+from onadata.libs.utils.model_tools import (chunked_query_iterator,
+                                            queryset_iterator)
 from onadata.libs.utils.mongo import _is_invalid_for_mongo
 
 DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+# fields per json_build_object call, two arguments each
+JSON_BUILD_OBJECT_MAX_FIELDS = 50
 
 
 class ParseError(Exception):
@@ -74,10 +81,10 @@ def _parse_sort_fields(fields):
         yield NONE_JSON_FIELDS.get(field, field)
 
 
-def _query_iterator(sql, fields=None, params=[], count=False):
+def _query_iterator(sql, fields=None, params=[], count=False,
+                    itersize=None):
     if not sql:
         raise ValueError(_(u"Bad SQL: %s" % sql))
-    cursor = connection.cursor()
     sql_params = fields + params if fields is not None else params
 
     if count:
@@ -85,14 +92,18 @@ def _query_iterator(sql, fields=None, params=[], count=False):
         # is less hacky
         sql = u"SELECT COUNT(*) FROM (" + sql + ") AS CQ"
         fields = [u'count']
-
-    cursor.execute(sql, [text(i) for i in sql_params])
+        cursor = connection.cursor()
+        cursor.execute(sql, [text(i) for i in sql_params])
+        rows = cursor.fetchall()
+    else:
+        rows = chunked_query_iterator(
+            sql, [text(i) for i in sql_params], itersize)
 
     if fields is None:
-        for row in cursor.fetchall():
+        for row in rows:
             yield row[0]
     else:
-        for row in cursor.fetchall():
+        for row in rows:
             yield dict(zip(fields, row))
 
 
@@ -144,6 +155,52 @@ def _start_index_limit(records, sql, fields, params, sort, start_index, limit):
     return records, sql, params
 
 
+def _keyset_where(cursor):
+    """
+    Returns the where clause and params selecting records after the cursor
+    position.
+    """
+    columns = [u'"logger_instance"."%s"' % f for f in cursor.fields]
+    placeholders = [u"%s::timestamptz" if f == 'date_modified' else u"%s"
+                    for f in cursor.fields]
+
+    return (u"(%s) > (%s)" % (u", ".join(columns), u", ".join(placeholders)),
+            list(cursor.position))
+
+
+def keyset_queryset(records, cursor, limit):
+    """
+    Restricts an Instance queryset to the page of records following the
+    cursor position.
+    """
+    if cursor.position is not None:
+        where, where_params = _keyset_where(cursor)
+        records = records.extra(where=[where], params=where_params)
+
+    return records.order_by(*cursor.fields)[:limit]
+
+
+def _keyset_page(records, sql, fields, params, cursor, limit):
+    """
+    Fetches a page of records selected with their keyset columns and moves
+    the cursor to the last record when the page is full.
+    """
+    key_length = len(cursor.fields)
+    if sql:
+        db_cursor = connection.cursor()
+        db_cursor.execute(sql, [text(i) for i in fields + params])
+        rows = db_cursor.fetchall()
+        page = [dict(zip(fields, row[:-key_length])) for row in rows]
+    else:
+        rows = list(records)
+        page = [row[0] for row in rows]
+
+    if rows and len(rows) == limit:
+        cursor.advance(rows[-1][-key_length:])
+
+    return page
+
+
 def _get_instances(xform, start, end):
     kwargs = {'deleted_at': None}
 
@@ -169,8 +226,35 @@ def _get_sort_fields(sort):
     return [i for i in _parse_sort_fields(sort)]
 
 
+def _json_object_text_sql(num_fields):
+    """
+    Returns the SQL of the JSON text of an object of num_fields json fields.
+
+    Postgres functions take at most 100 arguments, objects of more fields
+    are built in chunks whose members are joined as one json_build_object
+    would write them.
+    """
+    chunks = [
+        u"json_build_object(%s)::text" % u",".join(
+            [u"%s::text, json->%s"] * min(
+                JSON_BUILD_OBJECT_MAX_FIELDS, num_fields - i))
+        for i in range(0, num_fields, JSON_BUILD_OBJECT_MAX_FIELDS)]
+    if len(chunks) == 1:
+        return chunks[0]
+
+    return u" || ', ' || ".join(
+        [u"left(%s, -1)" % chunks[0]] +
+        [u"substr(left(%s, -1), 2)" % chunk for chunk in chunks[1:-1]] +
+        [u"substr(%s, 2)" % chunks[-1]])
+
+
 def get_sql_with_params(xform, query=None, fields=None, sort=None, start=None,
-                        end=None, start_index=None, limit=None, count=None):
+                        end=None, start_index=None, limit=None, count=None,
+                        cursor=None, json_text=False):
+    if cursor is not None and (sort or start_index is not None):
+        raise ValueError(
+            _("sort and start are not supported with cursor pagination"))
+
     records = _get_instances(xform, start, end)
     params = []
     sort = _get_sort_fields(sort)
@@ -181,11 +265,25 @@ def get_sql_with_params(xform, query=None, fields=None, sort=None, start=None,
         for e in xform.get_survey_elements_of_type('integer')]
     where, where_params = get_where_clause(query, known_integers)
 
+    if getattr(settings, 'JSON_FIELD_QUERY_TRACKING_ENABLED', False) and \
+            not xform.is_merged_dataset:
+        json_fields = get_json_query_fields(query, known_integers)
+        if not count and ParsedInstance._has_json_fields(sort):
+            json_fields += [(field.lstrip('-'), '') for field in sort]
+        record_json_field_queries(xform.pk, json_fields)
+
     if fields and isinstance(fields, six.string_types):
         fields = json.loads(fields)
 
     if fields:
-        field_list = [u"json->%s" for _i in fields]
+        if json_text and not count and cursor is None:
+            # the fields are selected as one json object, the field names
+            # are passed twice, as keys and as json keys
+            field_list = [_json_object_text_sql(len(fields))]
+        else:
+            field_list = [u"json->%s" for _i in fields]
+        if cursor is not None:
+            field_list += list(cursor.fields)
         sql = u"SELECT %s FROM logger_instance" % u",".join(field_list)
 
         sql_where = u""
@@ -195,9 +293,21 @@ def get_sql_with_params(xform, query=None, fields=None, sort=None, start=None,
         sql += u" WHERE xform_id = %s " + sql_where \
             + u" AND deleted_at IS NULL"
         params = [xform.pk] + where_params
+
+        if cursor is not None and cursor.position is not None:
+            keyset_where, keyset_params = _keyset_where(cursor)
+            sql += u" AND " + keyset_where
+            params += keyset_params
     else:
 
-        records = records.values_list('json', flat=True)
+        if cursor is not None:
+            records = records.values_list('json', *cursor.fields)
+        elif json_text and not count:
+            records = records.annotate(
+                json_text=Cast('json', TextField())).values_list(
+                    'json_text', flat=True)
+        else:
+            records = records.values_list('json', flat=True)
         if query and isinstance(query, list):
             for qry in query:
                 w, wp = get_where_clause(qry, known_integers)
@@ -207,6 +317,17 @@ def get_sql_with_params(xform, query=None, fields=None, sort=None, start=None,
             if where_params:
                 records = records.extra(where=where, params=where_params)
 
+    if cursor is not None:
+        limit = limit or ParsedInstance.DEFAULT_LIMIT
+        if fields:
+            sql = u"%s ORDER BY %s LIMIT %%s" % (
+                sql, u", ".join(cursor.fields))
+            params += [limit]
+        else:
+            records = keyset_queryset(records, cursor, limit)
+
+        return sql, params, records
+
     # apply sorting
     if not count and sort:
         if ParsedInstance._has_json_fields(sort):
@@ -226,16 +347,37 @@ def get_sql_with_params(xform, query=None, fields=None, sort=None, start=None,
 
 
 def query_data(xform, query=None, fields=None, sort=None, start=None,
-               end=None, start_index=None, limit=None, count=None):
-
+               end=None, start_index=None, limit=None, count=None,
+               cursor=None, itersize=None, json_text=False):
+    """
+    Returns submissions of an xform. When a KeysetCursor is given, a single
+    page of ``limit`` records following the cursor position is returned and
+    the cursor is advanced past it.
+
+    Raw SQL results are streamed from a server-side cursor ``itersize``
+    records at a time. With ``json_text`` the records are returned as the
+    JSON text postgres serializes them to, ready to be written out without
+    being decoded, it is ignored for counts and cursor pages.
+    """
+    if count:
+        cursor = None
+    json_text = json_text and not count and cursor is None
     sql, params, records = get_sql_with_params(
-        xform, query, fields, sort, start, end, start_index, limit, count
+        xform, query, fields, sort, start, end, start_index, limit, count,
+        cursor, json_text
     )
     if fields and isinstance(fields, six.string_types):
         fields = json.loads(fields)
+    if cursor is not None:
+        return _keyset_page(records, sql, fields, params, cursor,
+                            limit or ParsedInstance.DEFAULT_LIMIT)
     sort = _get_sort_fields(sort)
-    if (ParsedInstance._has_json_fields(sort) or fields) and sql:
-        records = _query_iterator(sql, fields, params, count)
+    if json_text and fields:
+        field_params = [name for field in fields for name in (field, field)]
+        records = _query_iterator(sql, params=field_params + params,
+                                  itersize=itersize)
+    elif (ParsedInstance._has_json_fields(sort) or fields) and sql:
+        records = _query_iterator(sql, fields, params, count, itersize)
 
     if count and isinstance(records, types.GeneratorType):
         return [i for i in records]
@@ -14,24 +14,32 @@ NONE_JSON_FIELDS = {
 }
 
 
-def _json_sql_str(key, known_integers=None, known_dates=None,
-                  known_decimals=None):
-    if known_integers is None:
-        known_integers = []
-    if known_dates is None:
-        known_dates = []
-    if known_decimals is None:
-        known_decimals = []
-    _json_str = u"json->>%s"
+# the onadata_cast_* functions return NULL for values that are not numbers,
+# they are inlined regular expression guarded casts
+JSON_SQL_CASTS = {
+    '': u"json->>%s",
+    'int': u"onadata_cast_int(json->>%s)",
+    'timestamp': u"CAST(json->>%s AS TIMESTAMP)",
+    'decimal': u"onadata_cast_decimal(json->>%s)",
+}
+
+
+def _json_cast_type(key, known_integers=None, known_dates=None,
+                    known_decimals=None):
+    if known_integers and key in known_integers:
+        return 'int'
+    elif known_dates and key in known_dates:
+        return 'timestamp'
+    elif known_decimals and key in known_decimals:
+        return 'decimal'
 
-    if key in known_integers:
-        _json_str = u"CAST(json->>%s AS INT)"
-    elif key in known_dates:
-        _json_str = u"CAST(json->>%s AS TIMESTAMP)"
-    elif key in known_decimals:
-        _json_str = u"CAST(json->>%s AS DECIMAL)"
+    return ''
 
-    return _json_str
+
+def _json_sql_str(key, known_integers=None, known_dates=None,
+                  known_decimals=None):
+    return JSON_SQL_CASTS[_json_cast_type(
+        key, known_integers, known_dates, known_decimals)]
 
 
 def _parse_where(query, known_integers, known_decimals, or_where, or_params):
@@ -123,8 +131,43 @@ def get_where_clause(query, form_integer_fields=None,
         if query and isinstance(query, six.string_types) and \
                 query.startswith('{'):
             raise e
-        # cast query param to text
-        where = [u"json::text ~* cast(%s as text)"]
-        where_params = [query]
+        # search the trigram indexed text of the submission values, or the
+        # json of submissions without one until set_instance_search_text
+        # has set it
+        where = [u"(search_text ~* cast(%s as text) OR (search_text IS NULL"
+                 u" AND json::text ~* cast(%s as text)))"]
+        where_params = [query, query]
 
     return where, where_params
+
+
+def get_json_query_fields(query, form_integer_fields=None,
+                          form_decimal_fields=None):
+    """
+    Returns the (field, cast_type) pairs of the JSON fields a query filters
+    on, cast_type is the JSON_SQL_CASTS key of the expression the field is
+    compared with.
+    """
+    known_integers = ['_id'] + (form_integer_fields or [])
+    if query and isinstance(query, six.string_types):
+        try:
+            query = json.loads(query)
+        except ValueError:
+            # a text search of the whole document
+            return []
+
+    fields = []
+    for qry in (query if isinstance(query, list) else [query]):
+        if not isinstance(qry, dict):
+            continue
+        for (field_key, field_value) in iteritems(qry):
+            if field_key == '$or':
+                fields.extend(
+                    (key, '') for or_query in field_value for key in or_query)
+            elif field_key not in NONE_JSON_FIELDS:
+                fields.append((field_key, _json_cast_type(
+                    field_key, known_integers, KNOWN_DATES,
+                    form_decimal_fields) if isinstance(field_value, dict)
+                    else ''))
+
+    return fields
@@ -7,7 +7,9 @@ from datetime import timedelta
 
 from future.utils import iteritems
 
+from celery import chord
 from django.conf import settings
+from django.core.cache import cache
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 
@@ -16,12 +18,21 @@ from requests import ConnectionError
 
 from onadata.apps.viewer.models.export import Export, ExportTypeError
 from onadata.libs.exceptions import NoRecordsFoundError
+from onadata.libs.utils.cache_tools import EXPORT_SHARD_PROGRESS, safe_delete
 from onadata.libs.utils.common_tools import get_boolean_value, report_exception
-from onadata.libs.utils.export_tools import (generate_attachments_zip_export,
+from onadata.libs.utils.export_tools import (delete_export_shards,
+                                             generate_attachments_zip_export,
                                              generate_export,
+                                             generate_export_shard,
                                              generate_external_export,
                                              generate_kml_export,
-                                             generate_osm_export)
+                                             generate_osm_export,
+                                             get_export_shards,
+                                             get_export_total_records,
+                                             get_export_watermark,
+                                             get_incremental_export_base,
+                                             is_incremental_export,
+                                             merge_export_shards)
 from onadata.celery import app
 
 EXPORT_QUERY_KEY = 'query'
@@ -49,6 +60,79 @@ def _get_export_details(username, id_string, export_id):
     return details
 
 
+def _get_export_progress_key(export_task_id):
+    return '{}{}'.format(EXPORT_SHARD_PROGRESS, export_task_id)
+
+
+class ExportShardTask(app.Task):
+    """
+    Reports the progress of an export shard as the progress of the export
+    task, the task clients poll, i.e. the records processed by all the
+    shards of the export.
+    """
+
+    def update_state(self, task_id=None, state=None, meta=None, **kwargs):
+        export_task_id = self.request.kwargs.get('export_task_id')
+        if task_id is not None or state != 'PROGRESS' or \
+                export_task_id is None:
+            return super(ExportShardTask, self).update_state(
+                task_id, state, meta, **kwargs)
+
+        # the progress of a shard is the number of records it processed
+        additions = meta['progress'] - getattr(self.request,
+                                               'export_progress', 0)
+        self.request.export_progress = meta['progress']
+        key = _get_export_progress_key(export_task_id)
+        cache.add(key, 0, getattr(settings, 'EXPORT_TASK_LIFESPAN', 6) * 3600)
+        meta = {'progress': cache.incr(key, additions)}
+        total_records = self.request.kwargs.get('total_records')
+        if total_records:
+            meta['total'] = total_records
+
+        return super(ExportShardTask, self).update_state(
+            export_task_id, state, meta, **kwargs)
+
+
+def _get_sharded_export(export_type, export, options, export_task_id):
+    """
+    Returns a chord that generates the export shards in parallel and merges
+    them, None when the export is generated in a single task.
+
+    The shards report their progress as the progress of the export task
+    export_task_id, if a shard fails the shards already generated are
+    deleted.
+    """
+    xform = export.xform
+    max_instance_id = None
+    if is_incremental_export(xform, export_type, options):
+        if get_incremental_export_base(
+                xform, export_type, options, export.options) is not None:
+            # appending the new submissions is cheaper than sharding
+            return None
+        watermark = get_export_watermark(xform)
+        max_instance_id = watermark['max_instance_id']
+
+    shards = get_export_shards(xform, export_type, options, max_instance_id)
+    if not shards:
+        return None
+    if max_instance_id is not None:
+        # recorded before the shards are read, the merge saves the export
+        Export.objects.filter(pk=export.pk).update(**watermark)
+
+    total_records = get_export_total_records(xform, options)
+    safe_delete(_get_export_progress_key(export_task_id))
+    merged_export = create_merged_export.s(export_type, export.id, **options)
+    merged_export.link_error(
+        delete_failed_export_shards.si(export_type, export.id))
+
+    return chord(
+        [create_export_shard.si(export_type, export.id, first_id, last_id,
+                                export_task_id=export_task_id,
+                                total_records=total_records, **options)
+         for (first_id, last_id) in shards],
+        merged_export)
+
+
 def create_async_export(xform, export_type, query, force_xlsx, options=None):
     """
     Starts asynchronous export tasks and returns an export object.
@@ -90,6 +174,7 @@ def create_async_export(xform, export_type, query, force_xlsx, options=None):
         Export.CSV_EXPORT: create_csv_export,
         Export.CSV_ZIP_EXPORT: create_csv_zip_export,
         Export.SAV_ZIP_EXPORT: create_sav_zip_export,
+        Export.PARQUET_EXPORT: create_parquet_export,
         Export.ZIP_EXPORT: create_zip_export,
         Export.KML_EXPORT: create_kml_export,
         Export.OSM_EXPORT: create_osm_export,
@@ -159,14 +244,19 @@ def create_xls_export(username, id_string, export_id, **options):
         return gen_export.id
 
 
-@app.task(track_started=True)
-def create_csv_export(username, id_string, export_id, **options):
+@app.task(bind=True, track_started=True)
+def create_csv_export(self, username, id_string, export_id, **options):
     """
     CSV export task.
     """
     # we re-query the db instead of passing model objects according to
     # http://docs.celeryproject.org/en/latest/userguide/tasks.html#state
     export = _get_export_object(export_id)
+    sharded_export = _get_sharded_export(
+        Export.CSV_EXPORT, export, options, self.request.id)
+    if sharded_export is not None:
+        # the merge task takes over the id of this task, the export task_id
+        return self.replace(sharded_export)
 
     try:
         # though export is not available when for has 0 submissions, we
@@ -293,13 +383,18 @@ def create_zip_export(username, id_string, export_id, **options):
         return gen_export.id
 
 
-@app.task(track_started=True)
-def create_csv_zip_export(username, id_string, export_id, **options):
+@app.task(bind=True, track_started=True)
+def create_csv_zip_export(self, username, id_string, export_id, **options):
     """
     CSV zip export task.
     """
     export = _get_export_object(export_id)
     options["extension"] = Export.ZIP_EXPORT
+    sharded_export = _get_sharded_export(
+        Export.CSV_ZIP_EXPORT, export, options, self.request.id)
+    if sharded_export is not None:
+        # the merge task takes over the id of this task, the export task_id
+        return self.replace(sharded_export)
     try:
         # though export is not available when for has 0 submissions, we
         # catch this since it potentially stops celery
@@ -320,6 +415,73 @@ def create_csv_zip_export(username, id_string, export_id, **options):
         return gen_export.id
 
 
+@app.task(base=ExportShardTask, track_started=True)
+def create_export_shard(export_type, export_id, first_id, last_id,
+                        export_task_id=None, total_records=None, **options):
+    """
+    Export shard task, generates the records with ids from first_id to
+    last_id of a sharded export.
+    """
+    export = _get_export_object(export_id)
+    try:
+        return generate_export_shard(export_type, export.xform, export_id,
+                                     first_id, last_id, options)
+    except Exception as e:
+        export.internal_status = Export.FAILED
+        export.error_message = str(e)
+        export.save()
+        # mail admins
+        details = _get_export_details(
+            export.xform.user.username, export.xform.id_string, export_id)
+        report_exception(
+            "Export Shard Exception: Export ID - "
+            "%(export_id)s, /%(username)s/%(id_string)s" % details, e,
+            sys.exc_info())
+        raise
+
+
+@app.task(track_started=True)
+def create_merged_export(shard_filenames, export_type, export_id, **options):
+    """
+    Merges the shards of a sharded export.
+    """
+    export = _get_export_object(export_id)
+    if export.task_id:
+        safe_delete(_get_export_progress_key(export.task_id))
+    try:
+        gen_export = merge_export_shards(export_type, export.xform,
+                                         shard_filenames, export_id, options)
+    except Exception as e:
+        export.internal_status = Export.FAILED
+        export.error_message = str(e)
+        export.save()
+        # mail admins
+        details = _get_export_details(
+            export.xform.user.username, export.xform.id_string, export_id)
+        report_exception(
+            "Merge Export Exception: Export ID - "
+            "%(export_id)s, /%(username)s/%(id_string)s" % details, e,
+            sys.exc_info())
+        raise
+    else:
+        return gen_export.id
+
+
+@app.task(track_started=True)
+def delete_failed_export_shards(export_type, export_id):
+    """
+    Error callback of a sharded export, deletes the files of the shards
+    generated before a shard failed and marks the export as failed.
+    """
+    export = _get_export_object(export_id)
+    delete_export_shards(export.xform, export_type, export_id)
+    if export.task_id:
+        safe_delete(_get_export_progress_key(export.task_id))
+    if export.internal_status != Export.FAILED:
+        export.internal_status = Export.FAILED
+        export.save()
+
+
 @app.task(track_started=True)
 def create_sav_zip_export(username, id_string, export_id, **options):
     """
@@ -346,6 +508,33 @@ def create_sav_zip_export(username, id_string, export_id, **options):
         return gen_export.id
 
 
+@app.task(track_started=True)
+def create_parquet_export(username, id_string, export_id, **options):
+    """
+    Parquet export task.
+    """
+    export = _get_export_object(export_id)
+    options["extension"] = Export.ZIP_EXPORT
+    try:
+        # though export is not available when for has 0 submissions, we
+        # catch this since it potentially stops celery
+        gen_export = generate_export(Export.PARQUET_EXPORT, export.xform,
+                                     export_id, options)
+    except (Exception, NoRecordsFoundError) as e:
+        export.internal_status = Export.FAILED
+        export.error_message = str(e)
+        export.save()
+        # mail admins
+        details = _get_export_details(username, id_string, export_id)
+        report_exception(
+            "Parquet Export Exception: Export ID - "
+            "%(export_id)s, /%(username)s/%(id_string)s" % details, e,
+            sys.exc_info())
+        raise
+    else:
+        return gen_export.id
+
+
 @app.task(track_started=True)
 def create_external_export(username, id_string, export_id, **options):
     """
@@ -1,11 +1,17 @@
+import base64
+import json
 import os
 
 from onadata.apps.logger.models.instance import Instance
 from onadata.apps.main.models.user_profile import UserProfile
 from onadata.apps.main.tests.test_base import TestBase
 from onadata.apps.viewer.models.parsed_instance import (
-    get_where_clause, get_sql_with_params
+    get_where_clause, get_sql_with_params, query_data
 )
+from onadata.libs.pagination import KeysetCursor
+
+SEARCH_WHERE = (u"(search_text ~* cast(%s as text) OR (search_text IS NULL"
+                u" AND json::text ~* cast(%s as text)))")
 
 
 class TestParsedInstance(TestBase):
@@ -18,14 +24,14 @@ class TestParsedInstance(TestBase):
     def test_get_where_clause_with_string_query(self):
         query = 'bla'
         where, where_params = get_where_clause(query)
-        self.assertEqual(where, [u"json::text ~* cast(%s as text)"])
-        self.assertEqual(where_params, ["bla"])
+        self.assertEqual(where, [SEARCH_WHERE])
+        self.assertEqual(where_params, ["bla", "bla"])
 
     def test_get_where_clause_with_integer(self):
         query = '11'
         where, where_params = get_where_clause(query)
-        self.assertEqual(where, [u"json::text ~* cast(%s as text)"])
-        self.assertEqual(where_params, [11])
+        self.assertEqual(where, [SEARCH_WHERE])
+        self.assertEqual(where_params, [11, 11])
 
     def test_retrieve_records_based_on_form_verion(self):
 
@@ -130,3 +136,48 @@ class TestParsedInstance(TestBase):
             xform=self.xform, query=[{'_submitted_by': 'bob'}, 'ambulance']
         )
         self.assertEqual(2, records.count())
+
+    def test_query_data_with_keyset_cursor(self):
+        self._create_user_and_login()
+        self._publish_transportation_form()
+        for a in range(4):
+            self._submit_transport_instance(survey_at=a)
+        instance_ids = list(self.xform.instances.order_by('id').values_list(
+            'id', flat=True))
+
+        cursor = KeysetCursor()
+        records = query_data(self.xform, limit=3, cursor=cursor)
+        self.assertEqual([r['_id'] for r in records], instance_ids[:3])
+        self.assertEqual(cursor.next_position, [instance_ids[2]])
+
+        cursor = KeysetCursor.decode(cursor.encode())
+        records = query_data(
+            self.xform, fields='["_id"]', limit=3, cursor=cursor)
+        self.assertEqual(records, [{'_id': instance_ids[3]}])
+        self.assertIsNone(cursor.encode())
+
+        with self.assertRaises(ValueError):
+            query_data(self.xform, sort='{"_id": -1}', cursor=KeysetCursor())
+
+        for position in [["date_modified", [[1], 2]],
+                         ["date_modified", ["2020-13-45T00:00:00", 1]],
+                         ["date_modified", ["2020-01-01T00:00:00", "1"]],
+                         ["id", ["1"]], ["id", [True]], ["id", 1],
+                         [["id"], [1]]]:
+            token = base64.urlsafe_b64encode(
+                json.dumps(position).encode('utf-8')).decode('utf-8')
+            with self.assertRaises(ValueError):
+                KeysetCursor.decode(token)
+
+    def test_query_data_json_text_with_many_fields(self):
+        self._publish_transportation_form_and_submit_instance()
+        field = 'transport/available_transportation_types_to_referral_facility'
+        fields = [field] + ['field_%d' % i for i in range(120)]
+
+        records = list(query_data(self.xform, fields=json.dumps(fields),
+                                  json_text=True))
+        self.assertEqual(len(records), 1)
+        record = json.loads(records[0])
+        self.assertEqual(list(record), fields)
+        self.assertEqual(record[field], 'none')
+        self.assertIsNone(record['field_119'])
@@ -2,10 +2,17 @@ from datetime import timedelta
 
 from celery import current_app
 from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test.utils import override_settings
 from django.utils import timezone
+from mock import patch
 
 from onadata.apps.main.tests.test_base import TestBase
 from onadata.apps.viewer.models.export import Export
+from onadata.apps.viewer.tasks import (_get_sharded_export,
+                                       create_export_shard,
+                                       delete_failed_export_shards)
 from onadata.apps.viewer.tasks import create_async_export
 from onadata.apps.viewer.tasks import mark_expired_pending_exports_as_failed
 from onadata.apps.viewer.tasks import delete_expired_failed_exports
@@ -43,6 +50,80 @@ class TestExportTasks(TestBase):
             self.assertIn("username", options)
             self.assertEquals(options.get("id_string"), self.xform.id_string)
 
+    @override_settings(EXPORT_SHARD_COUNT=2, EXPORT_SHARD_MIN_RECORDS=1)
+    def test_create_async_sharded_export(self):
+        self._publish_transportation_form()
+        for survey_at in range(3):
+            self._submit_transport_instance(survey_at=survey_at)
+        options = {"group_delimiter": "/",
+                   "remove_group_name": False,
+                   "split_select_multiples": True}
+
+        for export_type in [Export.CSV_EXPORT, Export.CSV_ZIP_EXPORT]:
+            export, result = create_async_export(
+                self.xform, export_type, None, False, dict(options))
+            export = Export.objects.get(pk=export.pk)
+            self.assertEqual(result.get(), export.id)
+            self.assertTrue(export.is_successful)
+            self.assertEqual(export.task_id, result.task_id)
+
+    @override_settings(EXPORT_SHARD_COUNT=2, EXPORT_SHARD_MIN_RECORDS=1,
+                       EXPORT_TASK_PROGRESS_UPDATE_BATCH=1)
+    @patch('celery.app.task.Task.update_state')
+    def test_export_shard_progress_is_export_task_progress(self,
+                                                           update_state):
+        self._publish_transportation_form()
+        for survey_at in range(3):
+            self._submit_transport_instance(survey_at=survey_at)
+        export = Export.objects.create(
+            xform=self.xform, export_type=Export.CSV_EXPORT,
+            internal_status=Export.PENDING, task_id='export-task-id')
+
+        sharded_export = _get_sharded_export(
+            Export.CSV_EXPORT, export, {}, export.task_id)
+        for shard in sharded_export.tasks:
+            create_export_shard.apply(args=shard.args, kwargs=shard.kwargs)
+
+        self.assertEqual(
+            [call[0][:2] for call in update_state.call_args_list],
+            [(export.task_id, 'PROGRESS')] * 3)
+        self.assertEqual(
+            [call[0][2] for call in update_state.call_args_list],
+            [{'progress': i, 'total': 3} for i in range(1, 4)])
+
+    def test_failed_export_shards_are_deleted(self):
+        self._publish_transportation_form_and_submit_instance()
+        export = Export.objects.create(
+            xform=self.xform, export_type=Export.CSV_EXPORT,
+            internal_status=Export.PENDING)
+        shard_filename = default_storage.save(
+            '{}/exports/{}/csv/shards/{}/1-10.csv'.format(
+                self.user.username, self.xform.id_string, export.pk),
+            ContentFile(b'_id\n1\n'))
+
+        delete_failed_export_shards(Export.CSV_EXPORT, export.pk)
+
+        self.assertFalse(default_storage.exists(shard_filename))
+        export = Export.objects.get(pk=export.pk)
+        self.assertEqual(export.internal_status, Export.FAILED)
+
+    @override_settings(EXPORT_SHARD_COUNT=2, EXPORT_SHARD_MIN_RECORDS=1)
+    def test_sharded_export_error_callback(self):
+        self._publish_transportation_form()
+        for survey_at in range(3):
+            self._submit_transport_instance(survey_at=survey_at)
+        export = Export.objects.create(
+            xform=self.xform, export_type=Export.CSV_EXPORT,
+            internal_status=Export.PENDING)
+
+        sharded_export = _get_sharded_export(
+            Export.CSV_EXPORT, export, {}, 'export-task-id')
+        self.assertEqual(
+            [(errback.task, errback.args)
+             for errback in sharded_export.body.options['link_error']],
+            [(delete_failed_export_shards.name,
+              (Export.CSV_EXPORT, export.pk))])
+
     def test_mark_expired_pending_exports_as_failed(self):
         self._publish_transportation_form_and_submit_instance()
         over_threshold = settings.EXPORT_TASK_LIFESPAN + 2
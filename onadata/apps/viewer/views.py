@@ -18,7 +18,7 @@ from django.contrib.auth.models import User
 from django.core.files.storage import FileSystemStorage, get_storage_class
 from django.http import (HttpResponse, HttpResponseBadRequest,
                          HttpResponseForbidden, HttpResponseNotFound,
-                         HttpResponseRedirect)
+                         HttpResponseRedirect, StreamingHttpResponse)
 from django.shortcuts import get_object_or_404, redirect, render
 from django.template import loader
 from django.urls import reverse
@@ -50,7 +50,8 @@ from onadata.libs.utils.logger_tools import (
 from onadata.libs.utils.user_auth import (get_xform_and_perms, has_permission,
                                           helper_auth_helper)
 from onadata.libs.utils.viewer_tools import (
-    create_attachments_zipfile, export_def_from_filename, get_form)
+    create_attachments_zipfile, export_def_from_filename, get_form,
+    stream_attachments_zipfile)
 from onadata.libs.utils.common_tools import get_uuid
 
 
@@ -282,7 +283,8 @@ def data_export(request, username, id_string, export_type):
     force_xlsx = request.GET.get('xls') != 'true'
     if export_type == Export.XLS_EXPORT and force_xlsx:
         extension = 'xlsx'
-    elif export_type in [Export.CSV_ZIP_EXPORT, Export.SAV_ZIP_EXPORT]:
+    elif export_type in [Export.CSV_ZIP_EXPORT, Export.SAV_ZIP_EXPORT,
+                         Export.PARQUET_EXPORT]:
         extension = 'zip'
 
     audit = {"xform": xform.id_string, "export_type": export_type}
@@ -652,10 +654,24 @@ def zip_export(request, username, id_string):
 
     attachments = Attachment.objects.filter(instance__xform=xform)
     zip_file = None
+    audit = {"xform": xform.id_string, "export_type": Export.ZIP_EXPORT}
+
+    if getattr(settings, 'ZIP_EXPORT_STREAMING', False):
+        # the archive is written as it is sent, without a temporary file
+        audit_log(Actions.EXPORT_DOWNLOADED, request.user, owner,
+                  _("Downloaded ZIP export on '%(id_string)s'.") % {
+                      'id_string': xform.id_string,
+                  }, audit, request)
+        response = StreamingHttpResponse(
+            stream_attachments_zipfile(attachments.iterator()),
+            content_type='application/zip')
+        response['Content-Disposition'] = \
+            generate_content_disposition_header(id_string, 'zip')
+
+        return response
 
     try:
         zip_file = create_attachments_zipfile(attachments)
-        audit = {"xform": xform.id_string, "export_type": Export.ZIP_EXPORT}
         audit_log(Actions.EXPORT_CREATED, request.user, owner,
                   _("Created ZIP export on '%(id_string)s'.") % {
                       'id_string': xform.id_string,
@@ -43,6 +43,20 @@ app.autodiscover_tasks(lambda: settings.INSTALLED_APPS)
 app.conf.broker_transport_options = {'visibility_timeout': 10}
 
 
+@app.on_after_configure.connect
+def setup_periodic_tasks(sender, **kwargs):
+    """
+    Schedule the periodic tasks of the features that are enabled.
+    """
+    if getattr(settings, 'SUBMISSION_COUNT_BUFFERING_ENABLED', False):
+        sender.add_periodic_task(
+            getattr(settings, 'SUBMISSION_COUNT_FLUSH_INTERVAL', 30.0),
+            sender.signature(
+                'onadata.apps.logger.models.submission_count_delta.'
+                'flush_submission_count_deltas'),
+            name='flush-submission-count-deltas')
+
+
 @app.task
 def debug_task():
     """A test task"""
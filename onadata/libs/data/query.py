@@ -2,7 +2,7 @@ import logging
 from django.conf import settings
 from django.db import connection
 
-from onadata.libs.utils.common_tags import SUBMISSION_TIME
+from onadata.libs.utils.common_tags import SELECT_ONE, SUBMISSION_TIME
 from onadata.apps.logger.models.data_view import DataView
 
 
@@ -27,15 +27,7 @@ def _execute_query(query, to_dict=True):
 
 
 def _get_fields_of_type(xform, types):
-    k = []
-    survey_elements = flatten(
-        [xform.get_survey_elements_of_type(t) for t in types])
-
-    for element in survey_elements:
-        name = element.get_abbreviated_xpath()
-        k.append(name)
-
-    return k
+    return flatten([xform.get_xpaths_of_type(t) for t in types])
 
 
 def _additional_data_view_filters(data_view):
@@ -209,12 +201,31 @@ def get_field_records(field, xform):
     return [float(i[0]) for i in result if i[0] is not None]
 
 
+def get_field_value_counts(field, xform):
+    """Numeric values of a field and the number of submissions with each"""
+    from onadata.apps.logger.models.form_aggregate import get_form_aggregate
+
+    result = get_form_aggregate(xform, field)
+    if result is None:
+        result = _execute_query(_postgres_count_group(field, field, xform),
+                                to_dict=False)
+
+    return [(float(value), count) for (value, count) in result
+            if value is not None]
+
+
 def get_form_submissions_grouped_by_field(xform, field, name=None,
                                           data_view=None):
     """Number of submissions grouped by field"""
+    from onadata.apps.logger.models.form_aggregate import get_form_aggregate
+
     if not name:
         name = field
 
+    result = None if data_view else get_form_aggregate(xform, field)
+    if result is not None:
+        return [{name: value, 'count': count} for (value, count) in result]
+
     return _execute_query(_postgres_count_group(field, name, xform, data_view))
 
 
@@ -248,6 +259,11 @@ def get_numeric_fields(xform):
     return _get_fields_of_type(xform, ['decimal', 'integer'])
 
 
+def get_select_one_fields(xform):
+    """List of select one field names for specified xform"""
+    return _get_fields_of_type(xform, [SELECT_ONE])
+
+
 def is_date_field(xform, field):
     return field in get_date_fields(xform)
 
@@ -1,6 +1,6 @@
 import numpy as np
 from onadata.apps.api.tools import DECIMAL_PRECISION
-from onadata.libs.data.query import get_field_records, get_numeric_fields
+from onadata.libs.data.query import get_field_value_counts, get_numeric_fields
 
 
 def _chk_asarray(a, axis):
@@ -41,8 +41,48 @@ def get_mode(values, axis=0):
     return mostfrequent, oldcounts
 
 
+def get_weighted_median(values, counts):
+    """
+    Median of values where each value occurs counts times.
+    """
+    if not len(values):
+        return np.median(values)
+
+    order = np.argsort(values)
+    values = np.asarray(values, dtype=float)[order]
+    cumulative = np.cumsum(np.asarray(counts)[order])
+    total = cumulative[-1]
+    lower = values[np.searchsorted(cumulative, (total - 1) // 2, 'right')]
+    upper = values[np.searchsorted(cumulative, total // 2, 'right')]
+
+    return (lower + upper) / 2
+
+
+def get_weighted_mode(values, counts):
+    """
+    Mode of values where each value occurs counts times, the smallest value
+    of the most frequent ones like get_mode.
+    """
+    if not len(values):
+        return np.zeros(1)
+
+    max_count = np.max(counts)
+
+    return np.array([min(
+        value for (value, count) in zip(values, counts)
+        if count == max_count)])
+
+
+def _get_field_value_counts(field, xform):
+    value_counts = get_field_value_counts(field, xform)
+    values = np.array([value for (value, count) in value_counts])
+    counts = np.array([count for (value, count) in value_counts])
+
+    return values, counts
+
+
 def get_median_for_field(field, xform):
-    return np.median(get_field_records(field, xform))
+    return get_weighted_median(*_get_field_value_counts(field, xform))
 
 
 def get_median_for_numeric_fields_in_form(xform, field=None):
@@ -54,7 +94,11 @@ def get_median_for_numeric_fields_in_form(xform, field=None):
 
 
 def get_mean_for_field(field, xform):
-    return np.mean(get_field_records(field, xform))
+    values, counts = _get_field_value_counts(field, xform)
+    if not len(values):
+        return np.mean(values)
+
+    return np.average(values, weights=counts)
 
 
 def get_mean_for_numeric_fields_in_form(xform, field):
@@ -66,9 +110,7 @@ def get_mean_for_numeric_fields_in_form(xform, field):
 
 
 def get_mode_for_field(field, xform):
-    a = np.array(get_field_records(field, xform))
-    m, count = get_mode(a)
-    return m
+    return get_weighted_mode(*_get_field_value_counts(field, xform))
 
 
 def get_mode_for_numeric_fields_in_form(xform, field=None):
@@ -80,7 +122,7 @@ def get_mode_for_numeric_fields_in_form(xform, field=None):
 
 
 def get_min_max_range_for_field(field, xform):
-    a = np.array(get_field_records(field, xform))
+    a, counts = _get_field_value_counts(field, xform)
     _max = np.max(a)
     _min = np.min(a)
     _range = _max - _min
@@ -1,73 +1,60 @@
-import logging
-import time
-from django.conf import settings
-from django.core.signals import request_started, request_finished
 from django.http import StreamingHttpResponse
 
 from rest_framework.fields import empty
 
-
-project_viewset_profiler = logging.getLogger('profiler_logger')
+from onadata.libs.profiling.metrics import (AUTH, PERMISSION, QUERYSET,
+                                            RENDER, SERIALIZE, get_metrics,
+                                            timed, timer)
 
 
 class ProfilerMixin(object):
+    """
+    Times the authentication, permission checks, querysets, serialization
+    and rendering of a view in the metrics of instrumented requests.
+    """
 
-    def get_serializer(self, instance=None, data=empty, **kwargs):
-        serializer_class = self.get_serializer_class()
-        kwargs['context'] = self.get_serializer_context()
-
-        if settings.PROFILE_API_ACTION_FUNCTION:
-            global serializer_time
-            serializer_start = time.time()
-
-            serializer = serializer_class(instance, data=data, **kwargs)
-            serializer_time = time.time() - serializer_start
-            return serializer
+    def perform_authentication(self, request):
+        with timer(AUTH):
+            return super(ProfilerMixin, self).perform_authentication(request)
 
-        return serializer_class(instance, data=data, **kwargs)
+    def check_permissions(self, request):
+        with timer(PERMISSION):
+            return super(ProfilerMixin, self).check_permissions(request)
 
-    def dispatch(self, request, *args, **kwargs):
-        global render_time
-        global dispatch_time
-
-        dispatch_start = time.time()
-        ret = super(ProfilerMixin, self).dispatch(request, *args, **kwargs)
+    def check_object_permissions(self, request, obj):
+        with timer(PERMISSION):
+            return super(ProfilerMixin, self).check_object_permissions(
+                request, obj)
 
-        if not isinstance(ret, StreamingHttpResponse):
-            render_start = time.time()
-            ret.render()
-            render_time = time.time() - render_start
-        else:
-            render_time = 0
-        dispatch_time = time.time() - dispatch_start
+    def get_queryset(self):
+        with timer(QUERYSET):
+            return super(ProfilerMixin, self).get_queryset()
 
-        return ret
+    def filter_queryset(self, queryset):
+        with timer(QUERYSET):
+            return super(ProfilerMixin, self).filter_queryset(queryset)
 
+    def get_object(self):
+        with timer(QUERYSET):
+            return super(ProfilerMixin, self).get_object()
 
-def started(sender, **kwargs):
-    global started
-    started = time.time()
-
-
-def finished(sender, **kwargs):
-    try:
-        total = time.time() - started
-        api_view_time = dispatch_time - (render_time + serializer_time)
-        request_response_time = total - dispatch_time
-
-        output = "\n"
-        output += "Serialization                 | %.4fs\n" % serializer_time
-        output += "Django request/response       | %.4fs\n" %\
-            request_response_time
-        output += "API view                      | %.4fs\n" % api_view_time
-        output += "Response rendering            | %.4fs\n" % render_time
+    def get_serializer(self, instance=None, data=empty, **kwargs):
+        serializer = super(ProfilerMixin, self).get_serializer(
+            instance, data=data, **kwargs)
+        if get_metrics() is not None:
+            # serializers represent their data lazily, on .data
+            serializer.to_representation = timed(
+                SERIALIZE, serializer.to_representation)
 
-        project_viewset_profiler.debug(output)
+        return serializer
 
-    except NameError:
-        pass
+    def dispatch(self, request, *args, **kwargs):
+        ret = super(ProfilerMixin, self).dispatch(request, *args, **kwargs)
 
+        if get_metrics() is not None and \
+                not isinstance(ret, StreamingHttpResponse) and \
+                hasattr(ret, 'render'):
+            with timer(RENDER):
+                ret.render()
 
-if settings.PROFILE_API_ACTION_FUNCTION:
-    request_started.connect(started)
-    request_finished.connect(finished)
+        return ret
@@ -1,7 +1,13 @@
+import base64
+import json
+
 from django.core.paginator import Paginator
 from django.conf import settings
+from django.utils.dateparse import parse_datetime
+from django.utils.translation import ugettext as _
 from rest_framework.pagination import (
     PageNumberPagination, InvalidPage, NotFound)
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class StandardPageNumberPagination(PageNumberPagination):
@@ -11,6 +17,74 @@ class StandardPageNumberPagination(PageNumberPagination):
         settings, "STANDARD_PAGINATION_MAX_PAGE_SIZE", 10000)
 
 
+class KeysetCursor(object):
+    """
+    Position within a listing of submissions ordered by a unique key.
+
+    The position is the key of the last record on the previous page, so
+    fetching the next page is a ``WHERE key > position`` index range scan
+    whose cost does not grow with the page depth.
+    """
+    KEYSETS = {
+        'id': ('id',),
+        'date_modified': ('date_modified', 'id'),
+    }
+
+    def __init__(self, ordering='id', position=None):
+        if ordering not in self.KEYSETS:
+            raise ValueError(
+                _(u"Invalid cursor key %(key)s" % {'key': ordering}))
+        self.ordering = ordering
+        self.position = position
+        self.next_position = None
+
+    @property
+    def fields(self):
+        return self.KEYSETS[self.ordering]
+
+    @classmethod
+    def decode(cls, token):
+        """Returns a KeysetCursor from an opaque cursor token."""
+        try:
+            padding = '=' * (-len(token) % 4)
+            ordering, position = json.loads(
+                base64.urlsafe_b64decode(token + padding).decode('utf-8'))
+            cursor = cls(ordering, position)
+            if not isinstance(position, list) or \
+                    len(position) != len(cursor.fields) or \
+                    not all(cls._is_valid_key(field, value)
+                            for (field, value) in zip(cursor.fields,
+                                                      position)):
+                raise ValueError(_(u"Invalid cursor"))
+        except (TypeError, ValueError):
+            raise ValueError(_(u"Invalid cursor"))
+
+        return cursor
+
+    @staticmethod
+    def _is_valid_key(field, value):
+        if field == 'id':
+            return isinstance(value, int) and not isinstance(value, bool)
+
+        # raises ValueError for well formatted but invalid datetimes
+        return isinstance(value, str) and parse_datetime(value) is not None
+
+    def advance(self, position):
+        """Records the key of the last record on the current page."""
+        self.next_position = [
+            value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in position]
+
+    def encode(self):
+        """Returns the opaque token for the next page or None."""
+        if self.next_position is None:
+            return None
+        token = json.dumps([self.ordering, self.next_position])
+
+        return base64.urlsafe_b64encode(
+            token.encode('utf-8')).decode('utf-8').rstrip('=')
+
+
 class CountOverridablePaginator(Paginator):
     def __init__(
             self, object_list, per_page,
@@ -30,6 +104,37 @@ class CountOverridablePaginator(Paginator):
 
 class CountOverridablePageNumberPagination(StandardPageNumberPagination):
     django_paginator_class = CountOverridablePaginator
+    cursor_query_param = 'cursor'
+    cursor_key_query_param = 'cursor_key'
+
+    def get_keyset_cursor(self, request):
+        """
+        Returns a KeysetCursor when the request asks for cursor pagination,
+        an empty ``cursor`` parameter starts from the first record.
+        """
+        if self.cursor_query_param not in request.query_params:
+            return None
+
+        token = request.query_params.get(self.cursor_query_param)
+        try:
+            if token:
+                return KeysetCursor.decode(token)
+
+            return KeysetCursor(request.query_params.get(
+                self.cursor_key_query_param, 'id'))
+        except ValueError as exc:
+            raise NotFound(str(exc))
+
+    def get_keyset_next_link(self, request, cursor):
+        token = cursor.encode()
+        if token is None:
+            return None
+
+        url = request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        url = remove_query_param(url, self.cursor_key_query_param)
+
+        return replace_query_param(url, self.cursor_query_param, token)
 
     def paginate_queryset(self, queryset, request, view, count=None):
         page_size = self.get_page_size(request)
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+InstrumentedCache - count the cache hits and misses of requests.
+"""
+from django.core.cache.backends.base import BaseCache
+from django.utils.module_loading import import_string
+
+from onadata.libs.profiling.metrics import record_cache_access
+
+_MISSING = object()
+
+
+class InstrumentedCache(object):
+    """
+    A cache backend wrapping another one, counting the hits and misses of
+    get() and get_many() in the metrics of the current request.
+
+    The wrapped backend is configured in OPTIONS::
+
+        CACHES = {
+            'default': {
+                'BACKEND': 'onadata.libs.profiling.cache.InstrumentedCache',
+                'OPTIONS': {
+                    'BACKEND': 'django_redis.cache.RedisCache',
+                    'LOCATION': 'redis://127.0.0.1:6379/1',
+                    'OPTIONS': {},
+                }
+            }
+        }
+    """
+
+    def __init__(self, location, params):
+        options = dict(params.get('OPTIONS', {}))
+        backend = options.pop('BACKEND')
+        location = options.pop('LOCATION', location)
+        params = dict(params, OPTIONS=options.pop('OPTIONS', {}))
+        self._cache = import_string(backend)(location, params)
+
+    def __getattr__(self, name):
+        return getattr(self._cache, name)
+
+    def __contains__(self, key):
+        return self.has_key(key)
+
+    def get(self, key, default=None, version=None):
+        value = self._cache.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            record_cache_access(0, 1)
+            return default
+        record_cache_access(1)
+
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        values = self._cache.get_many(keys, version=version)
+        record_cache_access(len(values), len(keys) - len(values))
+
+        return values
+
+    # so that the lookups of these helpers are counted too
+    get_or_set = BaseCache.get_or_set
+    has_key = BaseCache.has_key
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+Request instrumentation - per request timers and process wide histograms.
+
+The metrics of a request are kept in a thread local, each request being
+served by a single thread, and are added to the histograms of its route when
+the request finishes.
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+
+# the phases of a request that are timed
+AUTH = 'auth'
+PERMISSION = 'permission'
+QUERYSET = 'queryset'
+SERIALIZE = 'serialize'
+RENDER = 'render'
+STREAM = 'stream'
+SQL = 'sql'
+TOTAL = 'total'
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_local = threading.local()
+
+
+class RequestMetrics(object):
+    """
+    The timings, SQL queries and cache accesses of a request.
+    """
+
+    def __init__(self, route=None):
+        self.route = route
+        self.start = time.time()
+        self.timings = defaultdict(float)
+        self.sql_count = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def add_time(self, phase, seconds):
+        self.timings[phase] += seconds
+
+    def sql_wrapper(self, execute, sql, params, many, context):
+        """
+        A database execute wrapper counting and timing the queries.
+        """
+        start = time.time()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_count += 1
+            self.add_time(SQL, time.time() - start)
+
+
+def get_metrics():
+    """
+    Returns the metrics of the current request, None when it is not
+    instrumented.
+    """
+    return getattr(_local, 'metrics', None)
+
+
+def start_metrics(route=None, metrics=None):
+    """
+    Starts the metrics of the current request, or resumes the given metrics
+    of a request, e.g. while its response is streamed.
+    """
+    _local.metrics = metrics or RequestMetrics(route)
+
+    return _local.metrics
+
+
+def stop_metrics():
+    """
+    Stops the metrics of the current request and returns them.
+    """
+    metrics = get_metrics()
+    _local.metrics = None
+
+    return metrics
+
+
+@contextmanager
+def timer(phase, metrics=None):
+    """
+    Adds the time spent in the block to a phase of the current request.
+    """
+    metrics = metrics or get_metrics()
+    if metrics is None:
+        yield
+        return
+
+    start = time.time()
+    try:
+        yield
+    finally:
+        metrics.add_time(phase, time.time() - start)
+
+
+def timed(phase, func):
+    """
+    Returns func adding the time it takes to a phase of the current request.
+    """
+    def _timed(*args, **kwargs):
+        with timer(phase):
+            return func(*args, **kwargs)
+
+    return _timed
+
+
+def record_cache_access(hits, misses=0):
+    """
+    Counts cache hits and misses of the current request.
+    """
+    metrics = get_metrics()
+    if metrics is not None:
+        metrics.cache_hits += hits
+        metrics.cache_misses += misses
+
+
+class Histogram(object):
+    """
+    A cumulative histogram of observed values.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry(object):
+    """
+    Histograms of the phase timings of requests, by route, and counters of
+    their SQL queries and cache accesses.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = defaultdict(int)
+
+    def record(self, metrics):
+        buckets = getattr(settings, 'INSTRUMENTATION_HISTOGRAM_BUCKETS',
+                          DEFAULT_BUCKETS)
+        route = metrics.route or 'unknown'
+        with self._lock:
+            for phase, seconds in metrics.timings.items():
+                key = (route, phase)
+                if key not in self.histograms:
+                    self.histograms[key] = Histogram(buckets)
+                self.histograms[key].observe(seconds)
+            self.counters[(route, 'requests')] += 1
+            self.counters[(route, 'sql_queries')] += metrics.sql_count
+            self.counters[(route, 'cache_hits')] += metrics.cache_hits
+            self.counters[(route, 'cache_misses')] += metrics.cache_misses
+
+    def clear(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def to_text(self):
+        """
+        Returns the metrics in the Prometheus text exposition format.
+        """
+        lines = ['# TYPE onadata_request_phase_seconds histogram']
+        with self._lock:
+            for (route, phase), histogram in sorted(self.histograms.items()):
+                labels = u'route="{}",phase="{}"'.format(route, phase)
+                cumulative = 0
+                for bound, count in zip(
+                        list(histogram.buckets) + ['+Inf'],
+                        histogram.counts):
+                    cumulative += count
+                    lines.append(
+                        u'onadata_request_phase_seconds_bucket{{{},le="{}"}} '
+                        u'{}'.format(labels, bound, cumulative))
+                lines.append(u'onadata_request_phase_seconds_sum{{{}}} {}'
+                             .format(labels, histogram.sum))
+                lines.append(u'onadata_request_phase_seconds_count{{{}}} {}'
+                             .format(labels, histogram.count))
+            for (route, name), value in sorted(self.counters.items()):
+                lines.append(u'onadata_request_{}_total{{route="{}"}} {}'
+                             .format(name, route, value))
+
+        return u'\n'.join(lines) + u'\n'
+
+
+registry = MetricsRegistry()
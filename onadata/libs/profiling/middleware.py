@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+MetricsMiddleware - instrument requests and sample profiles of routes.
+"""
+import random
+import re
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.http import StreamingHttpResponse
+from django.urls import Resolver404, resolve
+
+from onadata.libs.profiling.metrics import (STREAM, TOTAL, RequestMetrics,
+                                            registry, start_metrics,
+                                            stop_metrics)
+from onadata.libs.utils.profiler import get_profile_log_file, run_profiled
+
+
+def _should_profile(route):
+    """
+    Returns True when a request of a route is to be profiled, routes are
+    matched against the INSTRUMENTATION_PROFILE_ROUTES regular expressions
+    and sampled at INSTRUMENTATION_PROFILE_SAMPLE_RATE.
+    """
+    routes = getattr(settings, 'INSTRUMENTATION_PROFILE_ROUTES', ())
+    if not route or not routes:
+        return False
+
+    return any(re.match(pattern, route) for pattern in routes) and \
+        random.random() < getattr(
+            settings, 'INSTRUMENTATION_PROFILE_SAMPLE_RATE', 0.01)
+
+
+@contextmanager
+def _instrument(metrics):
+    """
+    Makes metrics the metrics of the current request and counts the SQL
+    queries run in the block.
+    """
+    start_metrics(metrics=metrics)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(metrics.sql_wrapper))
+            yield
+    finally:
+        stop_metrics()
+
+
+def _stream_with_metrics(streaming_content, metrics):
+    """
+    Times the streaming of a response, the request metrics are recorded once
+    the content has been streamed.
+
+    The queries and cache accesses of the streamed content are counted, the
+    content is generated after the middleware returned the response.
+    """
+    start = time.time()
+    try:
+        with _instrument(metrics):
+            for chunk in streaming_content:
+                yield chunk
+    finally:
+        metrics.add_time(STREAM, time.time() - start)
+        metrics.add_time(TOTAL, time.time() - metrics.start)
+        registry.record(metrics)
+
+
+class MetricsMiddleware(object):  # pylint: disable=R0903
+    """
+    Records the phase timings, SQL queries and cache accesses of requests in
+    the metrics registry when INSTRUMENTATION_ENABLED is set, and profiles a
+    sample of the requests of the INSTRUMENTATION_PROFILE_ROUTES.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'INSTRUMENTATION_ENABLED', False):
+            return self.get_response(request)
+
+        try:
+            route = resolve(request.path_info).view_name
+        except Resolver404:
+            route = None
+        metrics = RequestMetrics(route)
+        with _instrument(metrics):
+            if _should_profile(route):
+                log_file = get_profile_log_file(u'{}.prof'.format(
+                    re.sub(r'[^\w.-]', '-', route)))
+                response = run_profiled(log_file, self.get_response, request)
+            else:
+                response = self.get_response(request)
+
+        if isinstance(response, StreamingHttpResponse):
+            response.streaming_content = _stream_with_metrics(
+                response.streaming_content, metrics)
+        else:
+            metrics.add_time(TOTAL, time.time() - metrics.start)
+            registry.record(metrics)
+
+        return response
@@ -3,6 +3,7 @@
 SqlTimingMiddleware - log SQL execution times per request.
 """
 import logging
+import time
 
 from django.db import connection
 
@@ -18,23 +19,37 @@ class SqlTimingMiddleware(object):  # pylint: disable=R0903
     Logs the time taken by each sql query over requests.
     Logs the total time taken to run sql queries and the number of sql queries
     per request.
+
+    Queries are timed with a database execute wrapper, when the loggers are
+    enabled, so that it works without DEBUG.
     """
 
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request):
+        if not totals_log.isEnabledFor(logging.DEBUG) and \
+                not sql_log.isEnabledFor(logging.DEBUG):
+            return self.get_response(request)
+
         path_info = '%s %s' % (request.method, request.path_info)
-        response = self.get_response(request)
-        sqltime = 0  # Variable to store execution time
-        for query in connection.queries:
-            # Add the time that the query took to the total
-            sqltime += float(query["time"])
-            sql_log.debug(path_info, extra=query)
-
-        totals_log.debug(
-            path_info,
-            extra={'time': sqltime,
-                   'num_queries': len(connection.queries)})
+        totals = {'time': 0, 'num_queries': 0}
+
+        def _log_query(execute, sql, params, many, context):
+            start = time.time()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                duration = time.time() - start
+                # Add the time that the query took to the total
+                totals['time'] += duration
+                totals['num_queries'] += 1
+                sql_log.debug(path_info, extra={
+                    'sql': sql, 'time': '%.3f' % duration})
+
+        with connection.execute_wrapper(_log_query):
+            response = self.get_response(request)
+
+        totals_log.debug(path_info, extra=totals)
 
         return response
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""
+Metrics view - expose the request metrics to scrapers.
+"""
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+
+from onadata.libs.profiling.metrics import registry
+
+
+def _is_metrics_scraper(request):
+    """
+    Returns True for requests from the INSTRUMENTATION_METRICS_IPS or with
+    the INSTRUMENTATION_METRICS_TOKEN bearer token. Local addresses are not
+    trusted, behind a reverse proxy every request comes from one.
+    """
+    token = getattr(settings, 'INSTRUMENTATION_METRICS_TOKEN', None)
+    if token and constant_time_compare(
+            request.META.get('HTTP_AUTHORIZATION', ''),
+            u'Bearer {}'.format(token)):
+        return True
+
+    return request.META.get('REMOTE_ADDR') in getattr(
+        settings, 'INSTRUMENTATION_METRICS_IPS', [])
+
+
+def metrics(request):
+    """
+    Returns the request metrics in the Prometheus text format, only to
+    metrics scrapers when INSTRUMENTATION_ENABLED is set.
+    """
+    if not getattr(settings, 'INSTRUMENTATION_ENABLED', False) or \
+            not _is_metrics_scraper(request):
+        raise Http404
+
+    return HttpResponse(registry.to_text(),
+                        content_type='text/plain; version=0.0.4')
@@ -152,6 +152,22 @@ class SAVZIPRenderer(BaseRenderer):  # pylint: disable=too-few-public-methods
         return data
 
 
+class ParquetRenderer(BaseRenderer):  # pylint: disable=too-few-public-methods
+    """
+    ParquetRenderer - renders a ZIP file that contains Parquet files.
+    """
+    media_type = 'application/octet-stream'
+    format = 'parquet'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, six.text_type):
+            return data.encode('utf-8')
+        elif isinstance(data, dict):
+            return json.dumps(data)
+        return data
+
+
 class SurveyRenderer(BaseRenderer):  # pylint: disable=too-few-public-methods
     """
     SurveyRenderer - renders XML data.
@@ -54,7 +54,8 @@ class AttachmentSerializer(serializers.HyperlinkedModelSerializer):
     class Meta:
         fields = ('url', 'filename', 'mimetype', 'field_xpath', 'id', 'xform',
                   'instance', 'download_url', 'small_download_url',
-                  'medium_download_url')
+                  'medium_download_url', 'file_hash')
+        read_only_fields = ('file_hash', )
         model = Attachment
 
     @check_obj
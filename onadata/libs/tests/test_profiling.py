@@ -0,0 +1,148 @@
+# -*- coding=utf-8 -*-
+"""
+Test profiling module.
+"""
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from mock import patch
+
+from onadata.libs.profiling.metrics import (QUERYSET, SQL, STREAM, TOTAL,
+                                            get_metrics, record_cache_access,
+                                            registry, timer)
+from onadata.libs.profiling.middleware import MetricsMiddleware
+from onadata.libs.profiling.views import metrics
+
+
+class TestProfiling(TestCase):
+    """
+    Test request instrumentation.
+    """
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        registry.clear()
+
+    def tearDown(self):
+        registry.clear()
+
+    def _get_response(self, request):
+        from onadata.apps.logger.models import XForm
+
+        with timer(QUERYSET):
+            XForm.objects.count()
+        record_cache_access(1, 2)
+
+        return HttpResponse('ok')
+
+    @override_settings(INSTRUMENTATION_ENABLED=True)
+    def test_metrics_middleware(self):
+        """
+        Test MetricsMiddleware records the metrics of a request.
+        """
+        middleware = MetricsMiddleware(self._get_response)
+        response = middleware(self.factory.get('/_metrics'))
+        self.assertEqual(response.content, b'ok')
+        self.assertIsNone(get_metrics())
+
+        for phase in (QUERYSET, SQL, TOTAL):
+            self.assertEqual(
+                registry.histograms[('metrics', phase)].count, 1)
+        self.assertEqual(registry.counters[('metrics', 'requests')], 1)
+        self.assertEqual(registry.counters[('metrics', 'sql_queries')], 1)
+        self.assertEqual(registry.counters[('metrics', 'cache_hits')], 1)
+        self.assertEqual(registry.counters[('metrics', 'cache_misses')], 2)
+
+        text = registry.to_text()
+        self.assertIn(
+            'onadata_request_phase_seconds_count{route="metrics",'
+            'phase="sql"} 1', text)
+        self.assertIn('onadata_request_cache_misses_total{route="metrics"} 2',
+                      text)
+
+    @override_settings(INSTRUMENTATION_ENABLED=True)
+    def test_metrics_middleware_streaming(self):
+        """
+        Test MetricsMiddleware records streaming requests once streamed.
+        """
+        middleware = MetricsMiddleware(
+            lambda request: StreamingHttpResponse(iter([b'a', b'b'])))
+        response = middleware(self.factory.get('/_metrics'))
+        self.assertEqual(registry.counters[('metrics', 'requests')], 0)
+        self.assertEqual(b''.join(response.streaming_content), b'ab')
+        self.assertEqual(registry.counters[('metrics', 'requests')], 1)
+        self.assertEqual(registry.histograms[('metrics', STREAM)].count, 1)
+
+    @override_settings(INSTRUMENTATION_ENABLED=True)
+    def test_metrics_middleware_streaming_queries(self):
+        """
+        Test MetricsMiddleware counts the queries run while streaming.
+        """
+        def _stream():
+            from onadata.apps.logger.models import XForm
+
+            yield b'a'
+            XForm.objects.count()
+            record_cache_access(1)
+            yield b'b'
+
+        middleware = MetricsMiddleware(
+            lambda request: StreamingHttpResponse(_stream()))
+        response = middleware(self.factory.get('/_metrics'))
+        self.assertIsNone(get_metrics())
+        self.assertEqual(b''.join(response.streaming_content), b'ab')
+        self.assertIsNone(get_metrics())
+        self.assertEqual(registry.counters[('metrics', 'sql_queries')], 1)
+        self.assertEqual(registry.counters[('metrics', 'cache_hits')], 1)
+        self.assertEqual(registry.histograms[('metrics', SQL)].count, 1)
+
+    def test_metrics_middleware_disabled(self):
+        """
+        Test MetricsMiddleware records nothing when disabled.
+        """
+        middleware = MetricsMiddleware(self._get_response)
+        middleware(self.factory.get('/_metrics'))
+        self.assertEqual(registry.histograms, {})
+
+    @override_settings(INSTRUMENTATION_ENABLED=True,
+                       INSTRUMENTATION_PROFILE_ROUTES=['^metrics$'],
+                       INSTRUMENTATION_PROFILE_SAMPLE_RATE=1)
+    @patch('onadata.libs.profiling.middleware.run_profiled')
+    def test_metrics_middleware_profiles_routes(self, run_profiled):
+        """
+        Test MetricsMiddleware profiles requests of the selected routes.
+        """
+        run_profiled.return_value = HttpResponse('ok')
+        middleware = MetricsMiddleware(self._get_response)
+        middleware(self.factory.get('/_metrics'))
+        self.assertTrue(run_profiled.called)
+        self.assertTrue(run_profiled.call_args[0][0].endswith('.prof'))
+
+    def test_metrics_view(self):
+        """
+        Test the metrics view is only available to metrics scrapers.
+        """
+        request = self.factory.get('/_metrics')
+        with override_settings(INSTRUMENTATION_ENABLED=True,
+                               INSTRUMENTATION_METRICS_IPS=['10.0.0.2']):
+            # local addresses, e.g. of a reverse proxy, are not trusted
+            with self.assertRaises(Http404):
+                metrics(request)
+
+            request.META['REMOTE_ADDR'] = '10.0.0.2'
+            response = metrics(request)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(b'# TYPE onadata_request_phase_seconds histogram',
+                          response.content)
+
+            request.META['REMOTE_ADDR'] = '10.0.0.1'
+            with self.assertRaises(Http404):
+                metrics(request)
+
+        request = self.factory.get(
+            '/_metrics', HTTP_AUTHORIZATION='Bearer secret')
+        with override_settings(INSTRUMENTATION_ENABLED=True,
+                               INSTRUMENTATION_METRICS_TOKEN='secret'):
+            self.assertEqual(metrics(request).status_code, 200)
+            request.META['HTTP_AUTHORIZATION'] = 'Bearer other'
+            with self.assertRaises(Http404):
+                metrics(request)
@@ -16,8 +16,9 @@ from onadata.apps.logger.xform_instance_parser import xform_instance_to_dict
 from onadata.apps.main.tests.test_base import TestBase
 from onadata.libs.utils.common_tags import NA_REP
 from onadata.libs.utils.csv_builder import (
-    AbstractDataFrameBuilder, CSVDataFrameBuilder, get_prefix_from_xpath,
-    remove_dups_from_list_maintain_order, write_to_csv)
+    AbstractDataFrameBuilder, CSVDataFrameBuilder, RecordSpool,
+    get_prefix_from_xpath, remove_dups_from_list_maintain_order,
+    write_to_csv)
 
 
 def xls_filepath_from_fixture_name(fixture_name):
@@ -115,6 +116,47 @@ class TestCSVDataFrameBuilder(TestBase):
             self._test_csv_files(csv_file, csv_fixture_path)
         os.unlink(temp_file.name)
 
+    @patch('onadata.libs.utils.csv_builder.query_data')
+    def test_csv_dataframe_export_to_reads_data_once(self, mock_query_data):
+        """
+        Test CSVDataFrameBuilder.export_to() queries the records once.
+        """
+        self._publish_single_level_repeat_form()
+        mock_query_data.return_value = [{
+            'kids/kids_details': [{'kids/kids_details/kids_name': 'Abel'},
+                                  {'kids/kids_details/kids_name': 'Cain'}]
+        }]
+        csv_df_builder = CSVDataFrameBuilder(
+            self.user.username, self.xform.id_string, include_images=False)
+        temp_file = NamedTemporaryFile(suffix=".csv", delete=False)
+        csv_df_builder.export_to(temp_file.name)
+        temp_file.close()
+        self.assertEqual(mock_query_data.call_count, 1)
+
+        with open(temp_file.name) as csv_file:
+            rows = [row for row in csv.DictReader(csv_file)]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(
+            rows[0]['kids/kids_details[1]/kids_name'], 'Abel')
+        self.assertEqual(
+            rows[0]['kids/kids_details[2]/kids_name'], 'Cain')
+        os.unlink(temp_file.name)
+
+    def test_record_spool(self):
+        """
+        Test RecordSpool returns the records in the order appended.
+        """
+        records = [{'a': 1, 'b': u'\u00e9'}, {'b': None, 'c': [1, 2]}, {}]
+        with RecordSpool() as spool:
+            for record in records:
+                spool.append(record)
+            self.assertEqual(len(spool), 3)
+            self.assertEqual(list(spool), records)
+
+            # appending after reading keeps the existing records
+            spool.append({'a': 2})
+            self.assertEqual(list(spool), records + [{'a': 2}])
+
     # pylint: disable=invalid-name
     def test_csv_columns_for_gps_within_groups(self):
         """
@@ -10,10 +10,13 @@ import mock
 import unicodecsv as ucsv
 from celery.backends.rpc import BacklogLimitExceeded
 from django.conf import settings
+from django.db import IntegrityError
+from django.test.utils import override_settings
 from mock import patch
 
 from onadata.apps.logger.models import Instance, XForm
 from onadata.apps.main.tests.test_base import TestBase
+from onadata.apps.viewer.models.parsed_instance import ParsedInstance
 from onadata.apps.messaging.constants import \
     XFORM, SUBMISSION_EDITED, SUBMISSION_CREATED
 from onadata.libs.utils import csv_import
@@ -149,6 +152,94 @@ class CSVImportTestCase(TestBase):
         self.assertTrue(send_message_mock.called)
         send_message_mock.called_with(self.xform.id, XFORM, SUBMISSION_EDITED)
 
+    @override_settings(CSV_IMPORT_BULK_ENABLED=True, CSV_IMPORT_BATCH_SIZE=4)
+    def test_submit_csv_in_bulk(self):
+        """
+        Test submit_csv creates the submissions in batches when
+        CSV_IMPORT_BULK_ENABLED is set.
+        """
+        xls_file_path = os.path.join(settings.PROJECT_ROOT, "apps", "main",
+                                     "tests", "fixtures", "tutorial.xls")
+        self._publish_xls_file(xls_file_path)
+        self.xform = XForm.objects.get()
+
+        with patch('onadata.libs.utils.csv_import.safe_create_instance') \
+                as safe_create_instance:
+            result = csv_import.submit_csv(
+                self.user.username, self.xform, self.good_csv)
+            self.assertFalse(safe_create_instance.called)
+        self.assertEqual(result['additions'], 9)
+        self.assertEqual(Instance.objects.count(), 9)
+        self.assertEqual(
+            Instance.objects.filter(user=self.user).count(), 8)
+        self.xform.refresh_from_db()
+        self.assertEqual(self.xform.num_of_submissions, 9)
+
+        instance = Instance.objects.first()
+        self.assertEqual(instance.parsed_instance.instance, instance)
+        self.assertEqual(instance.json['_id'], instance.pk)
+        self.assertEqual(instance.json, instance.get_full_dict())
+        self.assertIsNotNone(instance.search_text)
+
+        # edits of the imported submissions are still submitted one at a time
+        edit_csv = open(os.path.join(self.fixtures_dir, 'edit.csv'))
+        edit_csv = BytesIO(
+            edit_csv.read().format(
+                * [x.get('uuid') for x in Instance.objects.values('uuid')])
+            .encode('utf-8'))
+        result = csv_import.submit_csv(
+            self.user.username, self.xform, edit_csv)
+        self.assertEqual(Instance.objects.count(), 9)
+        self.assertEqual(result['additions'], 0)
+        self.assertTrue(result['updates'] > 0)
+
+    @override_settings(CSV_IMPORT_BULK_ENABLED=True, CSV_IMPORT_BATCH_SIZE=4)
+    @patch('onadata.libs.utils.csv_import.validate_data')
+    def test_submit_csv_in_bulk_rollback(self, validate_data):
+        """
+        Test submit_csv removes the submissions of earlier batches when a
+        batch fails.
+        """
+        xls_file_path = os.path.join(settings.PROJECT_ROOT, "apps", "main",
+                                     "tests", "fixtures", "tutorial.xls")
+        self._publish_xls_file(xls_file_path)
+        self.xform = XForm.objects.get()
+        validate_data.side_effect = [True] * 4 + [False]
+
+        result = csv_import.submit_csv(
+            self.user.username, self.xform, self.good_csv)
+        self.assertEqual(result.get('error'), 'Submission Failed Validation.')
+        self.assertEqual(Instance.objects.count(), 0)
+
+    @override_settings(CSV_IMPORT_BULK_ENABLED=True, CSV_IMPORT_BATCH_SIZE=4)
+    @patch('onadata.libs.utils.csv_import.report_exception')
+    def test_submit_csv_in_bulk_error(self, report_exception):
+        """
+        Test submit_csv removes the submissions of earlier batches and fails
+        the import when saving a batch raises.
+        """
+        xls_file_path = os.path.join(settings.PROJECT_ROOT, "apps", "main",
+                                     "tests", "fixtures", "tutorial.xls")
+        self._publish_xls_file(xls_file_path)
+        self.xform = XForm.objects.get()
+        bulk_create = ParsedInstance.objects.bulk_create
+        batches = []
+
+        def _bulk_create(objs, *args, **kwargs):
+            batches.append(objs)
+            if len(batches) > 1:
+                raise IntegrityError('duplicate key value')
+            return bulk_create(objs, *args, **kwargs)
+
+        with patch.object(ParsedInstance.objects, 'bulk_create',
+                          side_effect=_bulk_create):
+            result = csv_import.submit_csv(
+                self.user.username, self.xform, self.good_csv)
+        self.assertEqual(result.get('error'), 'duplicate key value')
+        self.assertEqual(len(batches), 2)
+        self.assertEqual(Instance.objects.count(), 0)
+        self.assertTrue(report_exception.called)
+
     def test_import_non_utf8_csv(self):
         xls_file_path = os.path.join(self.fixtures_dir, "mali_health.xls")
         self._publish_xls_file(xls_file_path)
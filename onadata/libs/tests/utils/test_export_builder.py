@@ -15,9 +15,12 @@ from collections import OrderedDict
 from ctypes import ArgumentError
 from io import BytesIO
 
+import pyarrow
+import pyarrow.parquet as pq
 import xlrd
 from django.conf import settings
 from django.core.files.temp import NamedTemporaryFile
+from django.test.utils import override_settings
 from openpyxl import load_workbook
 from past.builtins import basestring
 from pyxform.builder import create_survey_from_xls
@@ -295,6 +298,28 @@ class TestExportBuilder(TestBase):
         self.assertEqual(
             sorted(expected_element_names), sorted(element_names))
 
+    def test_row_plans_from_survey(self):
+        survey = self._create_childrens_survey()
+        export_builder = ExportBuilder()
+        export_builder.set_survey(survey)
+        self.assertEqual(
+            sorted(export_builder.row_plans),
+            sorted(s['name'] for s in export_builder.sections))
+
+        plan = export_builder.row_plans[survey.name]
+        self.assertIn(('age', 'int'), plan['converters'])
+        self.assertIn(
+            ('geo/_geolocation_latitude', 'decimal'), plan['converters'])
+        self.assertNotIn('name', [c[0] for c in plan['converters']])
+        self.assertEqual(list(plan['gps_fields']), ['geo/geolocation'])
+
+        plan = export_builder.row_plans['children']
+        self.assertEqual(
+            sorted(plan['select_multiples']),
+            ['children/fav_colors', 'children/ice.creams'])
+        self.assertIn('children/ice.creams', plan['encoded_fields'])
+        self.assertIsNone(plan['gps_fields'])
+
     def test_zipped_csv_export_works(self):
         survey = self._create_childrens_survey()
         export_builder = ExportBuilder()
@@ -435,6 +460,55 @@ class TestExportBuilder(TestBase):
         }
         self.assertEqual(result, expected_result)
 
+    @override_settings(EXPORT_PARQUET_ROW_GROUP_SIZE=2)
+    def test_parquet_zip_export(self):
+        survey = self._create_childrens_survey()
+        export_builder = ExportBuilder()
+        export_builder.set_survey(survey)
+        temp_zip_file = NamedTemporaryFile(suffix='.zip')
+        export_builder.to_parquet_zip(temp_zip_file.name, self.data)
+        temp_dir = tempfile.mkdtemp()
+        with zipfile.ZipFile(temp_zip_file.name, 'r') as zip_file:
+            self.assertEqual(
+                sorted(zip_file.namelist()),
+                ['children.parquet', 'children_cartoons.parquet',
+                 'children_cartoons_characters.parquet',
+                 'childrens_survey.parquet'])
+            zip_file.extractall(temp_dir)
+        temp_zip_file.close()
+
+        table = pq.read_table(
+            os.path.join(temp_dir, 'childrens_survey.parquet'))
+        self.assertEqual(table.schema.field('age').type, pyarrow.int64())
+        self.assertEqual(
+            table.schema.field('geo/_geolocation_latitude').type,
+            pyarrow.float64())
+        self.assertEqual(table.schema.field('_index').type, pyarrow.int64())
+        self.assertEqual(table.column('age').to_pylist(), [35, None])
+        self.assertEqual(
+            table.column('tel/tel.office').to_pylist(), ['020123456', None])
+
+        parquet_file = pq.ParquetFile(
+            os.path.join(temp_dir, 'children.parquet'))
+        # 3 children in row groups of 2
+        self.assertEqual(parquet_file.num_row_groups, 2)
+        table = parquet_file.read()
+        self.assertEqual(
+            table.schema.field('children/fav_colors/red').type,
+            pyarrow.bool_())
+        self.assertEqual(
+            table.column('children/name').to_pylist(),
+            ['Mike', 'John', 'Imora'])
+        self.assertEqual(
+            table.column('children/fav_colors/red').to_pylist(),
+            [True, None, None])
+        self.assertEqual(
+            table.column('_parent_index').to_pylist(), [1, 1, 1])
+        self.assertEqual(
+            table.schema.field('_parent_index').metadata,
+            {b'label': b'_parent_index'})
+        shutil.rmtree(temp_dir)
+
     def test_zipped_csv_export_works_with_unicode(self):
         """
         cvs writer doesnt handle unicode we we have to encode to ascii
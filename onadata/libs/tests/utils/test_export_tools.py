@@ -30,8 +30,10 @@ from onadata.libs.utils.export_builder import (encode_if_str,
                                                get_value_or_attachment_uri)
 from onadata.libs.utils.export_tools import (
     ExportBuilder, check_pending_export, generate_attachments_zip_export,
-    generate_export, generate_kml_export, generate_osm_export,
-    get_repeat_index_tags, kml_export_data, parse_request_export_options,
+    generate_export, generate_export_shard, generate_incremental_export,
+    generate_kml_export, generate_osm_export, get_export_shards,
+    get_export_watermark, get_incremental_export_base, get_repeat_index_tags,
+    kml_export_data, merge_export_shards, parse_request_export_options,
     should_create_new_export, str_to_bool)
 
 
@@ -729,3 +731,104 @@ class TestExportTools(TestBase):
             self.assertTrue(
                 os.path.exists(os.path.join(temp_dir, a.media_file.name)))
         shutil.rmtree(temp_dir)
+
+    def _publish_new_repeats_form(self):
+        fixture_dir = os.path.join(
+            settings.PROJECT_ROOT, 'libs', 'tests', 'utils', 'fixtures',
+            'new_repeats')
+        self._publish_xls_file_and_set_xform(
+            os.path.join(fixture_dir, 'new_repeats.xls'))
+
+    def _submit_new_repeats_instances(self, instances):
+        fixture_dir = os.path.join(
+            settings.PROJECT_ROOT, 'libs', 'tests', 'utils', 'fixtures',
+            'new_repeats')
+        for instance in instances:
+            self._make_submission(os.path.join(
+                fixture_dir, 'instances', 'new_repeats_%s.xml' % instance))
+        self.xform.refresh_from_db()
+
+    def _read_export(self, export):
+        if export.export_type == Export.CSV_EXPORT:
+            with default_storage.open(export.filepath) as export_file:
+                return export_file.read()
+        with zipfile.ZipFile(default_storage.path(export.filepath)) as z:
+            return dict((name, z.read(name)) for name in z.namelist())
+
+    @override_settings(EXPORT_SHARD_COUNT=2, EXPORT_SHARD_MIN_RECORDS=1)
+    def test_sharded_export_matches_export(self):
+        """
+        Test merging export shards generates the same CSV and CSV zip
+        exports as a single task.
+        """
+        self._publish_new_repeats_form()
+        self._submit_new_repeats_instances(['01', '02', '01', '02', '01'])
+
+        for export_type, options in [
+                (Export.CSV_EXPORT, {}),
+                (Export.CSV_ZIP_EXPORT, {"extension": Export.ZIP_EXPORT}),
+                (Export.CSV_ZIP_EXPORT, {"extension": Export.ZIP_EXPORT,
+                                         "include_labels": True})]:
+            shards = get_export_shards(self.xform, export_type, options)
+            self.assertEqual(len(shards), 2)
+
+            export = generate_export(export_type, self.xform, None, options)
+            shard_filenames = [
+                generate_export_shard(export_type, self.xform, None,
+                                      first_id, last_id, options)
+                for (first_id, last_id) in shards]
+            sharded_export = merge_export_shards(
+                export_type, self.xform, shard_filenames, None, options)
+
+            self.assertTrue(sharded_export.is_successful)
+            self.assertEqual(
+                self._read_export(export),
+                self._read_export(sharded_export))
+            for shard_filename in shard_filenames:
+                self.assertFalse(default_storage.exists(shard_filename))
+
+        # free text queries cannot be restricted to an id range
+        self.assertEqual(
+            get_export_shards(self.xform, Export.CSV_EXPORT,
+                              {"query": "Kenya"}), [])
+
+    @override_settings(EXPORT_INCREMENTAL_ENABLED=True)
+    def test_incremental_export_matches_export(self):
+        """
+        Test appending new submissions to an export generates the same CSV
+        and CSV zip exports as a rebuild.
+        """
+        self._publish_new_repeats_form()
+        self._submit_new_repeats_instances(['01', '02'])
+        export_types = [
+            (Export.CSV_EXPORT, {}),
+            (Export.CSV_ZIP_EXPORT, {"extension": Export.ZIP_EXPORT}),
+            (Export.CSV_ZIP_EXPORT, {"extension": Export.ZIP_EXPORT,
+                                     "include_labels": True,
+                                     "remove_group_name": True})]
+        for export_type, options in export_types:
+            export = generate_export(export_type, self.xform, None, options)
+            self.assertEqual(
+                export.max_instance_id,
+                self.xform.instances.latest('id').id)
+            self.assertEqual(export.xform_version, self.xform.version)
+
+        self._submit_new_repeats_instances(['02', '01', '01'])
+        for export_type, options in export_types:
+            self.assertIsNotNone(get_incremental_export_base(
+                self.xform, export_type, options))
+            export = generate_incremental_export(
+                export_type, self.xform, None,
+                get_export_watermark(self.xform), options)
+            self.assertIsNotNone(export)
+            with override_settings(EXPORT_INCREMENTAL_ENABLED=False):
+                rebuilt_export = generate_export(
+                    export_type, self.xform, None, options)
+            self.assertEqual(
+                self._read_export(export), self._read_export(rebuilt_export))
+
+        # an edit within the watermark requires a rebuild
+        self.xform.instances.earliest('id').save()
+        for export_type, options in export_types:
+            self.assertIsNone(get_incremental_export_base(
+                self.xform, export_type, options))
@@ -14,7 +14,7 @@ from onadata.libs.utils.common_tags import (MEDIA_ALL_RECEIVED, MEDIA_COUNT,
                                             TOTAL_MEDIA)
 from onadata.libs.utils.logger_tools import (
     create_instance, generate_content_disposition_header, get_first_record,
-    safe_create_instance)
+    get_submission_list_page, safe_create_instance, set_root_node_attributes)
 
 
 class TestLoggerTools(PyxformTestCase, TestBase):
@@ -502,3 +502,49 @@ class TestLoggerTools(PyxformTestCase, TestBase):
         self.assertIsNone(ret[1])
         self.assertEqual(response.status_code, 400)
         self.assertIn(expected_error, str(response.content))
+
+    def test_set_root_node_attributes(self):
+        """
+        Test the attributes are spliced into the root node start tag
+        """
+        attributes = (('instanceID', 'uuid:abc'),
+                      ('submissionDate', '2020-01-01T00:00:00'))
+        xml = u"<?xml version='1.0' ?>\n<data id='form' note=\"a>b\"" \
+            u" instanceID='old'>\n  <name>Bob</name>\n  <age />\n</data>\n"
+        self.assertEqual(
+            set_root_node_attributes(xml, attributes),
+            u"<data id='form' note=\"a>b\" instanceID=\"uuid:abc\""
+            u" submissionDate=\"2020-01-01T00:00:00\"><name>Bob</name>"
+            u"<age /></data>")
+        self.assertEqual(
+            set_root_node_attributes(u'<data/>', attributes),
+            u'<data instanceID="uuid:abc"'
+            u' submissionDate="2020-01-01T00:00:00"/>')
+        # a DOCTYPE before the root node is parsed
+        self.assertEqual(
+            set_root_node_attributes(
+                u'<!DOCTYPE data><data id="form"></data>', attributes),
+            u'<data id="form" instanceID="uuid:abc"'
+            u' submissionDate="2020-01-01T00:00:00"/>')
+
+    def test_get_submission_list_page(self):
+        """
+        Test a submissionList page and its resumption cursor are returned
+        in one query
+        """
+        self._publish_transportation_form_and_submit_instance()
+        instances = Instance.objects.filter(xform=self.xform)
+        pks = list(instances.order_by('pk').values_list('pk', flat=True))
+
+        with self.assertNumQueries(1):
+            page, cursor = get_submission_list_page(instances, None, 2)
+        self.assertEqual([i['pk'] for i in page], pks[:2])
+        self.assertEqual(cursor, pks[1])
+
+        page, cursor = get_submission_list_page(instances, pks[1], None)
+        self.assertEqual([i['pk'] for i in page], pks[2:])
+        self.assertEqual(cursor, pks[-1])
+
+        page, cursor = get_submission_list_page(instances, pks[-1], 2)
+        self.assertEqual(page, [])
+        self.assertEqual(cursor, pks[-1])
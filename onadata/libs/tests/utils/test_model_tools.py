@@ -2,7 +2,8 @@ from unittest import TestCase
 
 from django.contrib.auth import get_user_model
 
-from onadata.libs.utils.model_tools import queryset_iterator
+from onadata.libs.utils.model_tools import (chunked_query_iterator,
+                                            queryset_iterator)
 
 
 class TestsForModelTools(TestCase):
@@ -19,3 +20,17 @@ class TestsForModelTools(TestCase):
             queryset_iterator(
                 user_model.objects.all(), chunksize=1).__class__.__name__
         )
+
+    def test_chunked_query_iterator(self):
+        user_model = get_user_model()
+        for i in range(3):
+            user_model.objects.create_user(
+                username='chunked_%d' % i, password='test',
+                email='chunked_%d@test.com' % i)
+        rows = chunked_query_iterator(
+            "SELECT username FROM auth_user WHERE username LIKE %s "
+            "ORDER BY username", ['chunked_%'], itersize=2)
+
+        self.assertEquals('generator', rows.__class__.__name__)
+        self.assertEquals(
+            [('chunked_0',), ('chunked_1',), ('chunked_2',)], list(rows))
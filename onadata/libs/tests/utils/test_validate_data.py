@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Test onadata.libs.utils.validate_data module.
+"""
+import os
+import tempfile
+
+import requests
+from django.core.cache import cache
+from django.test import override_settings
+from mock import patch
+
+from onadata.apps.main.tests.test_base import TestBase
+from onadata.libs.utils.validate_data import (
+    get_insect_names, get_known_species_names, validate_data)
+
+
+def _submission(*names):
+    return {
+        'data': {
+            'repeat_group': [
+                {'capture_insect_details': {
+                    'insect_scientific_name_other': name}}
+                for name in names
+            ]
+        }
+    }
+
+
+class TestValidateData(TestBase):
+    """Test onadata.libs.utils.validate_data module class"""
+
+    def setUp(self):
+        super(TestValidateData, self).setUp()
+        cache.clear()
+
+    def test_get_insect_names(self):
+        """Test insect names are read from one or many repeats"""
+        self.assertEqual(get_insect_names(_submission('Apis mellifera')),
+                         ['Apis mellifera'])
+        data = {'data': {'repeat_group': {'capture_insect_details': {
+            'insect_scientific_name_other': 'Apis mellifera'}}}}
+        self.assertEqual(get_insect_names(data), ['Apis mellifera'])
+        self.assertEqual(get_insect_names({'data': {'name': 'x'}}), [])
+
+    @patch('onadata.libs.utils.validate_data.check_gbif_data')
+    def test_lookups_are_deduplicated_and_cached(self, check_gbif_data):
+        """Test every name is looked up on GBIF once"""
+        check_gbif_data.side_effect = lambda name: set(['Apis mellifera'])
+        data = _submission('Apis mellifera', 'Apis mellifera', 'Not a bee')
+
+        self.assertFalse(validate_data(data))
+        self.assertEqual(check_gbif_data.call_count, 2)
+        self.assertFalse(validate_data(data))
+        self.assertEqual(check_gbif_data.call_count, 2)
+        self.assertTrue(validate_data(_submission('Apis mellifera')))
+        self.assertTrue(validate_data({'data': {'name': 'x'}}))
+
+    @patch('onadata.libs.utils.validate_data.check_gbif_data')
+    def test_unavailable_gbif_accepts_names(self, check_gbif_data):
+        """Test names are accepted, and not cached, when GBIF is down"""
+        check_gbif_data.side_effect = requests.Timeout()
+
+        self.assertEqual(get_known_species_names(['Not a bee']),
+                         set(['Not a bee']))
+        check_gbif_data.side_effect = lambda name: set()
+        self.assertEqual(get_known_species_names(['Not a bee']), set())
+
+    @patch('onadata.libs.utils.validate_data.check_gbif_data')
+    def test_taxonomy_snapshot(self, check_gbif_data):
+        """Test names are looked up in the taxonomy snapshot when set"""
+        fd, path = tempfile.mkstemp()
+        with os.fdopen(fd, 'w') as snapshot:
+            snapshot.write('Apis mellifera\nBombus terrestris\n')
+
+        with override_settings(GBIF_TAXONOMY_SNAPSHOT=path):
+            self.assertTrue(validate_data(_submission('Apis mellifera')))
+            self.assertFalse(validate_data(_submission('Not a bee')))
+        os.unlink(path)
+        check_gbif_data.assert_not_called()
+
+    @patch('onadata.libs.utils.validate_data.check_gbif_data')
+    def test_async_validation(self, check_gbif_data):
+        """Test invalid submissions are accepted then marked failed"""
+        check_gbif_data.return_value = set()
+        self._publish_transportation_form()
+        with override_settings(
+                SUBMISSION_VALIDATION_ASYNC=True,
+                SUBMISSION_VALIDATORS=[
+                    'onadata.libs.utils.validate_data.validate_insect_names',
+                    'onadata.libs.tests.utils.test_validate_data.'
+                    'reject_submission']):
+            self._make_submission(os.path.join(
+                self.this_directory, 'fixtures', 'transportation',
+                'instances', self.surveys[0], self.surveys[0] + '.xml'))
+
+        self.assertEqual(self.response.status_code, 201)
+        self.assertEqual(self.xform.instances.first().status,
+                         'failed_validation')
+
+
+def reject_submission(data):
+    return False
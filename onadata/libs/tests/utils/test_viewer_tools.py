@@ -1,8 +1,12 @@
 # -*- coding: utf-8 -*-
 """Test onadata.libs.utils.viewer_tools."""
 import os
+import zipfile
+from io import BytesIO
 
-from django.core.files.base import File
+from django.conf import settings
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import default_storage
 from django.http import Http404
 from django.test.client import RequestFactory
 from django.test.utils import override_settings
@@ -15,7 +19,9 @@ from onadata.libs.utils.viewer_tools import (create_attachments_zipfile,
                                              export_def_from_filename,
                                              generate_enketo_form_defaults,
                                              get_client_ip, get_form,
-                                             get_form_url)
+                                             get_form_url, get_path,
+                                             image_urls,
+                                             stream_attachments_zipfile)
 
 
 class TestViewerTools(TestBase):
@@ -179,3 +185,62 @@ class TestViewerTools(TestBase):
 
         self.assertTrue(rpt_mock.called)
         rpt_mock.assert_called_with(message[0], message[1])
+
+    def test_stream_attachments_zipfile(self):
+        """
+        Test stream_attachments_zipfile() streams a zip file of the
+        attachments, storing already compressed media without deflate.
+        """
+        self._publish_transportation_form_and_submit_instance()
+        media_file = os.path.join(
+            self.this_directory, 'fixtures', 'transportation', 'instances',
+            self.surveys[0], '1335783522563.jpg')
+        with open(media_file, 'rb') as f:
+            content = f.read()
+        instance = Instance.objects.all()[0]
+        attachment = Attachment.objects.create(
+            instance=instance, mimetype='image/jpeg',
+            media_file=File(open(media_file, 'rb'), media_file))
+
+        with override_settings(ZIP_ATTACHMENT_CHUNK_SIZE=1024):
+            chunks = list(stream_attachments_zipfile(
+                Attachment.objects.filter(pk=attachment.pk)))
+        self.assertTrue(len(chunks) > 1)
+
+        with zipfile.ZipFile(BytesIO(b''.join(chunks))) as z:
+            info = z.getinfo(attachment.media_file.name)
+            self.assertEqual(info.compress_type, zipfile.ZIP_STORED)
+            self.assertEqual(z.read(info), content)
+
+        # the same archive is written to a temporary file
+        zip_file = create_attachments_zipfile(
+            Attachment.objects.filter(pk=attachment.pk))
+        zip_file.seek(0)
+        with zipfile.ZipFile(zip_file) as z:
+            self.assertEqual(z.read(attachment.media_file.name), content)
+        zip_file.close()
+
+    def test_image_urls_of_unrecorded_thumbnails(self):
+        """
+        Test image_urls() checks storage for the thumbnails of attachments
+        without recorded thumbnails.
+        """
+        self._publish_transportation_form_and_submit_instance()
+        media_file = os.path.join(
+            self.this_directory, 'fixtures', 'transportation', 'instances',
+            self.surveys[0], '1335783522563.jpg')
+        instance = Instance.objects.all()[0]
+        attachment = Attachment.objects.create(
+            instance=instance, mimetype='image/jpeg',
+            media_file=File(open(media_file, 'rb'), media_file))
+        self.assertEqual(attachment.thumbnails, [])
+        self.assertIn(attachment.media_file.url, image_urls(instance))
+
+        path = default_storage.save(
+            get_path(attachment.media_file.name,
+                     settings.THUMB_CONF['medium']['suffix']),
+            ContentFile(b'thumbnail'))
+        urls = image_urls(instance)
+        self.assertIn(default_storage.url(path), urls)
+        self.assertNotIn(attachment.media_file.url, urls)
+        default_storage.delete(path)
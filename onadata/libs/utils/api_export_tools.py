@@ -11,6 +11,7 @@ import httplib2
 from celery.backends.rpc import BacklogLimitExceeded
 from celery.result import AsyncResult
 from django.conf import settings
+from django.core.cache import cache
 from django.http import Http404, HttpResponseRedirect
 from django.shortcuts import get_object_or_404
 from django.utils import six
@@ -29,7 +30,8 @@ from savReaderWriter import SPSSIOError
 
 from onadata.apps.main.models import TokenStorageModel
 from onadata.apps.viewer import tasks as viewer_task
-from onadata.apps.viewer.models.export import Export, ExportConnectionError
+from onadata.apps.viewer.models.export import (
+    Export, ExportConnectionError, get_export_options_query_kwargs)
 from onadata.libs.exceptions import (J2XException, NoRecordsFoundError,
                                      NoRecordsPermission, ServiceUnavailable)
 from onadata.libs.permissions import filter_queryset_xform_meta_perms_sql
@@ -40,6 +42,8 @@ from onadata.libs.utils.async_status import (FAILED, PENDING, SUCCESSFUL,
 from onadata.libs.utils.common_tags import (DATAVIEW_EXPORT,
                                             GROUPNAME_REMOVED_FLAG, OSM,
                                             SUBMISSION_TIME)
+from onadata.libs.utils.cache_tools import (LINKED_DATASET_EXPORT_LOCK,
+                                            safe_key)
 from onadata.libs.utils.common_tools import report_exception
 from onadata.libs.utils.export_tools import (check_pending_export,
                                              generate_attachments_zip_export,
@@ -62,6 +66,7 @@ EXPORT_EXT = {
     'csv': Export.CSV_EXPORT,
     'csvzip': Export.CSV_ZIP_EXPORT,
     'savzip': Export.SAV_ZIP_EXPORT,
+    'parquet': Export.PARQUET_EXPORT,
     'uuid': Export.EXTERNAL_EXPORT,
     'kml': Export.KML_EXPORT,
     'zip': Export.ZIP_EXPORT,
@@ -112,17 +117,10 @@ def custom_response_handler(request,
             (token is not None) or (meta is not None):
         export_type = Export.EXTERNAL_EXPORT
 
-    options = parse_request_export_options(request.query_params)
+    options = _get_dataview_export_options(
+        parse_request_export_options(request.query_params), xform, dataview)
+    dataview_pk = options["dataview_pk"]
 
-    dataview_pk = hasattr(dataview, 'pk') and dataview.pk
-    options["dataview_pk"] = dataview_pk
-
-    if dataview:
-        columns_with_hxl = get_columns_with_hxl(xform.survey.get('children'))
-
-        if columns_with_hxl:
-            options['include_hxl'] = include_hxl_row(dataview.columns,
-                                                     list(columns_with_hxl))
     try:
         query = filter_queryset_xform_meta_perms_sql(xform, request.user,
                                                      query)
@@ -197,6 +195,73 @@ def custom_response_handler(request,
     return response
 
 
+def _get_dataview_export_options(options, xform, dataview):
+    """
+    Returns export options with the dataview options set.
+    """
+    options["dataview_pk"] = hasattr(dataview, 'pk') and dataview.pk
+
+    if dataview:
+        columns_with_hxl = get_columns_with_hxl(xform.survey.get('children'))
+
+        if columns_with_hxl:
+            options['include_hxl'] = include_hxl_row(dataview.columns,
+                                                     list(columns_with_hxl))
+
+    return options
+
+
+def linked_dataset_response(request, xform, dataview=False, filename=None):
+    """
+    Returns a HTTP response with the latest ready CSV export of a linked
+    dataset, starting a background rebuild of the export when the form has
+    newer submissions, or None when there is no ready export to serve or the
+    user can only see some of the submissions.
+
+    Rebuilds are single-flight, one rebuild is started per form submission
+    state and dataview.
+    """
+    export_type = Export.CSV_EXPORT
+    try:
+        if filter_queryset_xform_meta_perms_sql(xform, request.user, {}):
+            return None
+    except NoRecordsPermission:
+        return None
+
+    options = _get_dataview_export_options(
+        parse_request_export_options(request.query_params), xform, dataview)
+
+    if Export.exports_outdated(xform, export_type, options):
+        last_submission_time = xform.time_of_last_submission_update()
+        lock_key = LINKED_DATASET_EXPORT_LOCK + safe_key(u'{}-{}-{}'.format(
+            xform.pk, options['dataview_pk'], last_submission_time))
+        lock_timeout = getattr(settings, 'PENDING_EXPORT_TIME', 5) * 60
+        if cache.add(lock_key, True, lock_timeout):
+            try:
+                viewer_task.create_async_export(
+                    xform, export_type, None, False, options=dict(options))
+            except ExportConnectionError:
+                cache.delete(lock_key)
+
+    try:
+        export = Export.objects.filter(
+            xform=xform, export_type=export_type,
+            internal_status=Export.SUCCESSFUL,
+            **get_export_options_query_kwargs(options)).latest('created_on')
+    except Export.DoesNotExist:
+        return None
+
+    if not export.filename:
+        return None
+
+    return response_with_mimetype_and_name(
+        Export.EXPORT_MIMES['csv'],
+        filename,
+        extension='csv',
+        show_date=False,
+        file_path=export.filepath)
+
+
 def _generate_new_export(request, xform, query, export_type,
                          dataview_pk=False):
     query = _set_start_end_params(request, query)
@@ -349,7 +414,8 @@ def _get_extension_from_export_type(export_type):
 
     if export_type == Export.XLS_EXPORT:
         extension = 'xlsx'
-    elif export_type in [Export.CSV_ZIP_EXPORT, Export.SAV_ZIP_EXPORT]:
+    elif export_type in [Export.CSV_ZIP_EXPORT, Export.SAV_ZIP_EXPORT,
+                         Export.PARQUET_EXPORT]:
         extension = 'zip'
 
     return extension
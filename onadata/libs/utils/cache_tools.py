@@ -45,6 +45,15 @@ CHANGE_PASSWORD_ATTEMPTS = 'change_password_attempts-'
 XFORM_SUBMISSION_COUNT_FOR_DAY = "xfm-get_submission_count-"
 XFORM_SUBMISSION_COUNT_FOR_DAY_DATE = "xfm-get_submission_count_date-"
 
+# single-flight lock of the background export of a linked dataset
+LINKED_DATASET_EXPORT_LOCK = "ld-export-lock-"
+
+# single-flight lock of the background rebuild of the aggregates of a form
+FORM_AGGREGATE_REBUILD_LOCK = "fa-rebuild-lock-"
+
+# records processed by the shards of a sharded export
+EXPORT_SHARD_PROGRESS = "export-shard-progress-"
+
 
 def safe_delete(key):
     """Safely deletes a given key from the cache."""
@@ -147,6 +147,7 @@ EXPORT_MIMES = {
     'csv_zip': 'zip',
     'sav_zip': 'zip',
     'sav': 'sav',
+    'parquet': 'zip',
     'kml': 'vnd.google-earth.kml+xml',
     OSM: OSM
 }
@@ -10,6 +10,7 @@ import sys
 import time
 import traceback
 import uuid
+from hashlib import md5
 from io import BytesIO
 from past.builtins import basestring
 
@@ -145,6 +146,35 @@ def json_stream(data, json_string):
         yield ']'
 
 
+def buffered_stream(chunks, chunk_size):
+    """
+    Generator function joining the strings of a stream into chunks of at
+    least chunk_size characters, the last chunk may be shorter.
+    """
+    buffer = []
+    buffered = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        buffered += len(chunk)
+        if buffered >= chunk_size:
+            yield ''.join(buffer)
+            buffer = []
+            buffered = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def get_file_hash(file_obj):
+    """
+    Returns the md5 hex digest of a django File, read in chunks.
+    """
+    file_hash = md5()
+    for chunk in file_obj.chunks():
+        file_hash.update(chunk)
+
+    return file_hash.hexdigest()
+
+
 def retry(tries, delay=3, backoff=2):
     """
     Adapted from code found here:
@@ -1,5 +1,8 @@
+import pickle
+import struct
 from collections import OrderedDict
 from itertools import chain
+from tempfile import NamedTemporaryFile, TemporaryFile
 
 import unicodecsv as csv
 from django.conf import settings
@@ -51,11 +54,85 @@ DEFAULT_INDEX_TAGS = (DEFAULT_OPEN_TAG, DEFAULT_CLOSE_TAG)
 YES = 1
 NO = 0
 
+# length prefix of records in a RecordSpool
+RECORD_LENGTH = struct.Struct('<I')
+
 
 def remove_dups_from_list_maintain_order(lst):
     return list(OrderedDict.fromkeys(lst))
 
 
+class RecordSpool(object):
+    """
+    Spools dict records to a temporary file as length prefixed records and
+    reads them back in the order they were appended.
+
+    Keys are stored once in memory and records only carry key indexes, so a
+    spooled export row costs little more than its values on disk.
+    """
+
+    def __init__(self):
+        self._file = TemporaryFile()
+        self._keys = []
+        self._key_index = {}
+        self._count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self._count
+
+    def append(self, record):
+        indexes = []
+        for key in record:
+            index = self._key_index.get(key)
+            if index is None:
+                index = self._key_index[key] = len(self._keys)
+                self._keys.append(key)
+            indexes.append(index)
+        data = pickle.dumps(
+            (indexes, list(record.values())), pickle.HIGHEST_PROTOCOL)
+        self._file.write(RECORD_LENGTH.pack(len(data)))
+        self._file.write(data)
+        self._count += 1
+
+    def __iter__(self):
+        self._file.flush()
+        self._file.seek(0)
+        for _i in range(self._count):
+            length, = RECORD_LENGTH.unpack(
+                self._file.read(RECORD_LENGTH.size))
+            indexes, values = pickle.loads(self._file.read(length))
+            yield dict(zip([self._keys[i] for i in indexes], values))
+        self._file.seek(0, 2)
+
+    def close(self):
+        self._file.close()
+
+
+def merge_columns(headers):
+    """
+    Returns the union of lists of columns keeping the order of the columns in
+    each list, a column that is not yet in the union is inserted after the
+    column that precedes it in its list.
+    """
+    merged = []
+    for header in headers:
+        position = 0
+        for column in header:
+            if column in merged:
+                position = merged.index(column) + 1
+            else:
+                merged.insert(position, column)
+                position += 1
+
+    return merged
+
+
 def get_prefix_from_xpath(xpath):
     xpath = str(xpath)
     parts = xpath.rsplit('/', 1)
@@ -101,6 +178,27 @@ def get_column_names_only(columns, dd, group_delimiter):
     return new_columns
 
 
+def get_column_titles(columns, remove_group_name=False, dd=None,
+                      group_delimiter=DEFAULT_GROUP_DELIMITER):
+    """
+    Returns the header row titles of the columns.
+    """
+    # Check if to truncate the group name prefix
+    if remove_group_name and dd:
+        new_cols = get_column_names_only(columns, dd, group_delimiter)
+    else:
+        new_cols = columns
+
+    # use a different group delimiter if needed
+    if group_delimiter != DEFAULT_GROUP_DELIMITER:
+        new_cols = [
+            group_delimiter.join(col.split(DEFAULT_GROUP_DELIMITER))
+            for col in new_cols
+        ]
+
+    return new_cols
+
+
 def write_to_csv(path, rows, columns, columns_with_hxl=None,
                  remove_group_name=False, dd=None,
                  group_delimiter=DEFAULT_GROUP_DELIMITER, include_labels=False,
@@ -112,21 +210,9 @@ def write_to_csv(path, rows, columns, columns_with_hxl=None,
     with open(path, 'wb') as csvfile:
         writer = csv.writer(csvfile, encoding=encoding, lineterminator='\n')
 
-        # Check if to truncate the group name prefix
         if not include_labels_only:
-            if remove_group_name and dd:
-                new_cols = get_column_names_only(columns, dd, group_delimiter)
-            else:
-                new_cols = columns
-
-            # use a different group delimiter if needed
-            if group_delimiter != DEFAULT_GROUP_DELIMITER:
-                new_cols = [
-                    group_delimiter.join(col.split(DEFAULT_GROUP_DELIMITER))
-                    for col in new_cols
-                ]
-
-            writer.writerow(new_cols)
+            writer.writerow(get_column_titles(
+                columns, remove_group_name, dd, group_delimiter))
 
         if include_labels or include_labels_only:
             labels = get_labels_from_columns(columns, dd, group_delimiter)
@@ -352,12 +438,12 @@ class AbstractDataFrameBuilder(object):
             'sort': '{}',
             'count': True
         }
-        count_object = list(query_data(**count_args))
-        record_count = count_object[0]["count"]
-        if record_count < 1:
-            raise NoRecordsFoundError("No records found for your query")
         # if count was requested, return the count
         if count:
+            count_object = list(query_data(**count_args))
+            record_count = count_object[0]["count"]
+            if record_count < 1:
+                raise NoRecordsFoundError("No records found for your query")
             return record_count
         else:
             query_args = {
@@ -536,7 +622,11 @@ class CSVDataFrameBuilder(AbstractDataFrameBuilder):
                 # generated when we reindex
                 ordered_columns[child.get_abbreviated_xpath()] = None
 
-    def _update_columns_from_data(self, cursor):
+    def _update_columns_from_data(self, cursor, spool=None):
+        """
+        Collects repeat and select multiple columns from the records in the
+        cursor, the reindexed records are appended to spool if given.
+        """
         # add ordered columns for select multiples
         if self.split_select_multiples:
             for key, choices in self.select_multiples.items():
@@ -566,15 +656,20 @@ class CSVDataFrameBuilder(AbstractDataFrameBuilder):
             # altitude, precision
             self._split_gps_fields(record, self.gps_fields)
             self._tag_edit_string(record)
+            flat_dict = {}
             # re index repeats
             for (key, value) in iteritems(record):
-                self._reindex(
+                reindexed = self._reindex(
                     key, value, self.ordered_columns, record, self.dd,
                     include_images=image_xpaths,
                     split_select_multiples=self.split_select_multiples,
                     index_tags=self.index_tags,
                     show_choice_labels=self.show_choice_labels,
                     language=self.language)
+                flat_dict.update(reindexed)
+
+            if spool is not None:
+                spool.append(flat_dict)
 
     def _format_for_dataframe(self, cursor):
         # TODO: check for and handle empty results
@@ -616,52 +711,99 @@ class CSVDataFrameBuilder(AbstractDataFrameBuilder):
 
             yield flat_dict
 
+    def _get_columns(self):
+        """
+        Returns the export columns from the ordered columns and the extra
+        columns.
+        """
+        columns = list(chain.from_iterable(
+            [[xpath] if cols is None else cols
+             for (xpath, cols) in iteritems(self.ordered_columns)]))
+
+        # add extra columns
+        columns += [col for col in self.extra_columns]
+        for field in self.dd.get_survey_elements_of_type('osm'):
+            columns += OsmData.get_tag_keys(
+                self.xform, field.get_abbreviated_xpath(),
+                include_prefix=True)
+
+        return columns
+
     def export_to(self, path, dataview=None):
         self.ordered_columns = OrderedDict()
         self._build_ordered_columns(self.dd.survey, self.ordered_columns)
 
-        if dataview:
-            cursor = dataview.query_data(dataview, all_data=True,
-                                         filter_query=self.filter_query)
-            if isinstance(cursor, QuerySet):
-                cursor = cursor.iterator()
-            self._update_columns_from_data(cursor)
-
-            columns = list(chain.from_iterable(
-                [[xpath] if cols is None else cols
-                 for (xpath, cols) in iteritems(self.ordered_columns)
-                 if [c for c in dataview.columns if xpath.startswith(c)]]
-            ))
-            cursor = dataview.query_data(dataview, all_data=True,
-                                         filter_query=self.filter_query)
-            if isinstance(cursor, QuerySet):
-                cursor = cursor.iterator()
-            data = self._format_for_dataframe(cursor)
-        else:
-            cursor = self._query_data(self.filter_query)
-            if isinstance(cursor, QuerySet):
-                cursor = cursor.iterator()
-            self._update_columns_from_data(cursor)
-
-            columns = list(chain.from_iterable(
-                [[xpath] if cols is None else cols
-                 for (xpath, cols) in iteritems(self.ordered_columns)]))
-
-            # add extra columns
-            columns += [col for col in self.extra_columns]
-            for field in self.dd.get_survey_elements_of_type('osm'):
-                columns += OsmData.get_tag_keys(self.xform,
-                                                field.get_abbreviated_xpath(),
-                                                include_prefix=True)
+        # the records are read once, reindexed rows are spooled to disk while
+        # the repeat columns are collected and the CSV is written from the
+        # spool once all the columns are known
+        with RecordSpool() as data:
+            if dataview:
+                cursor = dataview.query_data(dataview, all_data=True,
+                                             filter_query=self.filter_query,
+                                             streaming=True)
+                if isinstance(cursor, QuerySet):
+                    cursor = cursor.iterator()
+                self._update_columns_from_data(cursor, data)
+
+                columns = list(chain.from_iterable(
+                    [[xpath] if cols is None else cols
+                     for (xpath, cols) in iteritems(self.ordered_columns)
+                     if [c for c in dataview.columns if xpath.startswith(c)]]
+                ))
+            else:
+                cursor = self._query_data(self.filter_query)
+                if isinstance(cursor, QuerySet):
+                    cursor = cursor.iterator()
+                self._update_columns_from_data(cursor, data)
+                if not data:
+                    raise NoRecordsFoundError(
+                        "No records found for your query")
+
+                columns = self._get_columns()
+
+            columns_with_hxl = self.include_hxl and get_columns_with_hxl(
+                self.dd.survey_elements)
+
+            write_to_csv(path, data, columns,
+                         columns_with_hxl=columns_with_hxl,
+                         remove_group_name=self.remove_group_name,
+                         dd=self.dd, group_delimiter=self.group_delimiter,
+                         include_labels=self.include_labels,
+                         include_labels_only=self.include_labels_only,
+                         include_hxl=self.include_hxl,
+                         win_excel_utf8=self.win_excel_utf8,
+                         total_records=self.total_records,
+                         index_tags=self.index_tags)
+
+    def export_shard_to(self, path):
+        """
+        Writes the records of one shard of a sharded export to a CSV with a
+        single header row of the column xpaths, see merge_shards_to().
+        """
+        self.ordered_columns = OrderedDict()
+        self._build_ordered_columns(self.dd.survey, self.ordered_columns)
+
+        with RecordSpool() as data:
             cursor = self._query_data(self.filter_query)
             if isinstance(cursor, QuerySet):
                 cursor = cursor.iterator()
-            data = self._format_for_dataframe(cursor)
+            self._update_columns_from_data(cursor, data)
 
+            write_to_csv(path, data, self._get_columns())
+
+    def merge_shards_to(self, path, shard_files):
+        """
+        Writes the records of the CSVs written by export_shard_to(), in shard
+        order, to a CSV at path. The columns are the union of the shard
+        columns, see merge_columns().
+        """
+        readers = [csv.DictReader(shard_file, encoding='utf-8')
+                   for shard_file in shard_files]
+        columns = merge_columns([reader.fieldnames for reader in readers])
         columns_with_hxl = self.include_hxl and get_columns_with_hxl(
             self.dd.survey_elements)
 
-        write_to_csv(path, data, columns,
+        write_to_csv(path, chain.from_iterable(readers), columns,
                      columns_with_hxl=columns_with_hxl,
                      remove_group_name=self.remove_group_name,
                      dd=self.dd, group_delimiter=self.group_delimiter,
@@ -671,3 +813,60 @@ class CSVDataFrameBuilder(AbstractDataFrameBuilder):
                      win_excel_utf8=self.win_excel_utf8,
                      total_records=self.total_records,
                      index_tags=self.index_tags)
+
+    def append_to(self, path, base_file):
+        """
+        Writes the records of base_file, a CSV written by export_to(),
+        followed by the records of the builder to a CSV at path.
+
+        Returns the number of records in base_file, None if the records of
+        the builder have columns that are not in base_file.
+        """
+        na_rep = getattr(settings, 'NA_REP', NA_REP)
+        encoding = 'utf-8-sig' if self.win_excel_utf8 else 'utf-8'
+        columns_with_hxl = self.include_hxl and get_columns_with_hxl(
+            self.dd.survey_elements)
+        header_rows = 0 if self.include_labels_only else 1
+        if self.include_labels or self.include_labels_only:
+            header_rows += 1
+        if self.include_hxl and columns_with_hxl:
+            header_rows += 1
+
+        with NamedTemporaryFile(suffix='.csv') as shard_file:
+            self.export_shard_to(shard_file.name)
+            reader = csv.DictReader(shard_file, encoding='utf-8')
+            columns = reader.fieldnames
+            # the first header row identifies the columns of base_file
+            if self.include_labels_only:
+                keys = get_labels_from_columns(
+                    columns, self.dd, self.group_delimiter)
+            else:
+                keys = get_column_titles(
+                    columns, self.remove_group_name, self.dd,
+                    self.group_delimiter)
+
+            base_reader = csv.reader(base_file, encoding=encoding)
+            base_keys = next(base_reader)
+            if len(set(base_keys)) != len(base_keys) or \
+                    not set(keys).issubset(base_keys):
+                return None
+            columns_by_key = dict(zip(keys, columns))
+            base_columns = [columns_by_key.get(key) for key in base_keys]
+
+            base_records = 0
+            with open(path, 'wb') as csvfile:
+                writer = csv.writer(
+                    csvfile, encoding=encoding, lineterminator='\n')
+                writer.writerow(base_keys)
+                for i, row in enumerate(base_reader, start=2):
+                    writer.writerow(row)
+                    if i > header_rows:
+                        base_records += 1
+
+                for i, row in enumerate(reader, start=base_records + 1):
+                    writer.writerow(
+                        [row.get(col, na_rep) if col else na_rep
+                         for col in base_columns])
+                    track_task_progress(i, self.total_records)
+
+        return base_records
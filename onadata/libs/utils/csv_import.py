@@ -11,6 +11,7 @@ from builtins import str as text
 from collections import defaultdict
 from copy import deepcopy
 from datetime import datetime
+from hashlib import sha256
 from io import BytesIO
 from typing import Dict, Any, List
 
@@ -23,14 +24,25 @@ from dateutil.parser import parse
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.files.storage import default_storage
+from django.db import transaction
 from django.utils import timezone
 from django.utils.translation import ugettext as _
 from future.utils import iteritems
 from multidb.pinning import use_master
 
-from onadata.apps.logger.models import Instance, XForm
-from onadata.apps.messaging.constants import XFORM, SUBMISSION_DELETED
+from onadata.apps.logger.models import Instance, SurveyType, XForm
+from onadata.apps.logger.models.form_aggregate import clear_form_aggregates
+from onadata.apps.logger.models.instance import (
+    FormInactiveError, FormIsMergedDatasetError, InstanceHistory,
+    _update_submission_count_for_today, get_search_text)
+from onadata.apps.logger.models.submission_count_delta import \
+    record_submission_count_delta
+from onadata.apps.logger.xform_instance_parser import SubmissionContext
+from onadata.apps.messaging.constants import (XFORM, SUBMISSION_CREATED,
+                                              SUBMISSION_DELETED)
 from onadata.apps.messaging.serializers import send_message
+from onadata.apps.restservice.signals import trigger_webhook
+from onadata.apps.viewer.models.parsed_instance import ParsedInstance
 from onadata.celery import app
 from onadata.libs.utils import analytics
 from onadata.libs.utils.async_status import (FAILED, async_status,
@@ -39,11 +51,13 @@ from onadata.libs.utils.common_tags import (MULTIPLE_SELECT_TYPE, EXCEL_TRUE,
                                             XLS_DATE_FIELDS,
                                             XLS_DATETIME_FIELDS, UUID, NA_REP,
                                             INSTANCE_CREATE_EVENT,
-                                            INSTANCE_UPDATE_EVENT)
+                                            INSTANCE_UPDATE_EVENT, VERSION)
+from onadata.libs.utils.cache_tools import XFORM_DATA_VERSIONS, safe_delete
 from onadata.libs.utils.common_tools import report_exception
 from onadata.libs.utils.dict_tools import csv_dict_to_nested_dict
 from onadata.libs.utils.logger_tools import (OpenRosaResponse, dict2xml,
                                              safe_create_instance)
+from onadata.libs.utils.validate_data import validate_data, validate_submission
 
 DEFAULT_UPDATE_BATCH = 100
 PROGRESS_BATCH_UPDATE = getattr(settings, 'EXPORT_TASK_PROGRESS_UPDATE_BATCH',
@@ -51,6 +65,10 @@ PROGRESS_BATCH_UPDATE = getattr(settings, 'EXPORT_TASK_PROGRESS_UPDATE_BATCH',
 IGNORED_COLUMNS = ['formhub/uuid', 'meta/instanceID']
 
 
+class CSVImportError(Exception):
+    """A CSV row could not be submitted."""
+
+
 def get_submission_meta_dict(xform, instance_id):
     """Generates metadata for our submission
 
@@ -268,13 +286,314 @@ def flatten_split_select_multiples(
     return row
 
 
+def get_submission_row(row, select_multiples, ona_uuid):
+    """Converts a validated csv row into the nested dict of a submission
+
+    :param dict row: The csv row, without empty and additional columns.
+    :param list select_multiples: The names of multiple select questions.
+    :param dict ona_uuid: The formhub uuid of the form to inject.
+    :return: A tuple of the submission dict, its instance ID, the username of
+    its submitter and its submission date.
+    :rtype: tuple
+    """
+    location_data = {}
+
+    for key in list(row):
+        # Collect row location data into separate location_data
+        # dict
+        if key.endswith(('.latitude', '.longitude', '.altitude',
+                        '.precision')):
+            location_key, location_prop = key.rsplit(u'.', 1)
+            location_data.setdefault(location_key, {}).update({
+                location_prop:
+                row.get(key, '0')
+            })
+
+    # collect all location K-V pairs into single geopoint field(s)
+    # in location_data dict
+    for location_key in list(location_data):
+        location_data.update({
+            location_key:
+            (u'%(latitude)s %(longitude)s '
+                '%(altitude)s %(precision)s') % defaultdict(
+                lambda: '', location_data.get(location_key))
+        })
+
+    nested_dict = csv_dict_to_nested_dict(
+        row, select_multiples=select_multiples)
+    row = flatten_split_select_multiples(
+        nested_dict, select_multiples=select_multiples)
+    location_data = csv_dict_to_nested_dict(location_data)
+    # Merge location_data into the Row data
+    row = dict_merge(row, location_data)
+
+    submission_time = datetime.utcnow().isoformat()
+    row_uuid = row.get('meta/instanceID') or 'uuid:{}'.format(
+        row.get(UUID)) if row.get(UUID) else None
+    submitted_by = row.get('_submitted_by')
+    submission_date = row.get('_submission_time', submission_time)
+
+    for key in list(row):
+        # remove metadata (keys starting with '_')
+        if key.startswith('_'):
+            del row[key]
+
+    # Inject our forms uuid into the submission
+    row.update(ona_uuid)
+
+    return row, row_uuid, submitted_by, submission_date
+
+
+class BulkSubmissionImport(object):
+    """Imports CSV rows in batches of CSV_IMPORT_BATCH_SIZE rows
+
+    New submissions are created with batched inserts of their instances and
+    parsed instances and the form's counters are updated once per batch.
+    Rows editing a submission, or repeating one, are submitted one at a time
+    through :py:func:`onadata.libs.utils.logger_tools.safe_create_instance`.
+
+    :param str username: the submission user
+    :param onadata.apps.logger.models.XForm xform: The submissions' XForm.
+    :param list rollback_uuids: The uuids of the created submissions are
+    added to it.
+    """
+
+    def __init__(self, username, xform, rollback_uuids, num_rows=None,
+                 info=None):
+        self.username = username
+        self.xform = xform
+        self.rollback_uuids = rollback_uuids
+        self.num_rows = num_rows
+        self.info = info
+        self.batch_size = getattr(settings, 'CSV_IMPORT_BATCH_SIZE', 500)
+        self.additions = self.duplicates = self.updates = 0
+        self._rows = []
+        self._seen_uuids = set()
+        self._survey_types = {}
+        self._users = {}
+
+    def add(self, row, row_uuid, submitted_by, submission_date):
+        """Adds a row, as returned by get_submission_row, to the import"""
+        self._rows.append((row, row_uuid, submitted_by, submission_date))
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Submits the rows added since the last flush
+
+        :raises CSVImportError: when a row fails to be submitted.
+        """
+        rows, self._rows = self._rows, []
+        if not rows:
+            return
+
+        instance_ids = [row_uuid.replace('uuid:', '')
+                        for (row, row_uuid, submitted_by, submission_date)
+                        in rows if row_uuid]
+        existing_ids = set(self.xform.instances.filter(
+            uuid__in=instance_ids).values_list('uuid', flat=True))
+        existing_ids.update(InstanceHistory.objects.filter(
+            xform_instance__xform=self.xform,
+            uuid__in=instance_ids).values_list('uuid', flat=True))
+
+        new_rows = []
+        for row, row_uuid, submitted_by, submission_date in rows:
+            instance_id = row_uuid.replace('uuid:', '') if row_uuid else None
+            if instance_id in existing_ids or \
+                    instance_id in self._seen_uuids:
+                # the rows before an edit are created first
+                self._create_submissions(new_rows)
+                new_rows = []
+                self._submit_row(row, row_uuid, submitted_by, submission_date)
+            else:
+                row_uuid = row_uuid or 'uuid:{}'.format(uuid.uuid4())
+                old_meta = row.get('meta', {})
+                old_meta.update({'instanceID': row_uuid})
+                row.update({'meta': old_meta})
+                new_rows.append(
+                    (row, row_uuid, submitted_by, submission_date))
+            if instance_id:
+                self._seen_uuids.add(instance_id)
+        self._create_submissions(new_rows)
+
+        try:
+            current_task.update_state(
+                state='PROGRESS',
+                meta={
+                    'progress': self.additions,
+                    'total': self.num_rows,
+                    'info': self.info
+                })
+        except Exception:
+            logging.exception(
+                _(u'Could not update state of import CSV batch process.'))
+
+    def _get_users(self, usernames):
+        missing = set(usernames).difference(self._users)
+        missing.discard(None)
+        if missing:
+            self._users.update(User.objects.in_bulk(
+                list(missing), field_name='username'))
+
+        return self._users
+
+    def _submit_row(self, row, row_uuid, submitted_by, submission_date):
+        old_meta = row.get('meta', {})
+        new_meta, update = get_submission_meta_dict(self.xform, row_uuid)
+        self.updates += update
+        old_meta.update(new_meta)
+        row.update({'meta': old_meta})
+
+        row_uuid = row.get('meta').get('instanceID')
+        self.rollback_uuids.append(row_uuid.replace('uuid:', ''))
+        xml_file = BytesIO(
+            dict2xmlsubmission(row, self.xform, row_uuid, submission_date))
+
+        try:
+            error, instance = safe_create_instance(
+                self.username, xml_file, [], self.xform.uuid, None)
+        except ValueError as e:
+            error = e
+
+        if error:
+            if not (isinstance(error, OpenRosaResponse)
+                    and error.status_code == 202):
+                raise CSVImportError(text(error))
+            self.duplicates += 1
+        else:
+            self.additions += 1
+            user = self._get_users([submitted_by]).get(submitted_by)
+            if user:
+                instance.user = user
+                instance.save()
+
+    def _get_survey_type(self, root_node_name):
+        if root_node_name not in self._survey_types:
+            self._survey_types[root_node_name], created = \
+                SurveyType.objects.get_or_create(slug=root_node_name)
+
+        return self._survey_types[root_node_name]
+
+    def _build_instance(self, xml, checksum, user, validate_async):
+        # the xml is parsed once, for validation and the instance's values
+        context = SubmissionContext(xml)
+        if not validate_async and not validate_data(context.to_dict()):
+            raise CSVImportError(_(u"Submission Failed Validation."))
+
+        instance = Instance(
+            xml=context.xml, user=user, xform=self.xform, checksum=checksum)
+        instance.set_submission_context(context)
+        # pylint: disable=protected-access
+        instance._set_geom()
+        instance._set_uuid()
+        instance.survey_type = self._get_survey_type(
+            context.get_root_node_name())
+        instance.version = instance.get_dict().get(
+            VERSION, self.xform.version)
+        # CSV rows have no attachments
+        instance.total_media = instance.num_of_media
+        instance.media_count = 0
+        instance.media_all_received = instance.total_media == 0
+
+        return instance
+
+    def _create_submissions(self, rows):
+        if not rows:
+            return
+
+        xform = self.xform
+        if xform.is_merged_dataset:
+            raise CSVImportError(text(FormIsMergedDatasetError()))
+        if not xform.downloadable:
+            raise CSVImportError(text(FormInactiveError()))
+        if xform.encrypted:
+            raise CSVImportError(_(
+                "Unencrypted submissions are not allowed for encrypted "
+                "forms."))
+
+        validate_async = getattr(
+            settings, 'SUBMISSION_VALIDATION_ASYNC', False)
+        submissions = []
+        for row, row_uuid, submitted_by, submission_date in rows:
+            xml = dict2xmlsubmission(row, xform, row_uuid, submission_date)
+            submissions.append(
+                (xml, sha256(xml).hexdigest(), row_uuid, submitted_by))
+        checksums = set(xform.instances.filter(
+            checksum__in=[checksum for (xml, checksum, row_uuid, user)
+                          in submissions]).values_list('checksum', flat=True))
+        users = self._get_users([submitted_by for (xml, checksum, row_uuid,
+                                                   submitted_by)
+                                 in submissions])
+
+        instances = []
+        for xml, checksum, row_uuid, submitted_by in submissions:
+            if checksum in checksums:
+                self.duplicates += 1
+                continue
+            checksums.add(checksum)
+            instances.append(self._build_instance(
+                xml, checksum, users.get(submitted_by), validate_async))
+        if not instances:
+            return
+
+        dates_created = []
+        for instance in instances:
+            # pylint: disable=protected-access
+            date_created = instance._submission_context.submission_date
+            if date_created and not timezone.is_aware(date_created):
+                date_created = timezone.make_aware(date_created, timezone.utc)
+            dates_created.append(date_created)
+
+        with transaction.atomic():
+            Instance.objects.bulk_create(instances)
+            self.rollback_uuids.extend(i.uuid for i in instances)
+            parsed_instances = []
+            for instance, date_created in zip(instances, dates_created):
+                # date_created is set on insert, it is overridden after
+                if date_created:
+                    instance.date_created = date_created
+                instance.json = instance.get_full_dict(load_related=False)
+                instance.search_text = get_search_text(instance.json)
+                parsed_instance = ParsedInstance(instance=instance)
+                # pylint: disable=protected-access
+                parsed_instance._set_geopoint()
+                parsed_instances.append(parsed_instance)
+            Instance.objects.bulk_update(
+                instances, ['date_created', 'json', 'search_text'])
+            ParsedInstance.objects.bulk_create(parsed_instances)
+
+            record_submission_count_delta(
+                xform.pk, xform.user_id, len(instances),
+                max(i.date_created for i in instances))
+            _update_submission_count_for_today(
+                xform.pk, count=len(instances))
+            safe_delete('{}{}'.format(XFORM_DATA_VERSIONS, xform.pk))
+            clear_form_aggregates(xform.pk)
+            xform.project.save(update_fields=['date_modified'])
+
+            for instance in instances:
+                trigger_webhook.send(sender=Instance, instance=instance)
+                if validate_async:
+                    transaction.on_commit(
+                        lambda pk=instance.pk:
+                        validate_submission.apply_async(args=[pk]))
+
+        send_message(
+            instance_id=[i.pk for i in instances], target_id=xform.pk,
+            target_type=XFORM, user=xform.user,
+            message_verb=SUBMISSION_CREATED)
+        self.additions += len(instances)
+
+
 @use_master
 def submit_csv(username, xform, csv_file, overwrite=False):
     """Imports CSV data to an existing form
 
     Takes a csv formatted file or string containing rows of submission/instance
     and converts those to xml submissions and finally submits them by calling
-    :py:func:`onadata.libs.utils.logger_tools.safe_create_instance`
+    :py:func:`onadata.libs.utils.logger_tools.safe_create_instance`, or in
+    batches with :py:class:`BulkSubmissionImport` when
+    CSV_IMPORT_BULK_ENABLED is set.
 
     :param str username: the submission user
     :param onadata.apps.logger.models.XForm xform: The submission's XForm.
@@ -322,12 +641,17 @@ def submit_csv(username, xform, csv_file, overwrite=False):
         xform.instances.filter(deleted_at__isnull=True)\
             .update(deleted_at=timezone.now(),
                     deleted_by=User.objects.get(username=username))
+        clear_form_aggregates(xform.id)
         # send message
         send_message(
             instance_id=instance_ids, target_id=xform.id,
             target_type=XFORM, user=User.objects.get(username=username),
             message_verb=SUBMISSION_DELETED)
 
+    bulk_import = BulkSubmissionImport(
+        username, xform, rollback_uuids, num_rows, additional_col) \
+        if getattr(settings, 'CSV_IMPORT_BULK_ENABLED', False) else None
+
     try:
         for row_no, row in enumerate(csv_reader):
             # Remove additional columns
@@ -345,50 +669,18 @@ def submit_csv(username, xform, csv_file, overwrite=False):
             # Only continue the process if no errors where encountered while
             # validating the data
             if not errors:
-                location_data = {}
-
-                for key in list(row):
-                    # Collect row location data into separate location_data
-                    # dict
-                    if key.endswith(('.latitude', '.longitude', '.altitude',
-                                    '.precision')):
-                        location_key, location_prop = key.rsplit(u'.', 1)
-                        location_data.setdefault(location_key, {}).update({
-                            location_prop:
-                            row.get(key, '0')
-                        })
-
-                # collect all location K-V pairs into single geopoint field(s)
-                # in location_data dict
-                for location_key in list(location_data):
-                    location_data.update({
-                        location_key:
-                        (u'%(latitude)s %(longitude)s '
-                            '%(altitude)s %(precision)s') % defaultdict(
-                            lambda: '', location_data.get(location_key))
-                    })
-
-                nested_dict = csv_dict_to_nested_dict(
-                    row, select_multiples=select_multiples)
-                row = flatten_split_select_multiples(
-                    nested_dict, select_multiples=select_multiples)
-                location_data = csv_dict_to_nested_dict(location_data)
-                # Merge location_data into the Row data
-                row = dict_merge(row, location_data)
-
-                submission_time = datetime.utcnow().isoformat()
-                row_uuid = row.get('meta/instanceID') or 'uuid:{}'.format(
-                    row.get(UUID)) if row.get(UUID) else None
-                submitted_by = row.get('_submitted_by')
-                submission_date = row.get('_submission_time', submission_time)
-
-                for key in list(row):
-                    # remove metadata (keys starting with '_')
-                    if key.startswith('_'):
-                        del row[key]
-
-                # Inject our forms uuid into the submission
-                row.update(ona_uuid)
+                row, row_uuid, submitted_by, submission_date = \
+                    get_submission_row(row, select_multiples, ona_uuid)
+                if bulk_import is not None:
+                    try:
+                        bulk_import.add(
+                            row, row_uuid, submitted_by, submission_date)
+                    except CSVImportError:
+                        raise
+                    except Exception as e:
+                        return failed_import(rollback_uuids, xform, e,
+                                             text(e))
+                    continue
 
                 old_meta = row.get('meta', {})
                 new_meta, update = get_submission_meta_dict(xform, row_uuid)
@@ -446,6 +738,20 @@ def submit_csv(username, xform, csv_file, overwrite=False):
                     failed_import(rollback_uuids, xform, e, text(e))
                 finally:
                     xform.submission_count(True)
+
+        if bulk_import is not None and not errors:
+            try:
+                bulk_import.flush()
+            except CSVImportError:
+                raise
+            except Exception as e:
+                return failed_import(rollback_uuids, xform, e, text(e))
+            additions = bulk_import.additions
+            duplicates = bulk_import.duplicates
+            inserts = bulk_import.updates
+    except CSVImportError as e:
+        Instance.objects.filter(uuid__in=rollback_uuids, xform=xform).delete()
+        return async_status(FAILED, text(e))
     except UnicodeDecodeError as e:
         return failed_import(rollback_uuids, xform, e,
                              'CSV file must be utf-8 encoded')
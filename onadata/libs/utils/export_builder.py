@@ -5,14 +5,18 @@ ExportBuilder
 from __future__ import unicode_literals
 
 import csv
+import io
 import logging
 import sys
 import uuid
 import re
 from builtins import str as text
 from datetime import datetime, date
-from zipfile import ZipFile, ZIP_DEFLATED
+from itertools import islice
+from zipfile import ZipFile, ZIP_DEFLATED, ZIP_STORED
 
+import pyarrow
+import pyarrow.parquet as pq
 from celery import current_task
 from django.conf import settings
 from django.core.files.temp import NamedTemporaryFile
@@ -39,6 +43,8 @@ from onadata.libs.utils.mongo import _decode_from_mongo, _is_invalid_for_mongo
 GEOPOINT_BIND_TYPE = 'geopoint'
 OSM_BIND_TYPE = 'osm'
 DEFAULT_UPDATE_BATCH = 100
+# matches ${name} references to other fields in a value
+DYNAMIC_VALUE_REGEX = re.compile(r'\$\{\w+\}')
 
 YES = 1
 NO = 0
@@ -170,6 +176,33 @@ def encode_if_str(row, key, encode_dates=False, sav_writer=None):
     return val
 
 
+def get_parquet_converter(parquet_type):
+    """
+    Returns a function that converts an export value to the python type of
+    the pyarrow parquet_type, values that can not be converted become None.
+    """
+    def to_number(func):
+        def convert(value):
+            try:
+                return func(value)
+            except (TypeError, ValueError):
+                return None
+
+        return convert
+
+    if pyarrow.types.is_boolean(parquet_type):
+        return lambda x: x if isinstance(x, bool) else None
+    if pyarrow.types.is_integer(parquet_type):
+        return to_number(int)
+    if pyarrow.types.is_floating(parquet_type):
+        return to_number(float)
+    if pyarrow.types.is_date(parquet_type) or \
+            pyarrow.types.is_timestamp(parquet_type):
+        return lambda x: x if isinstance(x, date) else None
+
+    return lambda x: None if x is None or x == '' else text(x)
+
+
 def dict_to_joined_export(data, index, indices, name, survey, row,
                           media_xpaths=[]):
     """
@@ -217,9 +250,10 @@ def dict_to_joined_export(data, index, indices, name, survey, row,
                                  else v['note'] for v in val]
                     output[name][key] = '\r\n'.join(note_list)
                 else:
-                    data_dictionary = get_data_dictionary_from_survey(survey)
+                    # choice labels are applied later by pre_process_row so
+                    # no data dictionary is needed here
                     output[name][key] = get_value_or_attachment_uri(
-                        key, val, data, data_dictionary, media_xpaths,
+                        key, val, data, None, media_xpaths,
                         row and row.get(ATTACHMENTS))
 
     return output
@@ -342,6 +376,18 @@ class ExportBuilder(object):
         'dateTime': lambda x: datetime.strptime(x[:19], '%Y-%m-%dT%H:%M:%S')
     }
 
+    PARQUET_TYPES = {
+        'int': pyarrow.int64(),
+        'decimal': pyarrow.float64(),
+        'date': pyarrow.date32(),
+    }
+    PARQUET_EXTRA_FIELD_TYPES = {
+        ID: pyarrow.int64(),
+        INDEX: pyarrow.int64(),
+        PARENT_INDEX: pyarrow.int64(),
+        SUBMISSION_TIME: pyarrow.timestamp('s'),
+    }
+
     TRUNCATE_GROUP_TITLE = False
 
     XLS_SHEET_NAME_MAX_CHARS = 31
@@ -565,6 +611,28 @@ class ExportBuilder(object):
             self.select_multiples, self.gps_fields, self.osm_fields,
             self.encoded_fields, self.select_ones, self.GROUP_DELIMITER,
             self.TRUNCATE_GROUP_TITLE)
+        self.row_plans = dict(
+            (section['name'], self.get_row_plan(section))
+            for section in self.sections)
+
+    def get_row_plan(self, section):
+        """
+        Returns the steps pre_process_row applies to the rows of a section,
+        compiled once from the section elements so that rows are processed
+        without scanning the section's elements for every row.
+        """
+        section_name = section['name']
+
+        return {
+            'encoded_fields': self.encoded_fields.get(section_name),
+            'select_multiples': self.select_multiples.get(section_name),
+            'gps_fields': self.gps_fields.get(section_name),
+            'select_ones': list(self.select_ones.get(section_name, [])),
+            'converters': [
+                (element['xpath'], element['type'])
+                for element in section['elements']
+                if element['type'] in ExportBuilder.TYPES_TO_CONVERT],
+        }
 
     def section_by_name(self, name):
         matches = [s for s in self.sections if s['name'] == name]
@@ -602,40 +670,37 @@ class ExportBuilder(object):
         for (xpath, choices) in iteritems(select_multiples):
             # get the data matching this xpath
             data = row.get(xpath) and text(row.get(xpath))
-            selections = []
+            # maps the xpath of each selected choice to its value
+            selections = {}
             if data:
-                selections = [
-                    '{0}/{1}'.format(
-                        xpath, selection) for selection in data.split()]
+                selections = dict(
+                    ('{0}/{1}'.format(xpath, selection), selection)
+                    for selection in data.split())
                 if show_choice_labels and data_dictionary:
                     row[xpath] = get_choice_label_value(
                         xpath, data, data_dictionary, language)
             if select_values:
                 if show_choice_labels:
-                    row.update(dict(
-                        [(choice['label'], choice['_label']
-                          if selections and choice['xpath'] in selections
-                          else None)
-                         for choice in choices]))
+                    row.update(
+                        (choice['label'], choice['_label']
+                         if choice['xpath'] in selections else None)
+                        for choice in choices)
                 else:
-                    row.update(dict(
-                        [(choice['xpath'],
-                          data.split()[selections.index(choice['xpath'])]
-                          if selections and choice['xpath'] in selections
-                          else None)
-                         for choice in choices]))
+                    row.update(
+                        (choice['xpath'], selections.get(choice['xpath']))
+                        for choice in choices)
             elif binary_select_multiples:
-                row.update(dict(
-                    [(choice['label']
-                      if show_choice_labels else choice['xpath'],
-                      YES if choice['xpath'] in selections else NO)
-                     for choice in choices]))
+                row.update(
+                    (choice['label']
+                     if show_choice_labels else choice['xpath'],
+                     YES if choice['xpath'] in selections else NO)
+                    for choice in choices)
             else:
-                row.update(dict(
-                    [(choice['label']
-                      if show_choice_labels else choice['xpath'],
-                      choice['xpath'] in selections if selections else None)
-                     for choice in choices]))
+                row.update(
+                    (choice['label']
+                     if show_choice_labels else choice['xpath'],
+                     choice['xpath'] in selections if selections else None)
+                    for choice in choices)
         return row
 
     @classmethod
@@ -675,16 +740,18 @@ class ExportBuilder(object):
         """
         Split select multiples, gps and decode . and $
         """
-        section_name = section['name']
+        plan = self.row_plans.get(section['name'])
+        if plan is None:
+            plan = self.get_row_plan(section)
 
         # first decode fields so that subsequent lookups
         # have decoded field names
-        if section_name in self.encoded_fields:
+        if plan['encoded_fields']:
             row = ExportBuilder.decode_mongo_encoded_fields(
-                row, self.encoded_fields[section_name])
+                row, plan['encoded_fields'])
 
-        if section_name in self.select_multiples:
-            select_multiples = self.select_multiples[section_name]
+        select_multiples = plan['select_multiples']
+        if select_multiples:
             if self.SPLIT_SELECT_MULTIPLES:
                 row = ExportBuilder.split_select_multiples(
                     row, select_multiples, self.VALUE_SELECT_MULTIPLES,
@@ -699,25 +766,21 @@ class ExportBuilder(object):
                         row[xpath] = get_choice_label_value(
                             xpath, data, self.dd, self.language)
 
-        if section_name in self.gps_fields:
+        if plan['gps_fields']:
             row = ExportBuilder.split_gps_components(
-                row, self.gps_fields[section_name])
+                row, plan['gps_fields'])
 
-        if section_name in self.select_ones and self.SHOW_CHOICE_LABELS:
-            for key in self.select_ones[section_name]:
+        if self.SHOW_CHOICE_LABELS:
+            for key in plan['select_ones']:
                 if key in row:
                     row[key] = get_choice_label_value(key, row[key], self.dd,
                                                       self.language)
 
-        # convert to native types
-        for elm in section['elements']:
-            # only convert if its in our list and its not empty, just to
-            # optimize
-            value = row.get(elm['xpath'])
-            if elm['type'] in ExportBuilder.TYPES_TO_CONVERT\
-                    and value is not None and value != '':
-                row[elm['xpath']] = ExportBuilder.convert_type(
-                    value, elm['type'])
+        # convert to native types, skipping empty values
+        for (xpath, data_type) in plan['converters']:
+            value = row.get(xpath)
+            if value is not None and value != '':
+                row[xpath] = ExportBuilder.convert_type(value, data_type)
 
         if SUBMISSION_TIME in row:
             row[SUBMISSION_TIME] = ExportBuilder.convert_type(
@@ -725,10 +788,9 @@ class ExportBuilder(object):
 
         # Map dynamic values
         for key, value in row.items():
-            if isinstance(value, str):
-                dynamic_val_regex = '\$\{\w+\}'  # noqa
+            if isinstance(value, str) and '${' in value:
                 # Find substrings that match ${`any_text`}
-                result = re.findall(dynamic_val_regex, value)
+                result = DYNAMIC_VALUE_REGEX.findall(value)
                 if result:
                     for val in result:
                         val_key = val.replace('${', '').replace('}', '')
@@ -740,21 +802,62 @@ class ExportBuilder(object):
 
         return row
 
-    def to_zipped_csv(self, path, data, *args, **kwargs):
-        def write_row(row, csv_writer, fields):
-            csv_writer.writerow(
-                [encode_if_str(row, field) for field in fields])
+    def get_section_rows(self, data, total_records=None):
+        """
+        Yields a (section, row) pair for every row of every section of the
+        records in data, the rows are pre-processed and the sections follow
+        the order of self.sections within each record.
+        """
+        media_xpaths = [] if not self.INCLUDE_IMAGES \
+            else self.dd.get_media_survey_xpaths()
 
-        csv_defs = {}
-        dataview = kwargs.get('dataview')
-        total_records = kwargs.get('total_records')
+        index = 1
+        indices = {}
+        survey_name = self.survey.name
+        for i, d in enumerate(data, start=1):
+            # decode mongo section names
+            joined_export = dict_to_joined_export(d, index, indices,
+                                                  survey_name,
+                                                  self.survey, d,
+                                                  media_xpaths)
+            output = decode_mongo_encoded_section_names(joined_export)
+            # attach meta fields (index, parent_index, parent_table)
+            # output has keys for every section
+            if survey_name not in output:
+                output[survey_name] = {}
+            output[survey_name][INDEX] = index
+            output[survey_name][PARENT_INDEX] = -1
+            for section in self.sections:
+                # section might not exist within the output, e.g. data was
+                # not provided for said repeat
+                row = output.get(section['name'], None)
+                if isinstance(row, dict):
+                    yield section, self.pre_process_row(row, section)
+                elif isinstance(row, list):
+                    for child_row in row:
+                        yield section, self.pre_process_row(
+                            child_row, section)
+            index += 1
+            track_task_progress(i, total_records)
 
+    def _get_section_csv_defs(self):
+        """
+        Returns a temporary CSV file and writer for each section.
+        """
+        csv_defs = {}
         for section in self.sections:
             csv_file = NamedTemporaryFile(suffix='.csv', mode='w')
             csv_writer = csv.writer(csv_file)
             csv_defs[section['name']] = {
                 'csv_file': csv_file, 'csv_writer': csv_writer}
 
+        return csv_defs
+
+    def _write_section_csv_headers(self, csv_defs, dataview,
+                                   columns_with_hxl):
+        """
+        Writes the header, label and HXL rows of each section CSV.
+        """
         # write headers
         if not self.INCLUDE_LABELS_ONLY:
             for section in self.sections:
@@ -769,10 +872,6 @@ class ExportBuilder(object):
                 csv_defs[section['name']]['csv_writer'].writerow(
                     [f for f in fields])
 
-        media_xpaths = [] if not self.INCLUDE_IMAGES \
-            else self.dd.get_media_survey_xpaths()
-
-        columns_with_hxl = kwargs.get('columns_with_hxl')
         # write hxl row
         if self.INCLUDE_HXL and columns_with_hxl:
             for section in self.sections:
@@ -783,55 +882,155 @@ class ExportBuilder(object):
                     writer = csv_defs[section['name']]['csv_writer']
                     writer.writerow(hxl_row)
 
-        index = 1
-        indices = {}
-        survey_name = self.survey.name
-        for i, d in enumerate(data, start=1):
-            # decode mongo section names
-            joined_export = dict_to_joined_export(d, index, indices,
-                                                  survey_name,
-                                                  self.survey, d,
-                                                  media_xpaths)
-            output = decode_mongo_encoded_section_names(joined_export)
-            # attach meta fields (index, parent_index, parent_table)
-            # output has keys for every section
-            if survey_name not in output:
-                output[survey_name] = {}
-            output[survey_name][INDEX] = index
-            output[survey_name][PARENT_INDEX] = -1
-            for section in self.sections:
-                # get data for this section and write to csv
-                section_name = section['name']
-                csv_def = csv_defs[section_name]
-                fields = self.get_fields(dataview, section, 'xpath')
-                csv_writer = csv_def['csv_writer']
-                # section name might not exist within the output, e.g. data was
-                # not provided for said repeat - write test to check this
-                row = output.get(section_name, None)
-                if isinstance(row, dict):
-                    write_row(
-                        self.pre_process_row(row, section),
-                        csv_writer, fields)
-                elif isinstance(row, list):
-                    for child_row in row:
-                        write_row(
-                            self.pre_process_row(child_row, section),
-                            csv_writer, fields)
-            index += 1
-            track_task_progress(i, total_records)
+    @classmethod
+    def _get_section_csv_filename(cls, section_name):
+        return '_'.join(section_name.split('/')) + '.csv'
 
-        # write zipfile
+    def _write_section_csv_zipfile(self, path, csv_defs):
+        """
+        Writes the section CSVs to a zipfile at path and closes them.
+        """
         with ZipFile(path, 'w', ZIP_DEFLATED, allowZip64=True) as zip_file:
             for (section_name, csv_def) in iteritems(csv_defs):
                 csv_file = csv_def['csv_file']
-                csv_file.seek(0)
+                csv_file.flush()
                 zip_file.write(
-                    csv_file.name, '_'.join(section_name.split('/')) + '.csv')
+                    csv_file.name,
+                    self._get_section_csv_filename(section_name))
 
         # close files when we are done
         for (section_name, csv_def) in iteritems(csv_defs):
             csv_def['csv_file'].close()
 
+    def to_zipped_csv(self, path, data, *args, **kwargs):
+        def write_row(row, csv_writer, fields):
+            csv_writer.writerow(
+                [encode_if_str(row, field) for field in fields])
+
+        dataview = kwargs.get('dataview')
+        total_records = kwargs.get('total_records')
+        csv_defs = self._get_section_csv_defs()
+
+        if kwargs.get('include_headers', True):
+            self._write_section_csv_headers(
+                csv_defs, dataview, kwargs.get('columns_with_hxl'))
+
+        fields = dict(
+            (section['name'], self.get_fields(dataview, section, 'xpath'))
+            for section in self.sections)
+        for (section, row) in self.get_section_rows(data, total_records):
+            section_name = section['name']
+            write_row(row, csv_defs[section_name]['csv_writer'],
+                      fields[section_name])
+
+        # write zipfile
+        self._write_section_csv_zipfile(path, csv_defs)
+
+    def to_zipped_csv_shard(self, path, data, *args, **kwargs):
+        """
+        Writes one shard of a sharded CSV zip export. The section CSVs have
+        no header rows and their indexes start from 1 within the shard.
+        """
+        kwargs['include_headers'] = False
+        self.to_zipped_csv(path, data, *args, **kwargs)
+
+    def _get_section_csv_header_rows(self, columns_with_hxl):
+        """
+        Returns the number of header rows written to each section CSV.
+        """
+        header_rows = 0 if self.INCLUDE_LABELS_ONLY else 1
+        if self.INCLUDE_LABELS or self.INCLUDE_LABELS_ONLY:
+            header_rows += 1
+        if self.INCLUDE_HXL and columns_with_hxl:
+            header_rows += 1
+
+        return header_rows
+
+    def merge_zipped_csv_shards(self, path, shard_files, *args, **kwargs):
+        """
+        Merges the section CSVs of CSV zip export shards, in shard order, into
+        a single CSV zip export. The rows of the base_file CSV zip export, if
+        given, are written before the rows of the shards.
+
+        The _index of a row is offset by the number of rows of its section in
+        the preceding shards and its _parent_index by the number of rows of
+        its parent section in the preceding shards.
+
+        Returns the number of records in the base_file.
+        """
+        total_records = kwargs.get('total_records')
+        columns_with_hxl = kwargs.get('columns_with_hxl')
+        csv_defs = self._get_section_csv_defs()
+        self._write_section_csv_headers(csv_defs, None, columns_with_hxl)
+
+        # (file, number of header rows to skip)
+        merged_files = [(shard_file, 0) for shard_file in shard_files]
+        if kwargs.get('base_file') is not None:
+            merged_files.insert(0, (
+                kwargs['base_file'],
+                self._get_section_csv_header_rows(columns_with_hxl)))
+
+        positions = {}
+        for section in self.sections:
+            fields = self.get_fields(None, section, 'xpath')
+            positions[section['name']] = (
+                fields.index(INDEX), fields.index(PARENT_INDEX),
+                fields.index(PARENT_TABLE_NAME))
+        offsets = dict((section['name'], 0) for section in self.sections)
+        survey_name = self.survey.name
+        base_records = 0
+        i = 0
+        for (shard_file, header_rows) in merged_files:
+            counts = {}
+            with ZipFile(shard_file) as shard_zip:
+                for section in self.sections:
+                    section_name = section['name']
+                    index_pos, parent_index_pos, parent_table_pos = \
+                        positions[section_name]
+                    csv_writer = csv_defs[section_name]['csv_writer']
+                    counts[section_name] = 0
+                    section_file = shard_zip.open(
+                        self._get_section_csv_filename(section_name))
+                    with io.TextIOWrapper(section_file, newline='') as f:
+                        rows = islice(csv.reader(f), header_rows, None)
+                        for row in rows:
+                            counts[section_name] += 1
+                            row[index_pos] = \
+                                int(row[index_pos]) + offsets[section_name]
+                            parent_table = row[parent_table_pos]
+                            if parent_table and row[parent_index_pos]:
+                                row[parent_index_pos] = \
+                                    int(row[parent_index_pos]) + \
+                                    offsets.get(
+                                        _decode_from_mongo(parent_table), 0)
+                            csv_writer.writerow(row)
+                            if section_name == survey_name:
+                                i += 1
+                                track_task_progress(i, total_records)
+            # offsets only move once every section of the shard is written
+            # since child rows refer to the parent indexes within the shard
+            for (section_name, count) in iteritems(counts):
+                offsets[section_name] += count
+            if shard_file is kwargs.get('base_file'):
+                base_records = offsets[survey_name]
+
+        self._write_section_csv_zipfile(path, csv_defs)
+
+        return base_records
+
+    def append_zipped_csv(self, path, data, *args, **kwargs):
+        """
+        Writes a CSV zip export of the records of the base_file CSV zip
+        export followed by the records in data.
+
+        Returns the number of records in the base_file.
+        """
+        with NamedTemporaryFile(suffix='.zip') as shard_file:
+            self.to_zipped_csv_shard(shard_file.name, data, *args, **kwargs)
+
+            return self.merge_zipped_csv_shards(
+                path, [shard_file], *args, **kwargs)
+
     @classmethod
     def get_valid_sheet_name(cls, desired_name, existing_names):
         # a sheet name has to be <= 31 characters and not a duplicate of an
@@ -896,9 +1095,6 @@ class ExportBuilder(object):
                 ws = work_sheets[section_name]
                 ws.append(labels)
 
-        media_xpaths = [] if not self.INCLUDE_IMAGES \
-            else self.dd.get_media_survey_xpaths()
-
         # write hxl header
         columns_with_hxl = kwargs.get('columns_with_hxl')
         if self.INCLUDE_HXL and columns_with_hxl:
@@ -913,54 +1109,22 @@ class ExportBuilder(object):
                            for col in headers]
                 hxl_row and ws.append(hxl_row)
 
-        index = 1
-        indices = {}
-        survey_name = self.survey.name
-        for i, d in enumerate(data, start=1):
-            joined_export = dict_to_joined_export(d, index, indices,
-                                                  survey_name,
-                                                  self.survey, d,
-                                                  media_xpaths)
-            output = decode_mongo_encoded_section_names(joined_export)
-            # attach meta fields (index, parent_index, parent_table)
-            # output has keys for every section
-            if survey_name not in output:
-                output[survey_name] = {}
-            output[survey_name][INDEX] = index
-            output[survey_name][PARENT_INDEX] = -1
-            for section in self.sections:
-                # get data for this section and write to xls
-                section_name = section['name']
-                fields = self.get_fields(dataview, section, 'xpath')
-
-                ws = work_sheets[section_name]
-                # section might not exist within the output, e.g. data was
-                # not provided for said repeat - write test to check this
-                row = output.get(section_name, None)
-                if isinstance(row, dict):
-                    write_row(
-                        self.pre_process_row(row, section),
-                        ws, fields, work_sheet_titles)
-                elif isinstance(row, list):
-                    for child_row in row:
-                        write_row(
-                            self.pre_process_row(child_row, section),
-                            ws, fields, work_sheet_titles)
-            index += 1
-            track_task_progress(i, total_records)
+        fields = dict(
+            (section['name'], self.get_fields(dataview, section, 'xpath'))
+            for section in self.sections)
+        for (section, row) in self.get_section_rows(data, total_records):
+            section_name = section['name']
+            write_row(row, work_sheets[section_name], fields[section_name],
+                      work_sheet_titles)
 
         wb.save(filename=path)
 
-    def to_flat_csv_export(self, path, data, username, id_string,
-                           filter_query, **kwargs):
-        """
-        Generates a flattened CSV file for submitted data.
-        """
+    def _get_csv_builder(self, username, id_string, filter_query,
+                         **kwargs):
         # TODO resolve circular import
         from onadata.libs.utils.csv_builder import CSVDataFrameBuilder
         start = kwargs.get('start')
         end = kwargs.get('end')
-        dataview = kwargs.get('dataview')
         xform = kwargs.get('xform')
         options = kwargs.get('options')
         total_records = kwargs.get('total_records')
@@ -969,7 +1133,7 @@ class ExportBuilder(object):
         show_choice_labels = options.get('show_choice_labels', False)
         language = options.get('language')
 
-        csv_builder = CSVDataFrameBuilder(
+        return CSVDataFrameBuilder(
             username, id_string, filter_query, self.GROUP_DELIMITER,
             self.SPLIT_SELECT_MULTIPLES, self.BINARY_SELECT_MULTIPLES,
             start, end, self.TRUNCATE_GROUP_TITLE, xform,
@@ -981,8 +1145,52 @@ class ExportBuilder(object):
             show_choice_labels=show_choice_labels,
             include_reviews=self.INCLUDE_REVIEWS, language=language)
 
+    def to_flat_csv_export(self, path, data, username, id_string,
+                           filter_query, **kwargs):
+        """
+        Generates a flattened CSV file for submitted data.
+        """
+        dataview = kwargs.get('dataview')
+        csv_builder = self._get_csv_builder(
+            username, id_string, filter_query, **kwargs)
+
         csv_builder.export_to(path, dataview=dataview)
 
+    def to_flat_csv_shard(self, path, data, username, id_string,
+                          filter_query, **kwargs):
+        """
+        Writes one shard of a sharded flattened CSV export.
+        """
+        csv_builder = self._get_csv_builder(
+            username, id_string, filter_query, **kwargs)
+
+        csv_builder.export_shard_to(path)
+
+    def append_flat_csv_export(self, path, data, username, id_string,
+                               filter_query, **kwargs):
+        """
+        Writes a flattened CSV of the records of the base_file flattened CSV
+        export followed by the records of the filter_query.
+
+        Returns the number of records in the base_file, None if the records
+        have columns that are not in the base_file.
+        """
+        csv_builder = self._get_csv_builder(
+            username, id_string, filter_query, **kwargs)
+
+        return csv_builder.append_to(path, kwargs['base_file'])
+
+    def merge_flat_csv_shards(self, path, shard_files, username, id_string,
+                              filter_query, **kwargs):
+        """
+        Merges flattened CSV export shards, in shard order, into a single
+        flattened CSV export.
+        """
+        csv_builder = self._get_csv_builder(
+            username, id_string, filter_query, **kwargs)
+
+        csv_builder.merge_shards_to(path, shard_files)
+
     def get_default_language(self, languages):
         language = self.dd.default_language
         if languages and \
@@ -1186,9 +1394,7 @@ class ExportBuilder(object):
     def to_zipped_sav(self, path, data, *args, **kwargs):
         total_records = kwargs.get('total_records')
 
-        def write_row(row, csv_writer, fields):
-            # replace character for osm fields
-            fields = [field.replace(':', '_') for field in fields]
+        def write_row(row, sav_writer, fields):
             sav_writer.writerow(
                 [encode_if_str(row, field, sav_writer=sav_writer)
                  for field in fields])
@@ -1204,45 +1410,16 @@ class ExportBuilder(object):
             sav_defs[section['name']] = {
                 'sav_file': sav_file, 'sav_writer': sav_writer}
 
-        media_xpaths = [] if not self.INCLUDE_IMAGES \
-            else self.dd.get_media_survey_xpaths()
-
-        index = 1
-        indices = {}
-        survey_name = self.survey.name
-        for i, d in enumerate(data, start=1):
-            # decode mongo section names
-            joined_export = dict_to_joined_export(d, index, indices,
-                                                  survey_name,
-                                                  self.survey, d,
-                                                  media_xpaths)
-            output = decode_mongo_encoded_section_names(joined_export)
-            # attach meta fields (index, parent_index, parent_table)
-            # output has keys for every section
-            if survey_name not in output:
-                output[survey_name] = {}
-            output[survey_name][INDEX] = index
-            output[survey_name][PARENT_INDEX] = -1
-            for section in self.sections:
-                # get data for this section and write to csv
-                section_name = section['name']
-                sav_def = sav_defs[section_name]
-                fields = [
-                    element['xpath'] for element in
-                    section['elements']]
-                sav_writer = sav_def['sav_writer']
-                row = output.get(section_name, None)
-                if isinstance(row, dict):
-                    write_row(
-                        self.pre_process_row(row, section),
-                        sav_writer, fields)
-                elif isinstance(row, list):
-                    for child_row in row:
-                        write_row(
-                            self.pre_process_row(child_row, section),
-                            sav_writer, fields)
-            index += 1
-            track_task_progress(i, total_records)
+        # replace character for osm fields
+        fields = dict(
+            (section['name'],
+             [element['xpath'].replace(':', '_')
+              for element in section['elements']])
+            for section in self.sections)
+        for (section, row) in self.get_section_rows(data, total_records):
+            section_name = section['name']
+            write_row(row, sav_defs[section_name]['sav_writer'],
+                      fields[section_name])
 
         for (section_name, sav_def) in iteritems(sav_defs):
             sav_def['sav_writer'].closeSavFile(
@@ -1260,6 +1437,101 @@ class ExportBuilder(object):
         for (section_name, sav_def) in iteritems(sav_defs):
             sav_def['sav_file'].close()
 
+    def _get_parquet_type(self, element):
+        if '_label_xpath' in element:
+            # a select multiple choice column
+            if self.VALUE_SELECT_MULTIPLES:
+                return pyarrow.string()
+            return pyarrow.int8() if self.BINARY_SELECT_MULTIPLES \
+                else pyarrow.bool_()
+
+        return self.PARQUET_TYPES.get(element['type'], pyarrow.string())
+
+    def _get_parquet_schema(self, dataview, section):
+        """
+        Returns the pyarrow schema of a section, columns are typed from the
+        survey's int, decimal and date questions and the select multiple
+        choices, the rest are strings.
+        """
+        types = [
+            self._get_parquet_type(element)
+            for element in section['elements']
+            if not dataview or element['title'] in dataview.columns] + [
+                self.PARQUET_EXTRA_FIELD_TYPES.get(column, pyarrow.string())
+                for column in self.extra_columns]
+        titles = self.get_fields(dataview, section, 'title')
+        labels = self.get_fields(dataview, section, 'label')
+
+        return pyarrow.schema([
+            pyarrow.field(title, parquet_type,
+                          metadata={'label': text(label)})
+            for (title, label, parquet_type) in zip(titles, labels, types)])
+
+    @classmethod
+    def _write_parquet_row_group(cls, parquet_def):
+        """
+        Writes the buffered rows of a section as a row group.
+        """
+        columns = parquet_def['columns']
+        if columns[0]:
+            schema = parquet_def['schema']
+            parquet_def['parquet_writer'].write_table(
+                pyarrow.Table.from_arrays(
+                    [pyarrow.array(column, type=field.type)
+                     for (column, field) in zip(columns, schema)],
+                    schema=schema))
+            parquet_def['columns'] = [[] for column in columns]
+
+    def to_parquet_zip(self, path, data, *args, **kwargs):
+        """
+        Writes a ZIP file with a Parquet file per section. Rows are buffered
+        per section and written in row groups of
+        EXPORT_PARQUET_ROW_GROUP_SIZE rows.
+        """
+        def write_row(row, parquet_def):
+            for (column, field, convert) in zip(
+                    parquet_def['columns'], parquet_def['fields'],
+                    parquet_def['converters']):
+                column.append(convert(row.get(field)))
+            if len(parquet_def['columns'][0]) >= row_group_size:
+                self._write_parquet_row_group(parquet_def)
+
+        dataview = kwargs.get('dataview')
+        total_records = kwargs.get('total_records')
+        row_group_size = getattr(
+            settings, 'EXPORT_PARQUET_ROW_GROUP_SIZE', 10000)
+        parquet_defs = {}
+
+        for section in self.sections:
+            schema = self._get_parquet_schema(dataview, section)
+            parquet_file = NamedTemporaryFile(suffix='.parquet')
+            parquet_defs[section['name']] = {
+                'parquet_file': parquet_file,
+                'parquet_writer': pq.ParquetWriter(parquet_file.name, schema),
+                'schema': schema,
+                'fields': self.get_fields(dataview, section, 'xpath'),
+                'converters': [
+                    get_parquet_converter(field.type) for field in schema],
+                'columns': [[] for field in schema]}
+
+        for (section, row) in self.get_section_rows(data, total_records):
+            write_row(row, parquet_defs[section['name']])
+
+        for (section_name, parquet_def) in iteritems(parquet_defs):
+            self._write_parquet_row_group(parquet_def)
+            parquet_def['parquet_writer'].close()
+
+        # write zipfile, parquet files are already compressed
+        with ZipFile(path, 'w', ZIP_STORED, allowZip64=True) as zip_file:
+            for (section_name, parquet_def) in iteritems(parquet_defs):
+                zip_file.write(
+                    parquet_def['parquet_file'].name,
+                    '_'.join(section_name.split('/')) + '.parquet')
+
+        # close files when we are done
+        for (section_name, parquet_def) in iteritems(parquet_defs):
+            parquet_def['parquet_file'].close()
+
     def get_fields(self, dataview, section, key):
         """
         Return list of element value with the key in section['elements'].
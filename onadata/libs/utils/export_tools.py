@@ -18,6 +18,7 @@ from django.contrib.auth.models import User
 from django.core.files.base import File
 from django.core.files.storage import default_storage
 from django.core.files.temp import NamedTemporaryFile
+from django.db.models import Max, Min
 from django.db.models.query import QuerySet
 from django.shortcuts import render
 from django.utils import timezone
@@ -36,7 +37,7 @@ from onadata.apps.viewer.models.export import (Export,
 from onadata.apps.viewer.models.parsed_instance import query_data
 from onadata.libs.exceptions import J2XException, NoRecordsFoundError
 from onadata.libs.utils.common_tags import (DATAVIEW_EXPORT,
-                                            GROUPNAME_REMOVED_FLAG)
+                                            GROUPNAME_REMOVED_FLAG, ID)
 from onadata.libs.utils.common_tools import (str_to_bool,
                                              cmp_to_key,
                                              report_exception,
@@ -53,6 +54,18 @@ DEFAULT_INDEX_TAGS = ('[', ']')
 SUPPORTED_INDEX_TAGS = ('[', ']', '(', ')', '{', '}', '.', '_')
 EXPORT_QUERY_KEY = 'query'
 MAX_RETRIES = 3
+# export type: (shard function, merge function, shard file extension)
+SHARDED_EXPORT_TYPES = {
+    Export.CSV_EXPORT: (
+        'to_flat_csv_shard', 'merge_flat_csv_shards', Export.CSV_EXPORT),
+    Export.CSV_ZIP_EXPORT: (
+        'to_zipped_csv_shard', 'merge_zipped_csv_shards', Export.ZIP_EXPORT),
+}
+# export type: function appending records to a copy of an export
+INCREMENTAL_EXPORT_TYPES = {
+    Export.CSV_EXPORT: 'append_flat_csv_export',
+    Export.CSV_ZIP_EXPORT: 'append_zipped_csv',
+}
 
 
 def md5hash(string):
@@ -122,7 +135,6 @@ def generate_export(export_type, xform, export_id=None, options=None):
     end = options.get("end")
     extension = options.get("extension", export_type)
     filter_query = options.get("query")
-    remove_group_name = options.get("remove_group_name", False)
     start = options.get("start")
 
     export_type_func_map = {
@@ -130,6 +142,7 @@ def generate_export(export_type, xform, export_id=None, options=None):
         Export.CSV_EXPORT: 'to_flat_csv_export',
         Export.CSV_ZIP_EXPORT: 'to_zipped_csv',
         Export.SAV_ZIP_EXPORT: 'to_zipped_sav',
+        Export.PARQUET_EXPORT: 'to_parquet_zip',
         Export.GOOGLE_SHEETS_EXPORT: 'to_google_sheets',
     }
 
@@ -137,11 +150,25 @@ def generate_export(export_type, xform, export_id=None, options=None):
         xform = XForm.objects.get(
             user__username__iexact=username, id_string__iexact=id_string)
 
+    watermark = None
+    if is_incremental_export(xform, export_type, options):
+        watermark = get_export_watermark(xform)
+        export = generate_incremental_export(
+            export_type, xform, export_id, watermark, options)
+        if export is not None:
+            return export
+
+        # rebuild with the submissions within the watermark only
+        if watermark['max_instance_id'] is not None:
+            filter_query = _get_id_range_query(
+                filter_query, last_id=watermark['max_instance_id'])
+
     dataview = None
     if options.get("dataview_pk"):
         dataview = DataView.objects.get(pk=options.get("dataview_pk"))
         records = dataview.query_data(dataview, all_data=True,
-                                      filter_query=filter_query)
+                                      filter_query=filter_query,
+                                      streaming=True)
         total_records = dataview.query_data(dataview,
                                             count=True)[0].get('count')
     else:
@@ -156,6 +183,45 @@ def generate_export(export_type, xform, export_id=None, options=None):
     if isinstance(records, QuerySet):
         records = records.iterator()
 
+    export_builder = get_export_builder(export_type, xform, options)
+
+    temp_file = NamedTemporaryFile(suffix=("." + extension))
+
+    columns_with_hxl = export_builder.INCLUDE_HXL and get_columns_with_hxl(
+        xform.survey_elements)
+
+    # get the export function by export type
+    func = getattr(export_builder, export_type_func_map[export_type])
+    try:
+        func.__call__(
+            temp_file.name, records, username, id_string, filter_query,
+            start=start, end=end, dataview=dataview, xform=xform,
+            options=options, columns_with_hxl=columns_with_hxl,
+            total_records=total_records
+        )
+    except NoRecordsFoundError:
+        pass
+    except SPSSIOError as e:
+        export = get_or_create_export(export_id, xform, export_type, options)
+        export.error_message = str(e)
+        export.internal_status = Export.FAILED
+        export.save()
+        report_exception("SAV Export Failure", e, sys.exc_info())
+        return export
+
+    return save_export_file(temp_file, xform, export_type, export_id,
+                            options, dataview=dataview,
+                            export_url=export_builder.url,
+                            watermark=watermark)
+
+
+def get_export_builder(export_type, xform, options):
+    """
+    Returns an ExportBuilder for the xform configured with the export
+    options.
+    """
+    remove_group_name = options.get("remove_group_name", False)
+
     export_builder = ExportBuilder()
     export_builder.TRUNCATE_GROUP_TITLE = True \
         if export_type == Export.SAV_ZIP_EXPORT else remove_group_name
@@ -197,29 +263,20 @@ def generate_export(export_type, xform, export_id=None, options=None):
     export_builder.set_survey(xform.survey, xform,
                               include_reviews=include_reviews)
 
-    temp_file = NamedTemporaryFile(suffix=("." + extension))
+    return export_builder
 
-    columns_with_hxl = export_builder.INCLUDE_HXL and get_columns_with_hxl(
-        xform.survey_elements)
 
-    # get the export function by export type
-    func = getattr(export_builder, export_type_func_map[export_type])
-    try:
-        func.__call__(
-            temp_file.name, records, username, id_string, filter_query,
-            start=start, end=end, dataview=dataview, xform=xform,
-            options=options, columns_with_hxl=columns_with_hxl,
-            total_records=total_records
-        )
-    except NoRecordsFoundError:
-        pass
-    except SPSSIOError as e:
-        export = get_or_create_export(export_id, xform, export_type, options)
-        export.error_message = str(e)
-        export.internal_status = Export.FAILED
-        export.save()
-        report_exception("SAV Export Failure", e, sys.exc_info())
-        return export
+def save_export_file(temp_file, xform, export_type, export_id, options,
+                     dataview=None, export_url=None, watermark=None):
+    """
+    Saves a generated export file to the storage and returns the export
+    object pointing to it, the watermark of the submissions in the export
+    is recorded on the export when given.
+    """
+    username = xform.user.username
+    id_string = xform.id_string
+    extension = options.get("extension", export_type)
+    remove_group_name = options.get("remove_group_name", False)
 
     # generate filename
     basename = "%s_%s" % (
@@ -261,14 +318,305 @@ def generate_export(export_type, xform, export_id=None, options=None):
     # do not persist exports that have a filter
     # Get URL of the exported sheet.
     if export_type == Export.GOOGLE_SHEETS_EXPORT:
-        export.export_url = export_builder.url
+        export.export_url = export_url
+    if watermark is not None:
+        for (key, value) in iteritems(watermark):
+            setattr(export, key, value)
 
     # if we should create a new export is true, we should not save it
-    if start is None and end is None:
+    if options.get("start") is None and options.get("end") is None:
         export.save()
     return export
 
 
+def _get_id_range_query(filter_query, first_id=None, last_id=None):
+    """
+    Returns the filter query restricted to the records with ids from
+    first_id to last_id.
+
+    Raises ValueError if the filter query cannot be restricted, e.g. it is a
+    free text query or already filters on the _id.
+    """
+    query = filter_query or {}
+    if isinstance(query, six.string_types):
+        query = json.loads(query)
+    if not isinstance(query, dict) or ID in query:
+        raise ValueError(_("Cannot restrict query %s to an id range.")
+                         % filter_query)
+
+    id_range = {}
+    if first_id is not None:
+        id_range['$gte'] = first_id
+    if last_id is not None:
+        id_range['$lte'] = last_id
+    query = dict(query)
+    query[ID] = id_range
+
+    return json.dumps(query)
+
+
+def is_incremental_export(xform, export_type, options):
+    """
+    Returns True if the export is generated incrementally, i.e.
+    EXPORT_INCREMENTAL_ENABLED is set and the export is an unfiltered CSV or
+    CSV zip export.
+    """
+    return getattr(settings, 'EXPORT_INCREMENTAL_ENABLED', False) and \
+        export_type in INCREMENTAL_EXPORT_TYPES and \
+        not xform.is_merged_dataset and not options.get("query") and \
+        not options.get("dataview_pk") and \
+        options.get("start") is None and options.get("end") is None
+
+
+def get_export_watermark(xform):
+    """
+    Returns the export watermark fields of the xform's submissions, the max
+    id and date_modified of the submissions, deleted submissions included,
+    and the form version.
+    """
+    watermark = Instance.objects.filter(xform=xform).aggregate(
+        max_instance_id=Max('id'), max_date_modified=Max('date_modified'))
+    watermark['xform_version'] = xform.version
+
+    return watermark
+
+
+def get_incremental_export_base(xform, export_type, options,
+                                export_options=None):
+    """
+    Returns the newest successful export with the same options that the
+    submissions after its watermark can be appended to, None if the export
+    has to be rebuilt.
+
+    An export cannot be appended to if the form version has changed or
+    submissions within its watermark have been edited or deleted since.
+    """
+    if not is_incremental_export(xform, export_type, options):
+        return None
+
+    if export_options is None:
+        export_options = get_export_options(options)
+    exports = Export.objects.filter(
+        xform=xform, export_type=export_type,
+        internal_status=Export.SUCCESSFUL, filename__isnull=False,
+        max_instance_id__isnull=False, max_date_modified__isnull=False,
+        xform_version=xform.version).order_by('-created_on')
+    base_export = next(
+        (export for export in exports if export.options == export_options),
+        None)
+
+    if base_export is None or \
+            not default_storage.exists(base_export.filepath):
+        return None
+
+    if xform.instances.filter(
+            id__lte=base_export.max_instance_id,
+            date_modified__gt=base_export.max_date_modified).exists():
+        return None
+
+    return base_export
+
+
+def generate_incremental_export(export_type, xform, export_id, watermark,
+                                options):
+    """
+    Appends the submissions between the watermark of the base export, see
+    get_incremental_export_base(), and watermark to a copy of the base
+    export file.
+
+    Returns the export, None if there is no base export or the submissions
+    cannot be appended and the export has to be rebuilt.
+    """
+    export_options = get_or_create_export(
+        export_id, xform, export_type, options).options
+    base_export = get_incremental_export_base(
+        xform, export_type, options, export_options)
+    if base_export is None or watermark['max_instance_id'] is None:
+        return None
+
+    username = xform.user.username
+    id_string = xform.id_string
+    extension = options.get("extension", export_type)
+    filter_query = _get_id_range_query(
+        None, base_export.max_instance_id + 1, watermark['max_instance_id'])
+    records = query_data(xform, query=filter_query)
+    if isinstance(records, QuerySet):
+        records = records.iterator()
+
+    export_builder = get_export_builder(export_type, xform, options)
+    columns_with_hxl = export_builder.INCLUDE_HXL and get_columns_with_hxl(
+        xform.survey_elements)
+    temp_file = NamedTemporaryFile(suffix=("." + extension))
+
+    func = getattr(export_builder, INCREMENTAL_EXPORT_TYPES[export_type])
+    with default_storage.open(base_export.filepath) as base_file:
+        base_records = func(
+            temp_file.name, records, username, id_string, filter_query,
+            base_file=base_file, xform=xform, options=options,
+            columns_with_hxl=columns_with_hxl,
+            total_records=xform.num_of_submissions)
+
+    # submissions removed without changing date_modified, e.g. a bulk update
+    # or a hard delete, are only noticed from the record count
+    if base_records is None or base_records != xform.instances.filter(
+            id__lte=base_export.max_instance_id,
+            deleted_at__isnull=True).count():
+        temp_file.close()
+        return None
+
+    return save_export_file(temp_file, xform, export_type, export_id,
+                            options, watermark=watermark)
+
+
+def get_export_shards(xform, export_type, options, max_instance_id=None):
+    """
+    Returns the (first_id, last_id) instance id ranges of the
+    EXPORT_SHARD_COUNT shards an export is split into, an empty list when
+    the export should be generated in a single task. The ranges end at
+    max_instance_id if given.
+
+    Only CSV and CSV zip exports of forms with at least
+    EXPORT_SHARD_MIN_RECORDS submissions are sharded.
+    """
+    shard_count = getattr(settings, 'EXPORT_SHARD_COUNT', 4)
+    min_records = getattr(settings, 'EXPORT_SHARD_MIN_RECORDS', 100000)
+    if shard_count < 2 or export_type not in SHARDED_EXPORT_TYPES or \
+            options.get("dataview_pk") or xform.is_merged_dataset or \
+            xform.num_of_submissions < min_records:
+        return []
+
+    try:
+        _get_id_range_query(options.get("query"))
+    except ValueError:
+        return []
+
+    instances = xform.instances.filter(deleted_at__isnull=True)
+    if max_instance_id is not None:
+        instances = instances.filter(id__lte=max_instance_id)
+    id_range = instances.aggregate(first_id=Min('id'), last_id=Max('id'))
+    first_id, last_id = id_range['first_id'], id_range['last_id']
+    if first_id is None:
+        return []
+
+    size = -(-(last_id - first_id + 1) // shard_count)
+
+    return [(start_id, min(start_id + size - 1, last_id))
+            for start_id in range(first_id, last_id + 1, size)]
+
+
+def _get_shard_file_path(xform, export_type, export_id, filename):
+    return os.path.join(
+        xform.user.username,
+        'exports',
+        xform.id_string,
+        export_type,
+        'shards',
+        builtins.str(export_id),
+        filename)
+
+
+def get_export_total_records(xform, options):
+    """
+    Returns the number of records of an export with the given options.
+    """
+    filter_query = options.get("query")
+    if filter_query:
+        return query_data(xform, query=filter_query,
+                          start=options.get("start"), end=options.get("end"),
+                          count=True)[0].get('count')
+
+    return xform.num_of_submissions
+
+
+def delete_export_shards(xform, export_type, export_id):
+    """
+    Deletes the shard files of a sharded export, e.g. the shards generated
+    before another shard of the export failed.
+    """
+    shards_path = _get_shard_file_path(xform, export_type, export_id, '')
+    try:
+        _dirs, filenames = default_storage.listdir(shards_path)
+    except (IOError, OSError):
+        # no shard was saved
+        return
+    for filename in filenames:
+        default_storage.delete(os.path.join(shards_path, filename))
+
+
+def generate_export_shard(export_type, xform, export_id, first_id, last_id,
+                          options):
+    """
+    Generates the shard of a sharded export with the records with ids from
+    first_id to last_id and returns the storage name of the shard file.
+    """
+    username = xform.user.username
+    id_string = xform.id_string
+    start = options.get("start")
+    end = options.get("end")
+    func_name, _merge_func_name, extension = SHARDED_EXPORT_TYPES[export_type]
+    filter_query = _get_id_range_query(
+        options.get("query"), first_id, last_id)
+
+    records = query_data(xform, query=filter_query, start=start, end=end)
+    if isinstance(records, QuerySet):
+        records = records.iterator()
+
+    export_builder = get_export_builder(export_type, xform, options)
+    temp_file = NamedTemporaryFile(suffix=("." + extension))
+
+    func = getattr(export_builder, func_name)
+    func(temp_file.name, records, username, id_string, filter_query,
+         start=start, end=end, xform=xform, options=options)
+
+    file_path = _get_shard_file_path(
+        xform, export_type, export_id,
+        "{}-{}.{}".format(first_id, last_id, extension))
+    temp_file.seek(0)
+    shard_filename = default_storage.save(file_path,
+                                          File(temp_file, file_path))
+    temp_file.close()
+
+    return shard_filename
+
+
+def merge_export_shards(export_type, xform, shard_filenames, export_id,
+                        options):
+    """
+    Merges the shard files of a sharded export, in the order given, into
+    the export file, deletes the shard files and returns the export.
+    """
+    username = xform.user.username
+    id_string = xform.id_string
+    filter_query = options.get("query")
+    start = options.get("start")
+    end = options.get("end")
+    extension = options.get("extension", export_type)
+    _func_name, func_name, _extension = SHARDED_EXPORT_TYPES[export_type]
+
+    total_records = get_export_total_records(xform, options)
+
+    export_builder = get_export_builder(export_type, xform, options)
+    columns_with_hxl = export_builder.INCLUDE_HXL and get_columns_with_hxl(
+        xform.survey_elements)
+    temp_file = NamedTemporaryFile(suffix=("." + extension))
+
+    shard_files = [default_storage.open(shard_filename)
+                   for shard_filename in shard_filenames]
+    try:
+        func = getattr(export_builder, func_name)
+        func(temp_file.name, shard_files, username, id_string, filter_query,
+             start=start, end=end, xform=xform, options=options,
+             columns_with_hxl=columns_with_hxl, total_records=total_records)
+    finally:
+        for shard_file in shard_files:
+            shard_file.close()
+        for shard_filename in shard_filenames:
+            default_storage.delete(shard_filename)
+
+    return save_export_file(temp_file, xform, export_type, export_id,
+                            options)
+
+
 def create_export_object(xform, export_type, options):
     """
     Return an export object that has not been saved to the database.
@@ -414,7 +762,8 @@ def generate_attachments_zip_export(export_type, username, id_string,
             instance_id__in=[
                 rec.get('_id')
                 for rec in dataview.query_data(
-                    dataview, all_data=True, filter_query=filter_query)],
+                    dataview, all_data=True, filter_query=filter_query,
+                    streaming=True)],
             instance__deleted_at__isnull=True)
     else:
         instance_ids = query_data(xform, fields='["_id"]', query=filter_query)
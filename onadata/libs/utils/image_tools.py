@@ -1,4 +1,4 @@
-from tempfile import NamedTemporaryFile
+from io import BytesIO
 
 from PIL import Image
 from django.conf import settings
@@ -33,10 +33,14 @@ def get_dimensions(size, longest_side):
     return flat(width, height)
 
 
-def _save_thumbnails(image, path, size, suffix, extension):
-    nm = NamedTemporaryFile(suffix='.%s' % extension)
-    default_storage = get_storage_class()()
+def _get_draft_size(size, longest_side):
+    """Return the size of ``size`` scaled so its longest side fits."""
+    ratio = float(longest_side) / max(size)
+
+    return flat(*(n * ratio for n in size))
 
+
+def _save_thumbnail(image, storage, path, size, suffix, image_format):
     try:
         # Ensure conversion to float in operations
         image.thumbnail(
@@ -44,43 +48,50 @@ def _save_thumbnails(image, path, size, suffix, extension):
     except ZeroDivisionError:
         pass
 
-    image.save(nm.name)
-    default_storage.save(
-        get_path(path, suffix), ContentFile(nm.read()))
-    nm.close()
+    thumbnail = BytesIO()
+    image.save(thumbnail, format=image_format)
+    thumbnail_path = get_path(path, suffix)
+    if storage.exists(thumbnail_path):
+        storage.delete(thumbnail_path)
+    storage.save(thumbnail_path, ContentFile(thumbnail.getvalue()))
 
 
 def resize(filename, extension):
+    """
+    Create the THUMB_CONF thumbnails of the image ``filename``.
+
+    The image is decoded once and each thumbnail, in THUMB_ORDER from the
+    largest to the smallest, is resized from the previous one and written
+    to storage from memory. Returns the THUMB_CONF keys created.
+    """
     if extension == 'non':
         extension = settings.DEFAULT_IMG_FILE_TYPE
     default_storage = get_storage_class()()
+    conf = settings.THUMB_CONF
 
     try:
         with default_storage.open(filename) as image_file:
             image = Image.open(image_file)
-            conf = settings.THUMB_CONF
-
-            for key in settings.THUMB_ORDER:
-                _save_thumbnails(
-                    image, filename,
-                    conf[key]['size'],
-                    conf[key]['suffix'],
-                    extension)
+            # let the JPEG decoder scale down to the largest thumbnail
+            image.draft(image.mode, _get_draft_size(
+                image.size, conf[settings.THUMB_ORDER[0]]['size']))
+            image.load()
+
+        image_format = Image.registered_extensions().get(
+            '.%s' % extension.lower(), image.format)
+        if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+
+        for key in settings.THUMB_ORDER:
+            _save_thumbnail(
+                image, default_storage, filename,
+                conf[key]['size'],
+                conf[key]['suffix'],
+                image_format)
     except IOError:
         raise Exception("The image file couldn't be identified")
 
-
-def resize_local_env(filename, extension):
-    if extension == 'non':
-        extension = settings.DEFAULT_IMG_FILE_TYPE
-    default_storage = get_storage_class()()
-    path = default_storage.path(filename)
-    image = Image.open(path)
-    conf = settings.THUMB_CONF
-
-    [_save_thumbnails(
-        image, path, conf[key]['size'],
-        conf[key]['suffix'], extension) for key in settings.THUMB_ORDER]
+    return list(settings.THUMB_ORDER)
 
 
 def image_url(attachment, suffix):
@@ -91,28 +102,18 @@ def image_url(attachment, suffix):
 
     if suffix == 'original':
         return url
-    else:
+    elif suffix in settings.THUMB_CONF:
+        filename = attachment.media_file.name
         default_storage = get_storage_class()()
-        fs = get_storage_class('django.core.files.storage.FileSystemStorage')()
-
-        if suffix in settings.THUMB_CONF:
-            size = settings.THUMB_CONF[suffix]['suffix']
-            filename = attachment.media_file.name
-
-            if default_storage.exists(filename):
-                if default_storage.exists(get_path(filename, size)) and\
-                        default_storage.size(get_path(filename, size)) > 0:
-                    url = default_storage.url(
-                        get_path(filename, size))
-                else:
-                    if default_storage.__class__ != fs.__class__:
-                        resize(filename, extension=attachment.extension)
-                    else:
-                        resize_local_env(filename,
-                                         extension=attachment.extension)
-
-                    return image_url(attachment, suffix)
-            else:
+
+        if suffix not in attachment.thumbnails:
+            # the thumbnails were not created when the attachment was saved
+            if not default_storage.exists(filename):
                 return None
+            attachment.create_thumbnails()
+
+        if suffix in attachment.thumbnails:
+            url = default_storage.url(
+                get_path(filename, settings.THUMB_CONF[suffix]['suffix']))
 
     return url
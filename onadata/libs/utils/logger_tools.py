@@ -9,6 +9,7 @@ from http.client import BadStatusLine
 from typing import NoReturn
 from wsgiref.util import FileWrapper
 from xml.dom import Node
+from xml.sax.saxutils import quoteattr
 import xml.etree.ElementTree as ET
 from xml.parsers.expat import ExpatError
 
@@ -25,7 +26,7 @@ from django.http import (HttpResponse, HttpResponseNotFound,
                          StreamingHttpResponse, UnreadablePostError)
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from django.utils.encoding import DjangoUnicodeDecodeError
+from django.utils.encoding import DjangoUnicodeDecodeError, smart_text
 from django.utils.translation import ugettext as _
 from modilabs.utils.subprocess_timeout import ProcessTimedOut
 from multidb.pinning import use_master
@@ -38,10 +39,12 @@ from onadata.apps.logger.models.instance import (
     get_id_string_from_xml_str)
 from onadata.apps.logger.models.xform import XLSFormError
 from onadata.apps.logger.xform_instance_parser import (
-  DuplicateInstance, InstanceEmptyError, InstanceInvalidUserError,
-  InstanceMultipleNodeError, InstanceEncryptionError, NonUniqueFormIdError,
-  InstanceFormatError, clean_and_parse_xml, get_deprecated_uuid_from_xml,
-  get_submission_date_from_xml, get_uuid_from_xml)
+  DuplicateInstance, FailedValidation, InstanceEmptyError,
+  InstanceInvalidUserError, InstanceMultipleNodeError,
+  InstanceEncryptionError, NonUniqueFormIdError, InstanceFormatError,
+  SubmissionContext, clean_and_parse_xml,
+  get_deprecated_uuid_from_xml, get_submission_date_from_xml,
+  get_uuid_from_xml)
 
 from onadata.apps.messaging.constants import XFORM, \
     SUBMISSION_EDITED, SUBMISSION_CREATED
@@ -55,7 +58,8 @@ from onadata.libs.utils.common_tools import report_exception, get_uuid
 from onadata.libs.utils.model_tools import set_uuid
 from onadata.libs.utils.user_auth import get_user_default_project
 
-from onadata.libs.utils.validate_data import validate_data
+from onadata.libs.utils.validate_data import (validate_data,
+                                              validate_submission)
 
 OPEN_ROSA_VERSION_HEADER = 'X-OpenRosa-Version'
 HTTP_OPEN_ROSA_VERSION_HEADER = 'HTTP_X_OPENROSA_VERSION'
@@ -71,12 +75,13 @@ uuid_regex = re.compile(r'<formhub>\s*<uuid>\s*([^<]+)\s*</uuid>\s*</formhub>',
 
 
 def _get_instance(xml, new_uuid, submitted_by, status, xform, checksum,
-                  request=None):
+                  request=None, submission_context=None):
     history = None
     instance = None
     message_verb = SUBMISSION_EDITED
     # check if its an edit submission
-    old_uuid = get_deprecated_uuid_from_xml(xml)
+    old_uuid = submission_context.deprecated_uuid if submission_context \
+        else get_deprecated_uuid_from_xml(xml)
     if old_uuid:
         instance = Instance.objects.filter(uuid=old_uuid,
                                            xform_id=xform.pk).first()
@@ -101,6 +106,8 @@ def _get_instance(xml, new_uuid, submitted_by, status, xform, checksum,
             instance.last_edited = last_edited
             instance.uuid = new_uuid
             instance.checksum = checksum
+            if submission_context:
+                instance.set_submission_context(submission_context)
             instance.save()
 
             # call webhooks
@@ -111,9 +118,12 @@ def _get_instance(xml, new_uuid, submitted_by, status, xform, checksum,
     if old_uuid is None or (instance is None and history is None):
         # new submission
         message_verb = SUBMISSION_CREATED
-        instance = Instance.objects.create(
+        instance = Instance(
             xml=xml, user=submitted_by, status=status, xform=xform,
             checksum=checksum)
+        if submission_context:
+            instance.set_submission_context(submission_context)
+        instance.save(force_insert=True)
 
     # send notification on submission creation
     send_message(
@@ -183,7 +193,7 @@ def get_uuid_from_submission(xml):
 
 
 def get_xform_from_submission(
-        xml, username, uuid=None, request=None):
+        xml, username, uuid=None, request=None, submission_context=None):
     """Gets the submissions target XForm.
 
     Retrieves the target XForm by either utilizing the `uuid` param
@@ -196,6 +206,8 @@ def get_xform_from_submission(
     :param (str) uuid: The target XForms universally unique identifier.
     Default: None
     :param (django.http.request) request: Request object. Default: None
+    :param (SubmissionContext) submission_context: The parsed submission.
+    Default: None
     """
     uuid = uuid or get_uuid_from_submission(xml)
 
@@ -224,7 +236,8 @@ def get_xform_from_submission(
             else:
                 return xform
 
-    id_string = get_id_string_from_xml_str(xml)
+    id_string = submission_context.id_string if submission_context \
+        else get_id_string_from_xml_str(xml)
     try:
         return get_object_or_404(
                 XForm,
@@ -358,12 +371,14 @@ def save_attachments(xform, instance, media_files, remove_deleted_media=False):
 
 
 def save_submission(xform, xml, media_files, new_uuid, submitted_by, status,
-                    date_created_override, checksum, request=None):
+                    date_created_override, checksum, request=None,
+                    submission_context=None):
     if not date_created_override:
-        date_created_override = get_submission_date_from_xml(xml)
+        date_created_override = submission_context.submission_date \
+            if submission_context else get_submission_date_from_xml(xml)
 
     instance = _get_instance(xml, new_uuid, submitted_by, status, xform,
-                             checksum, request)
+                             checksum, request, submission_context)
     save_attachments(
         xform,
         instance,
@@ -378,11 +393,14 @@ def save_submission(xform, xml, media_files, new_uuid, submitted_by, status,
                 date_created_override, timezone.utc)
         instance.date_created = date_created_override
         instance.save()
+    elif not submission_context and instance.xform is not None:
+        instance.save()
 
+    # save_attachments has saved the full json of the submission
     if instance.xform is not None:
-        instance.save()
         pi, created = ParsedInstance.objects.get_or_create(instance=instance)
         if not created:
+            pi.instance = instance
             pi.save()  # noqa
 
     return instance
@@ -418,20 +436,21 @@ def create_instance(username,
         username = username.lower()
 
     xml = xml_file.read()
+    # the submission is parsed once, for all the values read from its xml
+    submission_context = SubmissionContext(xml)
 
-    # print('x'*80)
-    # print(validate_data(xml))    
-    if validate_data(xml):
-        pass
-    else:
+    validate_async = getattr(settings, 'SUBMISSION_VALIDATION_ASYNC', False)
+    if not validate_async and not validate_data(submission_context.to_dict()):
         raise FailedValidation()
 
-    xform = get_xform_from_submission(xml, username, uuid, request=request)
+    xform = get_xform_from_submission(
+        xml, username, uuid, request=request,
+        submission_context=submission_context)
     check_submission_permissions(request, xform)
     check_submission_encryption(xform, xml)
     checksum = sha256(xml).hexdigest()
 
-    new_uuid = get_uuid_from_xml(xml)
+    new_uuid = submission_context.uuid
     filtered_instances = get_filtered_instances(
         Q(checksum=checksum) | Q(uuid=new_uuid), xform_id=xform.pk)
     existing_instance = get_first_record(filtered_instances.only('id'))
@@ -478,7 +497,11 @@ def create_instance(username,
             instance = save_submission(xform, xml, media_files, new_uuid,
                                        submitted_by, status,
                                        date_created_override, checksum,
-                                       request)
+                                       request, submission_context)
+            if validate_async:
+                transaction.on_commit(
+                    lambda: validate_submission.apply_async(
+                        args=[instance.pk]))
     except IntegrityError:
         instance = get_first_record(Instance.objects.filter(
             Q(checksum=checksum) | Q(uuid=new_uuid),
@@ -812,6 +835,74 @@ def inject_instanceid(xml_str, uuid):
     return xml_str
 
 
+# the start tag of the root node of a submission, attribute values may
+# contain '>' and '/'
+ROOT_START_TAG_RE = re.compile(
+    r'<(?P<name>[^\s/>!?]+)'
+    r'(?P<attributes>(?:\s+[^\s=/>]+\s*=\s*(?:"[^"]*"|\'[^\']*\'))*)'
+    r'\s*(?P<end>/?>)')
+
+
+def set_root_node_attributes(xml_str, attributes):
+    """
+    Returns the cleaned submission xml_str, without the XML declaration,
+    with the (name, value) attributes set on its root node.
+
+    The attributes are spliced into the start tag of the root node, the
+    document is only parsed when that tag cannot be found in the text.
+    """
+    clean_xml_str = re.sub(r">\s+<", u"><", smart_text(xml_str.strip()))
+    match = ROOT_START_TAG_RE.search(clean_xml_str)
+
+    if match is None or '<!' in clean_xml_str[:match.start()]:
+        root_node = clean_and_parse_xml(xml_str).documentElement
+        for name, value in attributes:
+            root_node.setAttribute(name, value)
+
+        return root_node.toxml()
+
+    # drop the attributes that are being replaced
+    existing = re.sub(
+        r'\s+(?:%s)\s*=\s*(?:"[^"]*"|\'[^\']*\')' %
+        u'|'.join(re.escape(name) for name, __ in attributes),
+        u'', match.group('attributes'))
+    added = u''.join(
+        u' %s=%s' % (name, quoteattr(value)) for name, value in attributes)
+
+    return u'<%s%s%s%s%s' % (
+        match.group('name'), existing, added, match.group('end'),
+        clean_xml_str[match.end():])
+
+
+def get_submission_xml(instance):
+    """
+    Returns the submission XML of a Briefcase downloadSubmission response.
+    """
+    return set_root_node_attributes(instance.xml, (
+        ('instanceID', u'uuid:%s' % instance.uuid),
+        ('submissionDate', instance.date_created.isoformat())))
+
+
+def get_submission_list_page(instances, cursor, num_entries):
+    """
+    Returns the uuids of a Briefcase submissionList page, after the cursor
+    instance pk, and the resumption cursor, in one query.
+    """
+    if cursor:
+        instances = instances.filter(pk__gt=cursor)
+    instances = instances.order_by('pk').values('pk', 'uuid')
+    if num_entries:
+        instances = instances[:num_entries]
+    instances = list(instances)
+
+    if instances:
+        resumption_cursor = instances[-1]['pk']
+    else:
+        resumption_cursor = cursor or 0
+
+    return instances, resumption_cursor
+
+
 def remove_xform(xform):
     # delete xform, and all related models
     xform.delete()
@@ -2,6 +2,9 @@
 """
 Model utility functions.
 """
+from django.conf import settings
+from django.db import connection
+
 from onadata.libs.utils.common_tools import get_uuid
 
 
@@ -28,6 +31,30 @@ def queryset_iterator(queryset, chunksize=100):
     return queryset.iterator(chunk_size=chunksize)
 
 
+def chunked_query_iterator(sql, params=None, itersize=None):
+    """
+    Iterate over the rows of a raw SQL query.
+
+    The query runs on a named server-side cursor and rows are fetched
+    itersize (default: PARSED_INSTANCE_DEFAULT_BATCHSIZE) at a time, so
+    memory use does not grow with the size of the result set. Django falls
+    back to a client-side cursor when DISABLE_SERVER_SIDE_CURSORS is set on
+    the database.
+    """
+    itersize = itersize or getattr(
+        settings, 'PARSED_INSTANCE_DEFAULT_BATCHSIZE', 1000)
+    cursor = connection.chunked_cursor()
+    try:
+        cursor.execute(sql, params)
+        rows = cursor.fetchmany(itersize)
+        while rows:
+            for row in rows:
+                yield row
+            rows = cursor.fetchmany(itersize)
+    finally:
+        cursor.close()
+
+
 def get_columns_with_hxl(survey_elements):
     '''
     Returns a dictionary whose keys are xform field names and values are
@@ -1,32 +1,70 @@
-import hotshot
+import cProfile
 import os
+import tempfile
 import time
+
 from django.conf import settings
-import tempfile
 
-if hasattr(settings, 'PROFILE_LOG_BASE'):
-    PROFILE_LOG_BASE = settings.PROFILE_LOG_BASE
-else:
-    PROFILE_LOG_BASE = tempfile.gettempdir()
+
+def get_profile_log_file(log_file):
+    """
+    Returns the path of a profile log file. If it's a relative path, it is
+    placed under PROFILE_LOG_BASE. A time stamp is inserted into the file
+    name, such that 'my_view.prof' become 'my_view-20100211T170321.prof',
+    where the time stamp is in UTC. This makes it easy to run and compare
+    multiple trials.
+    """
+    if not os.path.isabs(log_file):
+        log_file = os.path.join(
+            getattr(settings, 'PROFILE_LOG_BASE', tempfile.gettempdir()),
+            log_file)
+    (base, ext) = os.path.splitext(log_file)
+    base = base + "-" + time.strftime("%Y%m%dT%H%M%S", time.gmtime())
+
+    return base + ext
+
+
+def run_profiled(log_file, func, *args, **kwargs):
+    """
+    Calls func profiling it and dumps the profile data to log_file.
+
+    cProfile is used, unless INSTRUMENTATION_PROFILER is 'pyinstrument' and
+    pyinstrument is installed in which case an HTML report is written.
+    """
+    if getattr(settings, 'INSTRUMENTATION_PROFILER', 'cprofile') == \
+            'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            pass
+        else:
+            profiler = Profiler()
+            profiler.start()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.stop()
+                with open(os.path.splitext(log_file)[0] + '.html',
+                          'w') as report:
+                    report.write(profiler.output_html())
+
+    prof = cProfile.Profile()
+    try:
+        return prof.runcall(func, *args, **kwargs)
+    finally:
+        prof.dump_stats(log_file)
 
 
 def profile(log_file):
     """Profile some callable.
 
-    This decorator uses the hotshot profiler to profile some callable (like
+    This decorator uses the cProfile profiler to profile some callable (like
     a view function or method) and dumps the profile data somewhere sensible
     for later processing and examination.
 
-    It takes one argument, the profile log name. If it's a relative path,
-    it places it under the PROFILE_LOG_BASE. It also inserts a time stamp
-    into the file name, such that 'my_view.prof' become
-    'my_view-20100211T170321.prof', where the time stamp is in UTC. This
-    makes it easy to run and compare multiple trials.
+    It takes one argument, the profile log name, see get_profile_log_file.
     """
 
-    if not os.path.isabs(log_file):
-        log_file = os.path.join(PROFILE_LOG_BASE, log_file)
-
     def _outer(f):
         if not settings.PROFILE_API_ACTION_FUNCTION:
             return f
@@ -34,16 +72,8 @@ def profile(log_file):
         def _inner(*args, **kwargs):
             # Add a timestamp to the profile output when the callable
             # is actually called.
-            (base, ext) = os.path.splitext(log_file)
-            base = base + "-" + time.strftime("%Y%m%dT%H%M%S", time.gmtime())
-            final_log_file = base + ext
-
-            prof = hotshot.Profile(final_log_file)
-            try:
-                ret = prof.runcall(f, *args, **kwargs)
-            finally:
-                prof.close()
-            return ret
+            return run_profiled(get_profile_log_file(log_file), f, *args,
+                                **kwargs)
 
         return _inner
     return _outer
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Process wide cache of the pyxform surveys of forms.
+
+Building a form's Survey from its json, and walking all of its elements to
+find the ones of a type, is repeated by every request and task that loads
+the form. The built survey and indexes of its elements are kept in a
+bounded least recently used cache keyed by the form's id and the digests of
+its xml and json, so that a changed form is never served a stale survey.
+"""
+import threading
+from collections import OrderedDict, defaultdict
+from hashlib import md5
+
+from django.conf import settings
+
+
+class SurveyIndex(object):
+    """
+    A form's survey and the indexes of its elements.
+    """
+
+    def __init__(self, survey):
+        self.survey = survey
+        self.elements = list(survey.iter_descendants())
+        self.elements_by_xpath = {}
+        self.elements_by_type = defaultdict(list)
+        self.xpaths_by_type = defaultdict(list)
+        self.geopoint_xpaths = []
+        self.xpaths = []
+
+        for element in self.elements:
+            xpath = element.get_abbreviated_xpath()
+            self.xpaths.append(xpath)
+            self.elements_by_xpath[xpath] = element
+            self.elements_by_type[element.type].append(element)
+            self.xpaths_by_type[element.type].append(xpath)
+            if element.bind.get(u'type') == u'geopoint':
+                self.geopoint_xpaths.append(xpath)
+
+
+class SurveyCache(object):
+    """
+    A thread safe, bounded, least recently used cache of SurveyIndex objects.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, build_survey):
+        """
+        Returns the SurveyIndex of a key, building it with build_survey() on
+        a miss.
+        """
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes.move_to_end(key)
+                return index
+
+        # the survey is built outside the lock, a concurrent miss on the
+        # same key builds it twice
+        index = SurveyIndex(build_survey())
+        with self._lock:
+            self._indexes[key] = index
+            self._indexes.move_to_end(key)
+            while len(self._indexes) > self.max_size:
+                self._indexes.popitem(last=False)
+
+        return index
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+
+    def __len__(self):
+        return len(self._indexes)
+
+
+survey_cache = SurveyCache(getattr(settings, 'XFORM_SURVEY_CACHE_SIZE', 128))
+
+
+def get_survey_cache_key(xform):
+    """
+    Returns the survey cache key of a saved form.
+    """
+    return (xform.pk, xform.hash,
+            md5(xform.json.encode('utf-8')).hexdigest())
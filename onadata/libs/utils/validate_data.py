@@ -1,61 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+Submission validation.
+
+validate_data runs the validators listed in the SUBMISSION_VALIDATORS
+setting, dotted paths to functions that take a submission's data dict and
+return False when the submission is invalid. The default validator checks the
+insect scientific names of a submission against GBIF, or against a local
+taxonomy snapshot when GBIF_TAXONOMY_SNAPSHOT is set.
+
+With SUBMISSION_VALIDATION_ASYNC set submissions are accepted without being
+validated and the validate_submission task marks the ones that fail.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
 import xmltodict
-import json
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+
+from onadata.apps.logger.models import Instance
+from onadata.apps.logger.xform_instance_parser import SubmissionContext
+from onadata.celery import app
+from onadata.libs.utils.cache_tools import safe_key
+
+DEFAULT_SUBMISSION_VALIDATORS = (
+    'onadata.libs.utils.validate_data.validate_insect_names',
+)
+GBIF_OCCURRENCE_SEARCH_URL = "https://api.gbif.org/v1/occurrence/search"
+GBIF_NAME_CACHE = 'gbif-name-'
+FAILED_VALIDATION_STATUS = 'failed_validation'
+
+_taxonomy_snapshots = {}
+
+
+def _get_taxonomy_snapshot():
+    """
+    Returns the set of species names in the GBIF_TAXONOMY_SNAPSHOT file, one
+    name per line, or None when no snapshot is set.
+    """
+    path = getattr(settings, 'GBIF_TAXONOMY_SNAPSHOT', None)
+    if not path:
+        return None
+
+    if path not in _taxonomy_snapshots:
+        with open(path, encoding='utf-8') as snapshot:
+            _taxonomy_snapshots[path] = set(
+                line.strip() for line in snapshot if line.strip())
+
+    return _taxonomy_snapshots[path]
 
 
 def check_gbif_data(name):
     '''check whether a name exists in gbif database'''
+    url = getattr(settings, 'GBIF_OCCURRENCE_SEARCH_URL',
+                  GBIF_OCCURRENCE_SEARCH_URL)
+    response = requests.get(url, params={"scientificName": name},
+                            timeout=getattr(settings, 'GBIF_API_TIMEOUT', 5))
+    response.raise_for_status()
+
+    return set(result.get('species')
+               for result in response.json().get('results', [])
+               if result.get('species'))
+
+
+def _lookup_gbif_name(name):
+    """
+    Returns whether GBIF has a species of the name, None when GBIF could not
+    be reached.
+    """
+    try:
+        return name in check_gbif_data(name)
+    except (requests.RequestException, ValueError) as e:
+        logging.warning("GBIF lookup of %s failed: %s", name, e)
+        return None
 
-    url = "https://api.gbif.org/v1/occurrence/search"
-    querystring = {"scientificName": "{}".format(name)}
-    payload = ""
-    response = requests.request("GET", url, data=payload, params=querystring)
 
-    occurences = response.json()
+def get_known_species_names(names):
+    """
+    Returns the names that are known species.
 
-    occurence_list = set([name['species'] for name in occurences['results']])
+    Names are looked up in the taxonomy snapshot when one is set, otherwise
+    on GBIF with the results cached for GBIF_NAME_CACHE_TTL seconds. Names
+    GBIF could not be asked about are treated as known and are not cached.
+    """
+    names = set(names)
+    snapshot = _get_taxonomy_snapshot()
+    if snapshot is not None:
+        return names & snapshot
 
-    return occurence_list
+    keys = dict((GBIF_NAME_CACHE + safe_key(name), name) for name in names)
+    cached = cache.get_many(list(keys))
+    known = set(keys[key] for key, found in cached.items() if found)
+    missing = [name for key, name in keys.items() if key not in cached]
+    if not missing:
+        return known
+
+    with ThreadPoolExecutor(
+            max_workers=min(len(missing),
+                            getattr(settings, 'GBIF_API_WORKERS', 4))) as pool:
+        results = list(pool.map(_lookup_gbif_name, missing))
+
+    to_cache = {}
+    for name, found in zip(missing, results):
+        if found is not False:
+            known.add(name)
+        if found is not None:
+            to_cache[GBIF_NAME_CACHE + safe_key(name)] = found
+    cache.set_many(to_cache, getattr(settings, 'GBIF_NAME_CACHE_TTL', 86400))
+
+    return known
+
+
+def get_insect_names(data):
+    """
+    Returns the insect_scientific_name_other values of a submission's repeat
+    groups.
+    """
+    root = next(iter(data.values()), None) if data else None
+    repeats = root.get('repeat_group') if isinstance(root, dict) else None
+    if isinstance(repeats, dict):
+        repeats = [repeats]
+
+    names = []
+    for repeat in repeats or []:
+        details = repeat.get('capture_insect_details') \
+            if isinstance(repeat, dict) else None
+        name = details.get('insect_scientific_name_other') \
+            if isinstance(details, dict) else None
+        if name:
+            names.append(name)
+
+    return names
+
+
+def validate_insect_names(data):
+    """
+    Validates that the insect scientific names of a submission are known
+    species.
+    """
+    names = set(get_insect_names(data))
+
+    return not names or names <= get_known_species_names(names)
 
 
 def validate_data(xml):
-    '''Function that validates data'''
-    xml_str = json.dumps(xmltodict.parse(xml))
-    xml_json = json.loads(xml_str)
-    submission_json = xml_json['data']
-    valid = []
+    '''Function that validates data, from the submission's xml or its
+    already parsed data dict'''
+    data = xml if isinstance(xml, dict) else xmltodict.parse(xml)
+    validators = getattr(settings, 'SUBMISSION_VALIDATORS',
+                         DEFAULT_SUBMISSION_VALIDATORS)
 
+    return all(import_string(validator)(data) for validator in validators)
+
+
+@app.task(ignore_result=True)
+def validate_submission(instance_id):
+    """
+    Validates a submission that was accepted without validation, setting its
+    status to failed_validation when it is invalid.
+    """
     try:
-        if type(submission_json['repeat_group']) == list:
-
-            try:
-                insect_name_other = [interaction['capture_insect_details']['insect_scientific_name_other']
-                                     for interaction in submission_json['repeat_group'] if 'insect_scientific_name_other'
-                                     in interaction['capture_insect_details']]
-
-                if insect_name_other:
-                    for name in set(insect_name_other):
-
-                        if name in check_gbif_data(name):
-                            valid.append('T')
-                        else:
-                            valid.append('F')
-                else:
-                    pass
-            except:
-                pass
-        else:
-            try:
-                name = submission_json['repeat_group']['capture_insect_details']['insect_scientific_name_other']
-
-                if name in check_gbif_data(name):
-                    valid.append('T')
-                else:
-                    valid.append('F')
-            except:
-                pass
-
-        return False if 'F' in valid else True
-
-    except:
-        pass
+        instance = Instance.objects.get(pk=instance_id)
+    except Instance.DoesNotExist:
+        return
+
+    if not validate_data(SubmissionContext(instance.xml).to_dict()):
+        instance.status = FAILED_VALIDATION_STATUS
+        instance.save(update_fields=['status', 'json', 'date_modified'])
@@ -1,11 +1,15 @@
 # -*- coding: utf-8 -*-
 """Util functions for data views."""
 import json
+import mimetypes
 import os
 import requests
 import sys
+import time
 import zipfile
 from builtins import open
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from future.utils import iteritems
 from json.decoder import JSONDecodeError
 from tempfile import NamedTemporaryFile
@@ -55,7 +59,9 @@ def image_urls(instance):
     suffix = settings.THUMB_CONF['medium']['suffix']
     for attachment in instance.attachments.all():
         path = get_path(attachment.media_file.name, suffix)
-        if default_storage.exists(path):
+        # the thumbnails of older attachments are not recorded
+        if 'medium' in attachment.thumbnails or (
+                not attachment.thumbnails and default_storage.exists(path)):
             url = default_storage.url(path)
         else:
             url = attachment.media_file.url
@@ -245,34 +251,154 @@ def generate_enketo_form_defaults(xform, **kwargs):
     return defaults
 
 
+# media types that are already compressed, stored without deflate
+ZIP_STORED_MIMETYPES = (
+    'application/gzip', 'application/pdf', 'application/zip',
+    'image/gif', 'image/jpeg', 'image/png', 'image/webp')
+ZIP_STORED_MIMETYPE_PREFIXES = ('audio/', 'video/')
+ZIP_DEFLATED_MIMETYPES = ('audio/wav', 'audio/x-wav')
+
+
+def _get_compress_type(attachment):
+    """Return the zip compression type of an attachment's file."""
+    mimetype = attachment.mimetype or \
+        mimetypes.guess_type(attachment.media_file.name)[0] or ''
+    if mimetype in ZIP_STORED_MIMETYPES or (
+            mimetype.startswith(ZIP_STORED_MIMETYPE_PREFIXES) and
+            mimetype not in ZIP_DEFLATED_MIMETYPES):
+        return zipfile.ZIP_STORED
+
+    return zipfile.ZIP_DEFLATED
+
+
+def _open_attachment_file(storage, filename):
+    if not storage.exists(filename):
+        return None
+
+    return storage.open(filename)
+
+
+def _prefetch_attachment_files(storage, attachments):
+    """
+    Yield (attachment, future) pairs, the futures opening the attachments'
+    files from storage ahead of them being read in a bounded thread pool.
+    """
+    workers = getattr(settings, 'ZIP_ATTACHMENT_PREFETCH_WORKERS', 4)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            for attachment in attachments:
+                pending.append((attachment, executor.submit(
+                    _open_attachment_file, storage,
+                    attachment.media_file.name)))
+                if len(pending) > workers:
+                    yield pending.popleft()
+            while pending:
+                yield pending.popleft()
+        finally:
+            # close the files opened ahead when the zip file is abandoned
+            for attachment, future in pending:
+                future.cancel()
+                try:
+                    media_file = future.result()
+                except Exception:  # pylint: disable=broad-except
+                    continue
+                if media_file is not None:
+                    media_file.close()
+
+
+def _write_attachments_zipfile(attachments, fileobj):
+    """
+    Write the attachments' files to a zip file, yielding after every chunk
+    written.
+    """
+    storage = get_storage_class()()
+    chunk_size = getattr(settings, 'ZIP_ATTACHMENT_CHUNK_SIZE', 65536)
+    with zipfile.ZipFile(
+            fileobj, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as z:
+        for attachment, future in _prefetch_attachment_files(
+                storage, attachments):
+            try:
+                media_file = future.result()
+                if media_file is None:
+                    continue
+
+                with media_file as f:
+                    if f.size > settings.ZIP_REPORT_ATTACHMENT_LIMIT:
+                        report_exception(
+                            "Create attachment zip exception",
+                            "File is greater than {} bytes".format(
+                                settings.ZIP_REPORT_ATTACHMENT_LIMIT)
+                        )
+                        break
+
+                    zinfo = zipfile.ZipInfo(
+                        attachment.media_file.name,
+                        date_time=time.localtime(time.time())[:6])
+                    zinfo.compress_type = _get_compress_type(attachment)
+                    zinfo.external_attr = 0o600 << 16
+                    # the size decides whether the entry needs zip64
+                    zinfo.file_size = f.size
+                    with z.open(zinfo, 'w') as dest:
+                        for chunk in iter(lambda: f.read(chunk_size), b''):
+                            dest.write(chunk)
+                            yield
+            except IOError as e:
+                report_exception("Create attachment zip exception", e)
+                break
+
+
+class ZipStream(object):
+    """
+    An unseekable file object keeping what a ZipFile writes until it is
+    read.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def read(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+
+        return data
+
+
 def create_attachments_zipfile(attachments):
     """Return a zip file with submission attachments."""
     # create zip_file
     tmp = NamedTemporaryFile()
-    with zipfile.ZipFile(tmp, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as z:
-        for attachment in attachments:
-            default_storage = get_storage_class()()
-            filename = attachment.media_file.name
-
-            if default_storage.exists(filename):
-                try:
-                    with default_storage.open(filename) as f:
-                        if f.size > settings.ZIP_REPORT_ATTACHMENT_LIMIT:
-                            report_exception(
-                                "Create attachment zip exception",
-                                "File is greater than {} bytes".format(
-                                    settings.ZIP_REPORT_ATTACHMENT_LIMIT)
-                            )
-                            break
-                        else:
-                            z.writestr(attachment.media_file.name, f.read())
-                except IOError as e:
-                    report_exception("Create attachment zip exception", e)
-                    break
+    for _chunk in _write_attachments_zipfile(attachments, tmp):
+        pass
 
     return tmp
 
 
+def stream_attachments_zipfile(attachments):
+    """Yield the bytes of a zip file with submission attachments."""
+    stream = ZipStream()
+    for _chunk in _write_attachments_zipfile(attachments, stream):
+        data = stream.read()
+        if data:
+            yield data
+
+    # the central directory, written when the zip file is closed
+    yield stream.read()
+
+
 def get_form(kwargs):
     """Return XForm object by applying kwargs on an XForm queryset."""
     # adding inline imports here because adding them at the top of the file
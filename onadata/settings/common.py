@@ -157,6 +157,7 @@ TEMPLATES = [
 
 MIDDLEWARE = (
     'onadata.libs.profiling.sql.SqlTimingMiddleware',
+    'onadata.libs.profiling.middleware.MetricsMiddleware',
     'django.middleware.http.ConditionalGetMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -428,17 +429,108 @@ THUMB_CONF = {
 # order of thumbnails from largest to smallest
 THUMB_ORDER = ['large', 'medium', 'small']
 DEFAULT_IMG_FILE_TYPE = 'jpg'
+# generate thumbnails in a celery task when an image attachment is saved
+THUMBNAILS_ASYNC_ENABLED = False
 
 # celery
 CELERY_TASK_ALWAYS_EAGER = False
 CELERY_TASK_IGNORE_RESULT = False
 CELERY_TASK_TRACK_STARTED = True
-CELERY_IMPORTS = ('onadata.libs.utils.csv_import',)
+CELERY_IMPORTS = ('onadata.libs.utils.csv_import',
+                  'onadata.libs.utils.validate_data')
+
+# buffer submission count updates and apply them from the
+# flush_submission_count_deltas periodic task, scheduled every
+# SUBMISSION_COUNT_FLUSH_INTERVAL seconds when enabled
+SUBMISSION_COUNT_BUFFERING_ENABLED = False
+SUBMISSION_COUNT_FLUSH_INTERVAL = 30.0
+
+# append new submissions to a copy of the previous CSV and CSV zip export
+# instead of rebuilding it
+EXPORT_INCREMENTAL_ENABLED = False
+
+# keep per form counts of the values of date, numeric and select one fields
+# for the charts and stats endpoints
+FORM_AGGREGATES_ENABLED = False
+
+# count the form fields submission queries filter and sort on, to choose the
+# fields to build JSON expression indexes for with json_field_indexes
+JSON_FIELD_QUERY_TRACKING_ENABLED = False
+
+# the engine submissions are parsed with, 'minidom' or the faster lxml
+# 'iterparse', compare them with the benchmark_instance_parsers command
+XFORM_INSTANCE_PARSER_ENGINE = 'minidom'
+
+# the number of form surveys, with their element indexes, kept in memory by
+# each process
+XFORM_SURVEY_CACHE_SIZE = 128
+
+# functions that validate submissions, see onadata.libs.utils.validate_data;
+# with SUBMISSION_VALIDATION_ASYNC submissions are accepted at once and the
+# invalid ones get the status failed_validation afterwards
+SUBMISSION_VALIDATORS = (
+    'onadata.libs.utils.validate_data.validate_insect_names',
+)
+SUBMISSION_VALIDATION_ASYNC = False
+# GBIF name lookups; point the url to a local stub service, or set a file of
+# species names, one per line, as the taxonomy snapshot to skip GBIF
+GBIF_OCCURRENCE_SEARCH_URL = 'https://api.gbif.org/v1/occurrence/search'
+GBIF_API_TIMEOUT = 5
+GBIF_NAME_CACHE_TTL = 86400
+GBIF_TAXONOMY_SNAPSHOT = None
+
+# with STREAM_DATA, stream submissions as the JSON text postgres serializes
+# them to instead of decoding and encoding each one, in chunks of at least
+# STREAM_DATA_CHUNK_SIZE characters
+STREAM_DATA_JSON_PASSTHROUGH = False
+STREAM_DATA_CHUNK_SIZE = 65536
+
+# serve devices the latest ready CSV of a linked dataset, form media of the
+# form 'xform <pk> <name>' or 'dataview <pk> <name>', and rebuild it in the
+# background when the linked form has newer submissions
+LINKED_DATASET_BACKGROUND_EXPORTS = False
+
+# delivery of submissions to rest services; a failed delivery is retried
+# after REST_SERVICE_RETRY_BACKOFF seconds, doubling after every failure,
+# until it has been attempted REST_SERVICE_MAX_ATTEMPTS times, then it is
+# kept as failed for the retry_service_deliveries command. Deliveries being
+# sent are claimed for REST_SERVICE_CLAIM_TIMEOUT seconds, by default
+# REST_SERVICE_TIMEOUT seconds per delivery claimed
+REST_SERVICE_TIMEOUT = 30
+REST_SERVICE_POOL_SIZE = 10
+REST_SERVICE_MAX_ATTEMPTS = 5
+REST_SERVICE_RETRY_BACKOFF = 60
+REST_SERVICE_DELIVERY_LIMIT = 100
+
+# the messages the MQTT notification backend's client queues while it is
+# disconnected, and the seconds a form's message topic is cached
+MQTT_MAX_QUEUED_MESSAGES = 1000
+MQTT_TOPIC_CACHE_TTL = 300
+# record per request phase timings, SQL queries and cache accesses, exposed
+# at /_metrics to INSTRUMENTATION_METRICS_IPS and to requests with the
+# INSTRUMENTATION_METRICS_TOKEN bearer token
+INSTRUMENTATION_ENABLED = False
+INSTRUMENTATION_METRICS_IPS = []
+INSTRUMENTATION_METRICS_TOKEN = None
+# regular expressions of the view names of routes to sample profiles of
+INSTRUMENTATION_PROFILE_ROUTES = ()
+INSTRUMENTATION_PROFILE_SAMPLE_RATE = 0.01
+# cprofile or pyinstrument
+INSTRUMENTATION_PROFILER = 'cprofile'
+# import CSV rows with batched inserts of CSV_IMPORT_BATCH_SIZE rows
+CSV_IMPORT_BULK_ENABLED = False
+CSV_IMPORT_BATCH_SIZE = 500
 
 
 CSV_FILESIZE_IMPORT_ASYNC_THRESHOLD = 100000  # Bytes
 GOOGLE_SHEET_UPLOAD_BATCH = 1000
 ZIP_REPORT_ATTACHMENT_LIMIT = 5242880000  # 500 MB in Bytes
+# attachment files opened ahead of being zipped, and the size of the chunks
+# they are copied into zip files in
+ZIP_ATTACHMENT_PREFETCH_WORKERS = 4
+ZIP_ATTACHMENT_CHUNK_SIZE = 65536
+# stream ZIP exports of attachments instead of writing them to a temp file
+ZIP_EXPORT_STREAMING = False
 
 # duration to keep zip exports before deletion (in seconds)
 ZIP_EXPORT_COUNTDOWN = 3600  # 1 hour
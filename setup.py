@@ -96,6 +96,7 @@ setup(
         "httplib2",
         "modilabs-python-utils",
         "numpy",
+        "pyarrow",
         "Pillow",
         "python-dateutil",
         "pytz",